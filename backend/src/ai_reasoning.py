@@ -1,14 +1,28 @@
+import google.ai.generativelanguage as glm
 import google.generativeai as genai
 from typing import List, Dict, Any
 import PIL.Image
 import os
 
+from src.metrics import GEMINI_CALLS, GEMINI_DURATION, GEMINI_RETRIES
+
 class AIReasoning:
     def __init__(self, api_key: str):
         # Use the latest Gemini 3.0 Flash Preview as requested
-        genai.configure(api_key=api_key)
         self.model_name = 'gemini-3-flash-preview'
         self.model = genai.GenerativeModel(self.model_name)
+        # genai.configure() sets a process-wide key, but diagnoses with different
+        # keys run concurrently on the thread pools: give the model its own client.
+        # google-generativeai has no public parameter for that, so the client goes
+        # into the attribute generate_content reads; refuse to run if it is gone
+        # rather than silently fall back to the shared default client.
+        if not hasattr(self.model, "_client"):
+            raise RuntimeError("google-generativeai GenerativeModel has no _client attribute; "
+                               "per-request Gemini keys are not supported by this SDK version")
+        self.model._client = glm.GenerativeServiceClient(client_options={"api_key": api_key})
+        # Per-instance (i.e. per-diagnosis) call accounting for the trace
+        self.call_count = 0
+        self.retry_count = 0
         print(f"AIReasoning initialized with model: {self.model_name}")
 
     def safe_generate_content(self, content: Any, max_retries: int = 3) -> Any:
@@ -19,22 +33,31 @@ class AIReasoning:
         start_time = time.time()
         print(f"[{self.model_name}] Starting API call...")
         
+        self.call_count += 1
         for i in range(max_retries + 1):
             try:
                 response = self.model.generate_content(content)
                 duration = time.time() - start_time
                 print(f"[{self.model_name}] Success in {duration:.2f}s")
+                GEMINI_CALLS.inc(outcome="success")
+                GEMINI_DURATION.observe(duration)
                 return response
             except exceptions.ResourceExhausted as e:
                 if i < max_retries:
                     print(f"Gemini API 429 Resource Exhausted. Retrying in {delay}s... (Attempt {i+1}/{max_retries})")
+                    self.retry_count += 1
+                    GEMINI_RETRIES.inc()
                     time.sleep(delay)
                     delay *= 2
                 else:
                     print(f"Gemini API 429 Resource Exhausted. Max retries reached after {time.time()-start_time:.2f}s: {e}")
+                    GEMINI_CALLS.inc(outcome="rate_limited")
+                    GEMINI_DURATION.observe(time.time() - start_time)
                     raise Exception("Gemini API 频率超限 (429 Resource Exhausted)，请稍后重试。")
             except Exception as e:
                 print(f"Gemini API Error after {time.time()-start_time:.2f}s: {e}")
+                GEMINI_CALLS.inc(outcome="error")
+                GEMINI_DURATION.observe(time.time() - start_time)
                 raise e
 
     def extract_keywords(self, issue_details: Dict[str, Any], image_paths: List[str] = None, exclude: List[str] = None) -> Dict[str, List[str]]:
@@ -0,0 +1,253 @@
+import asyncio
+import json
+import os
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+import httpx
+
+from src.jira_connector import (
+    BULK_FETCH_BATCH_SIZE, DOWNLOAD_RETRIES, MAX_CONCURRENCY_PER_HOST, MAX_CONNECTIONS_PER_HOST, SEARCH_PAGE_SIZE,
+    AttachmentTooLarge, IncompleteTransfer, JiraIssueParser, adaptive_chunk_size,
+)
+from src.jira_fields import DEFAULT_ROOT_CAUSE_FIELD, FieldPlan, get_field_metadata_cache
+from src.metrics import JIRA_SEARCH_BYTES, JIRA_SEARCH_PAGES
+from src.rate_limit import JiraThrottled, get_host_limiter
+
+ASYNC_TIMEOUT_SECONDS = float(os.getenv("JIRA_ASYNC_TIMEOUT_SECONDS", "30"))
+
+
+class AsyncJiraConnector(JiraIssueParser):
+    """
+    Async counterpart of JiraConnector built on httpx.AsyncClient.
+
+    Offers the same read surface (get_issue, get_issues, search_issues,
+    download_attachment) as coroutines and parses the raw REST JSON with the
+    shared JiraIssueParser, so results have exactly the JiraConnector shapes.
+    Many requests can be in flight on one event loop without a thread per
+    call; they are admitted by the same per-host limiter (rate, AIMD window,
+    Retry-After) as the synchronous connectors of that host. Head + tail
+    excerpts of large logs (JiraConnector.download_head_tail) are not
+    offered here. A client belongs to the event loop it is first used on;
+    close it with `aclose()` (or use it as an async context manager).
+    """
+
+    def __init__(self, server_url: str, username: str, token: str,
+                 max_concurrency: int = MAX_CONCURRENCY_PER_HOST,
+                 max_connections: int = MAX_CONNECTIONS_PER_HOST,
+                 timeout: float = ASYNC_TIMEOUT_SECONDS,
+                 transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.server_url = server_url
+        self.username = username
+        self.token = token
+        self._limiter = get_host_limiter(server_url, max_concurrency)
+        self._client = httpx.AsyncClient(
+            auth=(username, token),
+            verify=False,
+            timeout=timeout,
+            follow_redirects=True,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            transport=transport,
+        )
+
+    async def __aenter__(self) -> "AsyncJiraConnector":
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.aclose()
+
+    async def aclose(self):
+        """Release the client's keep-alive connections."""
+        await self._client.aclose()
+
+    def _url(self, path: str) -> str:
+        return f"{self.server_url.rstrip('/')}/rest/api/2/{path}"
+
+    async def _get(self, path: str, params: Optional[Dict[str, Any]] = None) -> httpx.Response:
+        """
+        GET a REST resource through the host limiter (429/5xx answers are
+        retried there); other non-2xx responses raise.
+        """
+        response = await self._limiter.acall(self._client.get, self._url(path), params=params)
+        response.raise_for_status()
+        return response
+
+    async def _get_json(self, path: str, params: Optional[Dict[str, Any]] = None) -> Tuple[Any, int]:
+        """_get, returning (decoded JSON, payload bytes)."""
+        response = await self._get(path, params)
+        return json.loads(response.content), len(response.content)
+
+    async def field_plan(self) -> FieldPlan:
+        """Same plan as JiraConnector.field_plan, from the shared per-server cache."""
+        cache = get_field_metadata_cache()
+        plan = cache.cached_plan(self.server_url)
+        if plan is not None:
+            return plan
+        try:
+            all_fields, _ = await self._get_json("field")
+        except Exception as e:
+            print(f"Warning: Could not query Jira fields metadata: {e}")
+            return FieldPlan(None, DEFAULT_ROOT_CAUSE_FIELD)
+        return cache.plan(self.server_url, lambda: all_fields)
+
+    async def get_issue(self, issue_key: str) -> Dict[str, Any]:
+        plan = await self.field_plan()
+        raw, _ = await self._get_json(f"issue/{issue_key}", {
+            "fields": ",".join(plan.issue_fields()), "expand": "comments,attachments",
+        })
+        result = self._parse_issue(raw, plan)
+        comment_images = len([img for img in result["images"] if img["source"] == "comment"])
+        print(f"[{issue_key}] Found {len(result['images'])} images ({comment_images} from comments)")
+        return result
+
+    async def get_issues(self, issue_keys: List[str], batch_size: int = BULK_FETCH_BATCH_SIZE) -> Dict[str, Any]:
+        """
+        Same contract as JiraConnector.get_issues ({key: issue or Exception}),
+        with all `key in (...)` batches requested concurrently.
+        """
+        plan = await self.field_plan()
+        fields = ",".join(plan.issue_fields())
+        keys = list(dict.fromkeys(k.strip().upper() for k in issue_keys if k.strip()))
+        results: Dict[str, Any] = {}
+
+        async def fetch_batch(batch: List[str]):
+            try:
+                page, _ = await self._get_json("search", {
+                    "jql": f"key in ({', '.join(batch)})",
+                    "maxResults": len(batch),
+                    "fields": fields,
+                    "validateQuery": "warn",
+                })
+            except JiraThrottled as e:
+                results.update((key, e) for key in batch)
+                return
+            except Exception as e:
+                print(f"Bulk fetch of {len(batch)} issues failed ({e}), fetching individually")
+                singles = await asyncio.gather(*(self.get_issue(key) for key in batch), return_exceptions=True)
+                results.update(zip(batch, singles))
+                return
+            for raw in page.get("issues", []):
+                results[raw.get("key", "").upper()] = self._parse_issue(raw, plan)
+            for key in batch:
+                if key not in results:
+                    results[key] = Exception(f"404 Issue {key} does not exist or is not visible")
+
+        await asyncio.gather(*(fetch_batch(keys[i:i + batch_size]) for i in range(0, len(keys), batch_size)))
+        return results
+
+    async def iter_search_issues(self, jql: str, max_results: int = 5, page_size: int = SEARCH_PAGE_SIZE,
+                                 stats: Optional[Dict[str, Any]] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Async version of JiraConnector.iter_search_issues (lazy pages, same stats keys)."""
+        plan = await self.field_plan()
+        fields = ",".join(plan.search_fields())
+        fetched = 0
+        while fetched < max_results:
+            started = time.perf_counter()
+            response = await self._get("search", {
+                "jql": jql, "startAt": fetched, "maxResults": min(page_size, max_results - fetched), "fields": fields,
+            })
+            body = response.content
+            fetched_at = time.perf_counter()
+            page = json.loads(body)
+            issues = page.get("issues", [])[:max_results - fetched]
+            JIRA_SEARCH_PAGES.inc()
+            JIRA_SEARCH_BYTES.inc(len(body))
+            if stats is not None:
+                stats["pages"] = stats.get("pages", 0) + 1
+                stats["payload_bytes"] = stats.get("payload_bytes", 0) + len(body)
+                stats["request_seconds"] = round(stats.get("request_seconds", 0) + fetched_at - started, 4)
+                stats["parse_seconds"] = round(stats.get("parse_seconds", 0) + time.perf_counter() - fetched_at, 4)
+                stats["total"] = page.get("total", 0)
+            for raw in issues:
+                yield self._parse_search_stub(raw, plan)
+            fetched += len(issues)
+            if not issues or fetched >= page.get("total", 0):
+                break
+
+    async def search_issues(self, jql: str, max_results: int = 5,
+                            stats: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        if not any(op in jql for op in ['~', '=', 'OR', 'AND']):
+            jql = f'text ~ "{jql}" ORDER BY created DESC'
+
+        print(f"Executing JQL: {jql}")
+
+        try:
+            return [stub async for stub in self.iter_search_issues(jql, max_results=max_results, stats=stats)]
+        except JiraThrottled:
+            raise
+        except Exception as e:
+            print(f"Jira search failed for JQL '{jql}': {e}")
+            return []
+
+    async def download_attachment(self, url: str, destination_path: str, max_bytes: int = None,
+                                  chunk_size: int = None, retries: int = DOWNLOAD_RETRIES,
+                                  stats: Optional[Dict[str, Any]] = None, size: int = None) -> int:
+        """
+        Async version of JiraConnector.download_attachment, with the same
+        size checks, Range resume of interrupted transfers, `stats` keys and
+        cleanup of the partial file on failure. Returns the number of bytes
+        written.
+        """
+        declared = size or 0
+        if max_bytes is not None and declared > max_bytes:
+            raise AttachmentTooLarge(f"{declared} bytes exceeds limit of {max_bytes} bytes")
+        if stats is not None:
+            stats.update(declared_bytes=declared, chunk_size=chunk_size, resumes=0)
+
+        accepts_ranges = True  # until the server shows otherwise
+        written = 0
+        attempt = 0
+        try:
+            with open(destination_path, 'wb') as f:
+                while True:
+                    headers = {'Range': f'bytes={written}-'} if written and accepts_ranges else {}
+                    try:
+                        # like JiraConnector, the limiter admits the request; the body streams outside it
+                        request = self._client.build_request("GET", url, headers=headers)
+                        response = await self._limiter.acall(self._client.send, request, stream=True)
+                        try:
+                            response.raise_for_status()
+                            if response.headers.get('Accept-Ranges', '').lower() == 'none':
+                                accepts_ranges = False
+                            if written and response.status_code != 206:
+                                # Range ignored: the body starts from byte 0 again
+                                accepts_ranges = False
+                                f.seek(0)
+                                f.truncate()
+                                written = 0
+                            if not written:
+                                length = int(response.headers.get('Content-Length') or 0)
+                                if max_bytes is not None and length > max_bytes:
+                                    raise AttachmentTooLarge(f"{length} bytes exceeds limit of {max_bytes} bytes")
+                                declared = declared or length
+                            if chunk_size is None:
+                                chunk_size = adaptive_chunk_size(declared)
+                                if stats is not None:
+                                    stats.update(declared_bytes=declared, chunk_size=chunk_size)
+                            async for chunk in response.aiter_bytes(chunk_size):
+                                written += len(chunk)
+                                if max_bytes is not None and written > max_bytes:
+                                    raise AttachmentTooLarge(f"more than {max_bytes} bytes streamed")
+                                f.write(chunk)
+                        finally:
+                            await response.aclose()
+                        if declared and written < declared:
+                            raise IncompleteTransfer(f"connection closed after {written} of {declared} bytes")
+                        break
+                    except (httpx.TransportError, IncompleteTransfer) as e:
+                        attempt += 1
+                        if attempt > retries:
+                            raise
+                        if not accepts_ranges:
+                            f.seek(0)
+                            f.truncate()
+                            written = 0
+                        if stats is not None:
+                            stats["resumes"] += 1
+                        print(f"Download of {url} interrupted at {written} bytes ({e}); retry {attempt}/{retries}")
+                        await asyncio.sleep(min(0.5 * 2 ** (attempt - 1), 5))
+        except Exception:
+            if os.path.exists(destination_path):
+                os.remove(destination_path)
+            raise
+        return written
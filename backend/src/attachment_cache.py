@@ -0,0 +1,192 @@
+import hashlib
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional, Set
+
+ATTACHMENT_CACHE_DIR = os.getenv("DIAG_ATTACHMENT_CACHE_DIR", "data/cache/attachments")
+# Total size of cached attachment blobs; least recently used entries are evicted first.
+ATTACHMENT_CACHE_MAX_BYTES = int(os.getenv("DIAG_ATTACHMENT_CACHE_MAX_BYTES", str(2 * 1024 * 1024 * 1024)))
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def attachment_key(server_url: str, attachment: Dict) -> Optional[str]:
+    """Cache key for a Jira attachment (server, id, size), or None if it has no id."""
+    if not attachment.get('id'):
+        return None
+    return f"{server_url.rstrip('/')}|{attachment['id']}|{int(attachment.get('size') or 0)}"
+
+
+def _sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _place(src: str, dest: str):
+    """Expose a cached blob at dest: hard link when possible, copy otherwise."""
+    if os.path.exists(dest):
+        os.remove(dest)
+    try:
+        os.link(src, dest)
+    except OSError:
+        shutil.copyfile(src, dest)
+
+
+class AttachmentCache:
+    """
+    Persistent, content-addressed store of downloaded attachments.
+
+    Blobs live under ``objects/<sha256[:2]>/<sha256>`` and a SQLite index
+    maps attachment keys (server, id, size) to blobs with their last access
+    time. Writers download into a private temp file and publish it with an
+    atomic ``os.replace``, so concurrent downloads of the same attachment
+    never expose a partial file. Entries beyond ``max_bytes`` are evicted in
+    LRU order; blobs no longer referenced are deleted. A blob being placed
+    at a destination is pinned rather than locked, so a slow copy (no hard
+    links across filesystems) never blocks other lookups; eviction defers
+    deleting a pinned blob until its last placement is done.
+    """
+
+    def __init__(self, root: str = ATTACHMENT_CACHE_DIR, max_bytes: int = ATTACHMENT_CACHE_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._pins: Dict[str, int] = {}  # digest -> placements in progress
+        self._evicted: Set[str] = set()  # pinned blobs evicted meanwhile, deleted on unpin
+        os.makedirs(os.path.join(root, "objects"), exist_ok=True)
+        os.makedirs(os.path.join(root, "tmp"), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS entries (
+                    key TEXT PRIMARY KEY,
+                    digest TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    last_access REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_access ON entries(last_access)")
+            conn.execute("PRAGMA journal_mode=WAL")
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """Short-lived connection; commits on success and always closes."""
+        conn = sqlite3.connect(os.path.join(self.root, "index.sqlite3"), timeout=10)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _blob_path(self, digest: str) -> str:
+        return os.path.join(self.root, "objects", digest[:2], digest)
+
+    def temp_path(self) -> str:
+        """Unique scratch file on the cache's filesystem for an in-progress download."""
+        return os.path.join(self.root, "tmp", uuid.uuid4().hex)
+
+    def fetch(self, key: str, dest: str) -> bool:
+        """Place the cached attachment at dest. Returns False on a miss."""
+        with self._lock, self._connect() as conn:
+            row = conn.execute("SELECT digest FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return False
+            blob = self._blob_path(row[0])
+            if not os.path.exists(blob):
+                conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                return False
+            conn.execute("UPDATE entries SET last_access = ? WHERE key = ?", (time.time(), key))
+            self._pin(row[0])
+        self._place_pinned(row[0], dest)
+        return True
+
+    def commit(self, key: str, temp_path: str, dest: str) -> str:
+        """
+        Publish a completed download (written to a `temp_path()` file) under
+        key and place it at dest. Returns the content digest.
+        """
+        digest = _sha256(temp_path)
+        blob = self._blob_path(digest)
+        os.makedirs(os.path.dirname(blob), exist_ok=True)
+        size = os.path.getsize(temp_path)
+        with self._lock:
+            # Atomic publish; an identical blob from a concurrent writer is simply replaced
+            os.replace(temp_path, blob)
+            with self._connect() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO entries (key, digest, size, last_access) VALUES (?, ?, ?, ?)",
+                    (key, digest, size, time.time())
+                )
+                self._pin(digest)
+                self._evict(conn)
+        self._place_pinned(digest, dest)
+        return digest
+
+    def _pin(self, digest: str):
+        """Keep a blob on disk until the matching _place_pinned; caller holds _lock."""
+        self._pins[digest] = self._pins.get(digest, 0) + 1
+
+    def _place_pinned(self, digest: str, dest: str):
+        """_place a pinned blob outside the lock, then unpin it (deleting it if evicted meanwhile)."""
+        try:
+            _place(self._blob_path(digest), dest)
+        finally:
+            with self._lock:
+                self._pins[digest] -= 1
+                if not self._pins[digest]:
+                    del self._pins[digest]
+                    if digest in self._evicted:
+                        self._evicted.discard(digest)
+                        with self._connect() as conn:
+                            self._remove_unreferenced(conn, digest)
+
+    def _evict(self, conn: sqlite3.Connection):
+        total = 0
+        stale = []
+        for key, digest, size in conn.execute("SELECT key, digest, size FROM entries ORDER BY last_access DESC"):
+            total += size
+            if total > self.max_bytes:
+                stale.append((key, digest))
+        if not stale:
+            return
+        conn.executemany("DELETE FROM entries WHERE key = ?", [(key,) for key, _ in stale])
+        for digest in {digest for _, digest in stale}:
+            if digest in self._pins:
+                self._evicted.add(digest)
+            else:
+                self._remove_unreferenced(conn, digest)
+
+    def _remove_unreferenced(self, conn: sqlite3.Connection, digest: str):
+        # Blobs are shared by identical attachments; keep ones still referenced
+        if conn.execute("SELECT 1 FROM entries WHERE digest = ? LIMIT 1", (digest,)).fetchone() is None:
+            try:
+                os.remove(self._blob_path(digest))
+            except OSError:
+                pass
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock, self._connect() as conn:
+            entries, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        return {"entries": entries, "bytes": total}
+
+
+_attachment_cache: Optional[AttachmentCache] = None
+_attachment_cache_lock = threading.Lock()
+
+
+def get_attachment_cache() -> Optional[AttachmentCache]:
+    """Process-wide attachment cache, or None when disabled (max bytes 0)."""
+    global _attachment_cache
+    if ATTACHMENT_CACHE_MAX_BYTES <= 0:
+        return None
+    with _attachment_cache_lock:
+        if _attachment_cache is None:
+            _attachment_cache = AttachmentCache()
+    return _attachment_cache
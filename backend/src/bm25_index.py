@@ -0,0 +1,108 @@
+import heapq
+import math
+import re
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+# Hex literals (0x7F), DTCs (U0100, P0A1F-00), ASCII words, and CJK runs.
+# Alternatives are tried in order, so codes win over the generic word rule.
+_TOKEN_RE = re.compile(
+    r"0x[0-9a-f]+"
+    r"|\b[pcbu][0-9a-f]{4}(?:-[0-9a-f]{2})?\b"
+    r"|[a-z0-9_]+"
+    r"|[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+",
+    re.IGNORECASE,
+)
+_CJK_RE = re.compile(r"[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Tokens for mixed Chinese/English diagnostic text.
+
+    ASCII is lower-cased and split on non-word characters (single letters are
+    dropped). Hex literals and DTC codes stay whole; a DTC with a failure
+    type byte (U0100-87) also yields its base code (u0100). Chinese runs are
+    split into overlapping character bigrams, so "升级失败" matches queries
+    for "升级" or "失败" without a segmentation dictionary.
+    """
+    tokens: List[str] = []
+    for match in _TOKEN_RE.finditer(text or ""):
+        token = match.group(0).lower()
+        if _CJK_RE.match(token):
+            if len(token) == 1:
+                tokens.append(token)
+            else:
+                tokens.extend(token[i:i + 2] for i in range(len(token) - 1))
+        elif "-" in token:
+            tokens.append(token)
+            tokens.append(token.split("-", 1)[0])
+        elif len(token) > 1 or token.isdigit():
+            tokens.append(token)
+    return tokens
+
+
+class BM25Index:
+    """
+    In-memory inverted index with Okapi BM25 ranking.
+
+    Documents carry an arbitrary metadata dict that is returned with each
+    hit. Built once and then queried; add all documents before searching.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._postings: Dict[str, Dict[int, int]] = {}
+        self._lengths: List[int] = []
+        self._docs: List[Tuple[str, Dict[str, Any]]] = []
+        self._total_length = 0
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def add(self, doc_id: str, text: str, meta: Optional[Dict[str, Any]] = None):
+        doc = len(self._docs)
+        counts = Counter(tokenize(text))
+        for term, tf in counts.items():
+            self._postings.setdefault(term, {})[doc] = tf
+        length = sum(counts.values())
+        self._lengths.append(length)
+        self._total_length += length
+        self._docs.append((doc_id, meta or {}))
+
+    def idf(self, term: str) -> float:
+        df = len(self._postings.get(term, ()))
+        n = len(self._docs)
+        return math.log(1 + (n - df + 0.5) / (df + 0.5))
+
+    def search(self, query: Dict[str, float], top_k: int = 100) -> List[Tuple[str, float, Dict[str, Any]]]:
+        """
+        Rank documents for a weighted query {token: weight} (see
+        `query_weights`). Returns up to top_k (doc_id, score, meta), best
+        first; documents that match no query token are never returned.
+        """
+        if not self._docs:
+            return []
+        avg_length = self._total_length / len(self._docs) or 1.0
+        scores: Dict[int, float] = {}
+        for term, weight in query.items():
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = self.idf(term)
+            for doc, tf in postings.items():
+                norm = self.k1 * (1 - self.b + self.b * self._lengths[doc] / avg_length)
+                scores[doc] = scores.get(doc, 0.0) + weight * idf * tf * (self.k1 + 1) / (tf + norm)
+        best = heapq.nlargest(top_k, scores.items(), key=lambda item: (item[1], -item[0]))
+        return [(self._docs[doc][0], round(score, 4), self._docs[doc][1]) for doc, score in best]
+
+
+def query_weights(groups: List[Tuple[List[str], float]]) -> Dict[str, float]:
+    """Merge (phrases, weight) groups into one weighted token query."""
+    weights: Dict[str, float] = {}
+    for phrases, weight in groups:
+        for phrase in phrases:
+            for token in set(tokenize(phrase)):
+                weights[token] = weights.get(token, 0.0) + weight
+    return weights
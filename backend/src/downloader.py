@@ -0,0 +1,193 @@
+import asyncio
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.attachment_cache import AttachmentCache, attachment_key
+from src.executor import LOG_PROCESSES, run_blocking
+from src.jira_connector import LOG_EXTENSIONS, AttachmentTooLarge
+from src.metrics import ATTACHMENT_CACHE_LOOKUPS, DOWNLOAD_BYTES, DOWNLOAD_DURATION, DOWNLOADS
+from src.rate_limit import get_host_limiter
+
+# Concurrent downloads per Jira host: the window of the host's "download"
+# limiter scope, independent of the REST call window (see get_host_limiter).
+MAX_DOWNLOADS_PER_HOST = int(os.getenv("DOWNLOAD_MAX_PER_HOST", "6"))
+# Per-file cap; larger attachments are skipped.
+MAX_FILE_BYTES = int(os.getenv("DOWNLOAD_MAX_FILE_BYTES", str(200 * 1024 * 1024)))
+# Total bytes a single diagnosis may download across all attachments.
+MAX_TOTAL_BYTES = int(os.getenv("DOWNLOAD_MAX_TOTAL_BYTES", str(1024 * 1024 * 1024)))
+# Text logs larger than this are fetched head + tail only (via Range requests)
+# instead of being skipped or downloaded in full; 0 disables. Unset, it is
+# the per-file limit when logs are scanned on the process pool
+# (DIAG_LOG_PROCESSES >= 2, which splits large files across workers), so
+# logs up to DOWNLOAD_MAX_FILE_BYTES are scanned whole; without the pool, 64 MB.
+# Multi-GB logs also need DOWNLOAD_MAX_FILE_BYTES / DOWNLOAD_MAX_TOTAL_BYTES raised.
+LOG_HEAD_TAIL_THRESHOLD = int(os.getenv("DOWNLOAD_LOG_HEAD_TAIL_THRESHOLD", "-1"))
+SERIAL_LOG_HEAD_TAIL_THRESHOLD = 64 * 1024 * 1024
+LOG_HEAD_BYTES = int(os.getenv("DOWNLOAD_LOG_HEAD_BYTES", str(16 * 1024 * 1024)))
+LOG_TAIL_BYTES = int(os.getenv("DOWNLOAD_LOG_TAIL_BYTES", str(16 * 1024 * 1024)))
+
+
+class AttachmentDownloader:
+    """
+    Downloads batches of attachments concurrently on the connector's session.
+
+    One instance per diagnosis: it tracks the request's byte budget and keeps
+    a per-file timing record (``self.records``) for the trace. With a
+    ``cache`` (AttachmentCache), attachments seen before are served from
+    disk without touching Jira or the byte budget. Text logs above
+    ``log_head_tail_threshold`` are fetched as head + tail excerpts instead
+    of in full (see LOG_HEAD_TAIL_THRESHOLD for the default).
+    """
+
+    def __init__(self, max_file_bytes: int = MAX_FILE_BYTES, max_total_bytes: int = MAX_TOTAL_BYTES,
+                 max_per_host: int = MAX_DOWNLOADS_PER_HOST, cache: Optional[AttachmentCache] = None,
+                 log_head_tail_threshold: int = LOG_HEAD_TAIL_THRESHOLD,
+                 log_head_bytes: int = LOG_HEAD_BYTES, log_tail_bytes: int = LOG_TAIL_BYTES):
+        self.max_file_bytes = max_file_bytes
+        if log_head_tail_threshold < 0:
+            log_head_tail_threshold = max_file_bytes if LOG_PROCESSES >= 2 else SERIAL_LOG_HEAD_TAIL_THRESHOLD
+        self.log_head_tail_threshold = log_head_tail_threshold
+        self.log_head_bytes = log_head_bytes
+        self.log_tail_bytes = log_tail_bytes
+        self.max_total_bytes = max_total_bytes
+        self.max_per_host = max_per_host
+        self.cache = cache
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.records: List[Dict[str, Any]] = []
+        self._used_bytes = 0
+        self._lock = threading.Lock()
+
+    @property
+    def used_bytes(self) -> int:
+        return self._used_bytes
+
+    def _reserve(self, size: int) -> int:
+        """
+        Reserve budget for a file of (declared) size. Returns the max bytes the
+        transfer may write, or 0 if the budget cannot cover it.
+        """
+        with self._lock:
+            remaining = self.max_total_bytes - self._used_bytes
+            if remaining <= 0 or size > remaining:
+                return 0
+            self._used_bytes += size
+            return min(self.max_file_bytes, remaining)
+
+    def _settle(self, reserved: int, actual: int):
+        with self._lock:
+            self._used_bytes += actual - reserved
+
+    def _head_tail(self, attachment: Dict[str, Any], size: int) -> bool:
+        """
+        Whether a file should be fetched as head + tail excerpts only. Plain
+        text logs only: cutting an archive (LOG_ARCHIVE_EXTENSIONS) would
+        leave nothing decompressible, so those are always fetched in full.
+        """
+        return (
+            self.log_head_tail_threshold > 0
+            and size > self.log_head_tail_threshold
+            and size > self.log_head_bytes + self.log_tail_bytes
+            and attachment.get('filename', '').lower().endswith(LOG_EXTENSIONS)
+        )
+
+    def download_one(self, connector, attachment: Dict[str, Any], dest: str, label: str = "") -> Dict[str, Any]:
+        """Blocking single transfer with size/budget enforcement, caching and timing."""
+        record = {
+            "label": label,
+            "filename": attachment.get('filename', ''),
+            "path": dest,
+            "status": "ok",
+            "cached": False,
+            "bytes": 0,
+            "seconds": 0.0,
+            "mb_per_s": 0.0,
+            "resumes": 0,
+        }
+        size = int(attachment.get('size') or 0)
+        head_tail = self._head_tail(attachment, size)
+        if head_tail:
+            record["partial"] = "head_tail"
+            size = self.log_head_bytes + self.log_tail_bytes
+        key = attachment_key(connector.server_url, attachment) if self.cache is not None else None
+        if key and head_tail:
+            # Excerpts must never be served for a full-file lookup (and vice versa)
+            key += f"|head_tail:{self.log_head_bytes}:{self.log_tail_bytes}"
+        if key and self.cache.fetch(key, dest):
+            record["cached"] = True
+            record["bytes"] = os.path.getsize(dest)
+            self._count_cache("hit")
+        elif size > self.max_file_bytes:
+            record["status"] = "skipped"
+            record["error"] = f"size {size} exceeds per-file limit {self.max_file_bytes}"
+        else:
+            limit = self._reserve(size)
+            if not limit:
+                record["status"] = "skipped"
+                record["error"] = "request download budget exhausted"
+            else:
+                if key:
+                    self._count_cache("miss")
+                # Cacheable files are streamed into the cache's scratch area
+                # and published atomically once complete
+                target = self.cache.temp_path() if key else dest
+                start = time.perf_counter()
+                written = 0
+                transfer: Dict[str, Any] = {}
+                try:
+                    transfers = get_host_limiter(connector.server_url, self.max_per_host, scope="download", rate=0)
+                    with transfers.slot():
+                        if head_tail:
+                            written = connector.download_head_tail(
+                                attachment['url'], target, int(attachment['size']),
+                                self.log_head_bytes, self.log_tail_bytes
+                            )
+                        else:
+                            written = connector.download_attachment(
+                                attachment['url'], target, max_bytes=limit, stats=transfer, size=size or None
+                            )
+                    if key:
+                        self.cache.commit(key, target, dest)
+                except AttachmentTooLarge as e:
+                    record["status"] = "skipped"
+                    record["error"] = str(e)
+                except Exception as e:
+                    record["status"] = "failed"
+                    record["error"] = str(e)
+                finally:
+                    self._settle(size, written)
+                    if key and os.path.exists(target):
+                        os.remove(target)
+                elapsed = time.perf_counter() - start
+                record["bytes"] = written
+                record["seconds"] = round(elapsed, 3)
+                record["mb_per_s"] = round(written / (1024 * 1024) / elapsed, 2) if elapsed > 0 else 0.0
+                record["resumes"] = transfer.get("resumes", 0)
+                DOWNLOAD_BYTES.inc(written)
+                DOWNLOAD_DURATION.observe(record["seconds"])
+
+        DOWNLOADS.inc(status="cached" if record["cached"] else record["status"])
+        if record["status"] != "ok":
+            print(f"Download {record['status']} for {label} {record['filename']}: {record.get('error')}")
+        with self._lock:
+            self.records.append(record)
+        return record
+
+    def _count_cache(self, outcome: str):
+        ATTACHMENT_CACHE_LOOKUPS.inc(outcome=outcome)
+        with self._lock:
+            if outcome == "hit":
+                self.cache_hits += 1
+            else:
+                self.cache_misses += 1
+
+    async def download_all(self, connector, jobs: List[Tuple[Dict[str, Any], str, str]]) -> List[Dict[str, Any]]:
+        """
+        Download (attachment, dest, label) jobs concurrently on the download
+        pool. Returns one record per job, in job order.
+        """
+        return await asyncio.gather(
+            *(run_blocking("download", self.download_one, connector, att, dest, label) for att, dest, label in jobs)
+        )
@@ -0,0 +1,94 @@
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict, Optional
+
+# Worker threads per pipeline stage. Each stage gets its own bounded pool so a
+# burst of slow Gemini calls cannot starve Jira lookups (and vice versa).
+# Override per stage with DIAG_POOL_<STAGE>, e.g. DIAG_POOL_JIRA=32.
+DEFAULT_POOL_SIZES = {
+    "jira": 16,      # python-jira REST calls (issue fetch, search)
+    "ai": 8,         # Gemini generate_content (incl. retry backoff sleeps)
+    "download": 16,  # attachment downloads
+    "log": 4,        # LogProcessor scanning (CPU + disk)
+    "io": 4,         # misc filesystem work (cleanup, etc.)
+}
+
+# Worker processes for CPU-bound log scanning (LogProcessor splits large files
+# across them); 1 disables multi-process scanning.
+LOG_PROCESSES = int(os.getenv("DIAG_LOG_PROCESSES", str(os.cpu_count() or 1)))
+
+_pools: Dict[str, ThreadPoolExecutor] = {}
+_pools_lock = threading.Lock()
+_process_pool: Optional[ProcessPoolExecutor] = None
+
+
+def pool_size(stage: str) -> int:
+    """Configured worker count for a stage (env override, then default)."""
+    default = DEFAULT_POOL_SIZES.get(stage, 4)
+    try:
+        return max(1, int(os.getenv(f"DIAG_POOL_{stage.upper()}", default)))
+    except ValueError:
+        return default
+
+
+def get_pool(stage: str) -> ThreadPoolExecutor:
+    """Return the (lazily created) thread pool for a pipeline stage."""
+    pool = _pools.get(stage)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(stage)
+            if pool is None:
+                pool = ThreadPoolExecutor(max_workers=pool_size(stage), thread_name_prefix=f"diag-{stage}")
+                _pools[stage] = pool
+    return pool
+
+
+async def run_blocking(stage: str, fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """
+    Run a blocking call on the given stage's pool and await the result,
+    keeping the event loop free for other requests (and /health).
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_pool(stage), partial(fn, *args, **kwargs))
+
+
+def get_process_pool() -> Optional[ProcessPoolExecutor]:
+    """
+    Process-wide pool for CPU-bound work (created on first use), or None
+    when DIAG_LOG_PROCESSES < 2. Workers are spawned rather than forked:
+    forking a process that runs many threads can copy held locks.
+    """
+    global _process_pool
+    if LOG_PROCESSES < 2:
+        return None
+    with _pools_lock:
+        if _process_pool is None:
+            _process_pool = ProcessPoolExecutor(
+                max_workers=LOG_PROCESSES, mp_context=multiprocessing.get_context("spawn"))
+    return _process_pool
+
+
+def reset_process_pool():
+    """Drop a broken process pool (e.g. a worker was killed); the next call creates a new one."""
+    global _process_pool
+    with _pools_lock:
+        pool, _process_pool = _process_pool, None
+    if pool is not None:
+        pool.shutdown(wait=False)
+
+
+def shutdown_pools(wait: bool = True):
+    """Shut down all stage pools (called on application shutdown)."""
+    global _process_pool
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+        process_pool, _process_pool = _process_pool, None
+    for pool in pools:
+        pool.shutdown(wait=wait)
+    if process_pool is not None:
+        process_pool.shutdown(wait=wait)
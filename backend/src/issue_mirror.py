@@ -0,0 +1,353 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from src.bm25_index import BM25Index, query_weights
+
+ISSUE_MIRROR_PATH = os.getenv("DIAG_ISSUE_MIRROR_PATH", "data/mirror/issues.sqlite3")
+# A project whose last sync is older than this is not served from the mirror.
+MIRROR_MAX_STALENESS_SECONDS = int(os.getenv("DIAG_MIRROR_MAX_STALENESS_SECONDS", str(24 * 3600)))
+# Background delta sync interval for scopes synced via /mirror/sync (0 disables).
+MIRROR_SYNC_INTERVAL_SECONDS = int(os.getenv("DIAG_MIRROR_SYNC_INTERVAL_SECONDS", "900"))
+# Delta syncs re-read this much history before the newest `updated` seen.
+# JQL date literals are minute-granular and evaluated in the Jira user's
+# time zone, so the overlap has to absorb a time zone mismatch as well.
+MIRROR_SYNC_OVERLAP_MINUTES = int(os.getenv("DIAG_MIRROR_SYNC_OVERLAP_MINUTES", str(24 * 60)))
+
+# Query weight of core-intent terms relative to detail terms in BM25 ranking.
+INTENT_WEIGHT = float(os.getenv("DIAG_MIRROR_INTENT_WEIGHT", "2.0"))
+
+JIRA_TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%S.%f%z"
+
+
+def _scope_jql(project: str, issuetype: str) -> str:
+    return f'project = "{project}" AND issuetype = "{issuetype}"'
+
+
+def _jql_since(updated: str, overlap_minutes: int) -> Optional[str]:
+    """`updated >=` literal for a Jira timestamp, moved back by the overlap."""
+    try:
+        moment = datetime.strptime(updated, JIRA_TIMESTAMP_FORMAT)
+    except (TypeError, ValueError):
+        return None
+    return (moment - timedelta(minutes=overlap_minutes)).strftime("%Y/%m/%d %H:%M")
+
+
+def _search_text(issue: Dict[str, Any]) -> str:
+    parts = [issue.get("summary", ""), issue.get("description", ""), issue.get("steps_to_reproduce", "")]
+    parts.extend(c.get("body") or "" for c in issue.get("comments", []))
+    return "\n".join(p for p in parts if p)
+
+
+class IssueMirror:
+    """
+    SQLite mirror of historical issues for configured (server, project,
+    issuetype) scopes.
+
+    `sync` pulls every issue of a scope once and then only issues updated
+    since the last sync, storing the same dict `JiraConnector.get_issue`
+    returns. Candidate search (BM25 over a per-scope in-memory index) and
+    detail fetches can then be answered locally instead of full-text JQL.
+    Issues deleted in Jira are only dropped by a full sync, since delta
+    syncs cannot see deletions.
+    """
+
+    def __init__(self, path: str = ISSUE_MIRROR_PATH, max_staleness_seconds: int = MIRROR_MAX_STALENESS_SECONDS):
+        self.path = path
+        self.max_staleness_seconds = max_staleness_seconds
+        self._sync_locks: Dict[Tuple, threading.Lock] = {}
+        self._syncing: Dict[Tuple, Dict[str, Any]] = {}  # progress of running syncs
+        self._indexes: Dict[Tuple, Tuple[Optional[float], BM25Index]] = {}
+        self._index_locks: Dict[Tuple, threading.Lock] = {}
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS issues (
+                    server TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    project TEXT NOT NULL,
+                    issuetype TEXT NOT NULL,
+                    created TEXT NOT NULL,
+                    updated TEXT NOT NULL,
+                    summary TEXT NOT NULL,
+                    description TEXT NOT NULL,
+                    root_cause TEXT NOT NULL,
+                    search_text TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    synced REAL NOT NULL,
+                    PRIMARY KEY (server, key)
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_issues_scope ON issues(server, project, issuetype, created)")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS sync_state (
+                    server TEXT NOT NULL,
+                    project TEXT NOT NULL,
+                    issuetype TEXT NOT NULL,
+                    last_updated TEXT NOT NULL,
+                    last_run REAL NOT NULL,
+                    issues INTEGER NOT NULL,
+                    PRIMARY KEY (server, project, issuetype)
+                )
+            """)
+            conn.execute("PRAGMA journal_mode=WAL")
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """Short-lived connection; commits on success and always closes."""
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    # --- Sync ----------------------------------------------------------------
+
+    def sync(self, connector, project: str, issuetype: str, full: bool = False,
+             overlap_minutes: int = MIRROR_SYNC_OVERLAP_MINUTES) -> Dict[str, Any]:
+        """
+        Bring one scope up to date: everything on the first (or a `full`)
+        sync, afterwards only issues with `updated >=` the newest one seen.
+        Blocking; concurrent syncs of the same scope are serialized. While
+        it runs, stats() lists the scope under "syncing" with the issues
+        fetched so far.
+
+        Pages are read by issue key, which edits do not change, so an issue
+        updated mid-sync keeps its offset, and issues created mid-sync are
+        appended. An issue leaving the scope mid-sync (deleted, moved) still
+        shifts later offsets and skips one issue; that shows as a `total`
+        Jira reports shrinking between pages, or ending above the issues
+        read. Such a sync stores what it got but does not prune, and marks
+        the scope for a full sync next time.
+        """
+        server = connector.server_url.rstrip("/")
+        scope = (server, project, issuetype)
+        with self._lock:
+            sync_lock = self._sync_locks.setdefault(scope, threading.Lock())
+        with sync_lock:
+            state = self.sync_state(server, project, issuetype)
+            jql = _scope_jql(project, issuetype)
+            since = None
+            if state and not full:
+                since = _jql_since(state["last_updated"], overlap_minutes)
+            if since:
+                jql += f' AND updated >= "{since}"'
+            jql += " ORDER BY key ASC"
+
+            started = time.time()
+            stats: Dict[str, Any] = {}
+            last_updated = state["last_updated"] if state and not full else ""
+            batch: List[Dict[str, Any]] = []
+            seen = 0
+            reported = None  # match count of the latest page, as Jira reported it
+            shrank = False
+            progress = {"server": server, "project": project, "issuetype": issuetype,
+                        "mode": "delta" if since else "full", "started": started, "fetched": 0}
+            with self._lock:
+                self._syncing[scope] = progress
+            try:
+                for issue in connector.iter_issues(jql, stats=stats):
+                    if reported is not None and stats.get("total", reported) < reported:
+                        shrank = True
+                    reported = stats.get("total")
+                    batch.append(issue)
+                    seen += 1
+                    last_updated = max(last_updated, issue.get("updated") or "")
+                    if len(batch) >= 200:
+                        self._upsert(server, project, issuetype, batch)
+                        batch = []
+                        progress["fetched"] = seen
+                self._upsert(server, project, issuetype, batch)
+                complete = not shrank and seen >= (reported or 0)
+                if not complete:
+                    print(f"Mirror sync {server} {project}/{issuetype}: the result set shifted while paging "
+                          f"({seen} read, {reported} reported); next sync is full")
+                    last_updated = ""
+
+                with self._connect() as conn:
+                    if not since and complete:
+                        # Complete listing: drop issues that no longer match (deleted or moved)
+                        conn.execute(
+                            "DELETE FROM issues WHERE server = ? AND project = ? AND issuetype = ? AND synced < ?",
+                            (*scope, started)
+                        )
+                    total = conn.execute(
+                        "SELECT COUNT(*) FROM issues WHERE server = ? AND project = ? AND issuetype = ?", scope
+                    ).fetchone()[0]
+                    conn.execute(
+                        "INSERT OR REPLACE INTO sync_state (server, project, issuetype, last_updated, last_run, issues) "
+                        "VALUES (?, ?, ?, ?, ?, ?)",
+                        (server, project, issuetype, last_updated, started, total)
+                    )
+            finally:
+                with self._lock:
+                    self._syncing.pop(scope, None)
+        result = {
+            "server": server,
+            "project": project,
+            "issuetype": issuetype,
+            "mode": "delta" if since else "full",
+            "fetched": seen,
+            "complete": complete,
+            "issues": total,
+            "seconds": round(time.time() - started, 3),
+            **stats,
+        }
+        print(f"Mirror sync {server} {project}/{issuetype}: {result['mode']}, {seen} fetched, {total} stored")
+        return result
+
+    def _upsert(self, server: str, project: str, issuetype: str, issues: List[Dict[str, Any]]):
+        if not issues:
+            return
+        now = time.time()
+        rows = [
+            (server, issue["key"], project, issuetype, issue.get("created") or "", issue.get("updated") or "",
+             issue.get("summary") or "", issue.get("description") or "", issue.get("root_cause") or "N/A",
+             _search_text(issue), json.dumps(issue, ensure_ascii=False, default=str), now)
+            for issue in issues
+        ]
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO issues (server, key, project, issuetype, created, updated, summary, "
+                "description, root_cause, search_text, payload, synced) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+
+    # --- Queries ---------------------------------------------------------------
+
+    def sync_state(self, server: str, project: str, issuetype: str) -> Optional[Dict[str, Any]]:
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT last_updated, last_run, issues FROM sync_state WHERE server = ? AND project = ? AND issuetype = ?",
+                (server.rstrip("/"), project, issuetype)
+            ).fetchone()
+        if row is None:
+            return None
+        return {"last_updated": row[0], "last_run": row[1], "issues": row[2]}
+
+    def is_fresh(self, server: str, project: str, issuetype: str) -> bool:
+        """Whether a scope has been synced recently enough to be served locally."""
+        state = self.sync_state(server, project, issuetype)
+        return state is not None and time.time() - state["last_run"] <= self.max_staleness_seconds
+
+    def search(self, server: str, project: str, issuetype: str, intents: List[str], details: List[str],
+               max_results: int = 100) -> List[Dict[str, Any]]:
+        """
+        BM25-ranked candidates for the pipeline's keywords over summary,
+        description, steps and comments. Unlike the all-or-nothing JQL
+        clauses this always returns a graded list: every issue matching any
+        term, intents weighted above detail terms. Returns search stubs
+        (key, summary, description, root_cause, score), best first.
+        """
+        index = self.index(server, project, issuetype)
+        query = query_weights([(intents, INTENT_WEIGHT), (details, 1.0)])
+        return [dict(meta, score=score) for _, score, meta in index.search(query, top_k=max_results)]
+
+    def index(self, server: str, project: str, issuetype: str) -> BM25Index:
+        """The scope's BM25 index, rebuilt after each sync of the scope."""
+        scope = (server.rstrip("/"), project, issuetype)
+        state = self.sync_state(*scope)
+        version = state["last_run"] if state else None
+        with self._lock:
+            index_lock = self._index_locks.setdefault(scope, threading.Lock())
+        with index_lock:
+            cached = self._indexes.get(scope)
+            if cached is not None and cached[0] == version:
+                return cached[1]
+            started = time.perf_counter()
+            index = BM25Index()
+            with self._connect() as conn:
+                rows = conn.execute(
+                    "SELECT key, summary, description, root_cause, search_text FROM issues "
+                    "WHERE server = ? AND project = ? AND issuetype = ? ORDER BY created DESC",
+                    scope
+                )
+                for key, summary, description, root_cause, search_text in rows:
+                    index.add(key, search_text, {
+                        "key": key, "summary": summary, "description": description, "root_cause": root_cause,
+                    })
+            self._indexes[scope] = (version, index)
+            print(f"Built BM25 index for {scope[1]}/{scope[2]}: {len(index)} issues in {time.perf_counter() - started:.2f}s")
+            return index
+
+    def get_issues(self, server: str, issue_keys: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Mirrored issues of fresh scopes (see is_fresh) by key; unknown keys are absent."""
+        if not issue_keys:
+            return {}
+        keys = [k.upper() for k in issue_keys]
+        placeholders = ",".join("?" * len(keys))
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"SELECT i.key, i.payload FROM issues i JOIN sync_state s "
+                f"ON s.server = i.server AND s.project = i.project AND s.issuetype = i.issuetype "
+                f"WHERE i.server = ? AND i.key IN ({placeholders}) AND s.last_run >= ?",
+                [server.rstrip("/"), *keys, time.time() - self.max_staleness_seconds]
+            ).fetchall()
+        return {key: json.loads(payload) for key, payload in rows}
+
+    def stats(self) -> Dict[str, Any]:
+        with self._connect() as conn:
+            scopes = [
+                {"server": s, "project": p, "issuetype": t, "last_updated": u, "last_run": r, "issues": n}
+                for s, p, t, u, r, n in conn.execute(
+                    "SELECT server, project, issuetype, last_updated, last_run, issues FROM sync_state")
+            ]
+        with self._lock:
+            syncing = [dict(progress) for progress in self._syncing.values()]
+        return {"scopes": scopes, "syncing": syncing}
+
+
+class MirrorScheduler:
+    """
+    Daemon thread that periodically re-runs registered sync callables (one
+    per scope, registered by the /mirror/sync endpoint).
+    """
+
+    def __init__(self, interval_seconds: int = MIRROR_SYNC_INTERVAL_SECONDS):
+        self.interval_seconds = interval_seconds
+        self._jobs: Dict[Tuple, Callable[[], Any]] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def register(self, scope: Tuple, sync: Callable[[], Any]):
+        if self.interval_seconds <= 0:
+            return
+        with self._lock:
+            self._jobs[scope] = sync
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="mirror-sync", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval_seconds):
+            with self._lock:
+                jobs = list(self._jobs.items())
+            for scope, sync in jobs:
+                try:
+                    sync()
+                except Exception as e:
+                    print(f"Scheduled mirror sync failed for {scope}: {e}")
+
+    def stop(self):
+        self._stop.set()
+
+
+_issue_mirror: Optional[IssueMirror] = None
+_issue_mirror_lock = threading.Lock()
+
+
+def get_issue_mirror() -> IssueMirror:
+    """Process-wide issue mirror (created on first use)."""
+    global _issue_mirror
+    with _issue_mirror_lock:
+        if _issue_mirror is None:
+            _issue_mirror = IssueMirror()
+    return _issue_mirror
@@ -1,63 +1,113 @@
+import json
 import os
 import re
+import time
+import requests
 import urllib3
 from jira import JIRA
-from typing import List, Dict, Any
+from requests.adapters import HTTPAdapter
+from typing import List, Dict, Any, Iterator, Optional
+
+from src.jira_fields import DEFAULT_ROOT_CAUSE_FIELD, FieldPlan, get_field_metadata_cache
+from src.metrics import JIRA_SEARCH_BYTES, JIRA_SEARCH_PAGES
+from src.rate_limit import JiraThrottled, get_host_limiter
 
 # Disable SSL warnings
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
-class JiraConnector:
-    def __init__(self, server_url: str, username: str, token: str):
-        self.server_url = server_url
-        self.username = username
-        self.token = token
-        self.jira = None
-        self._connect()
+# Max simultaneous REST calls per Jira host, shared by every connector in the
+# process. Keeps parallel fan-out (e.g. candidate detail fetch) from
+# overwhelming a slow server / VPN link. This is the ceiling of the host's
+# adaptive window, which shrinks while the server throttles (see rate_limit).
+MAX_CONCURRENCY_PER_HOST = int(os.getenv("JIRA_MAX_CONCURRENCY_PER_HOST", "8"))
 
-    def _connect(self):
-        try:
-            # options = {"verify": False}
-            self.jira = JIRA(
-                server=self.server_url,
-                basic_auth=(self.username, self.token),
-                options={"verify": False},
-                timeout=30
-            )
-        except Exception as e:
-            print(f"Error connecting to Jira {self.server_url}: {e}")
-            raise
+# Keep-alive connections each connector's HTTP session holds per host. Must
+# cover the REST and download concurrency limits, otherwise requests has to
+# open (and discard) a fresh TLS connection for every overflowing call.
+MAX_CONNECTIONS_PER_HOST = int(os.getenv("JIRA_MAX_CONNECTIONS_PER_HOST", "16"))
+
+# Issues per REST search page.
+SEARCH_PAGE_SIZE = int(os.getenv("JIRA_SEARCH_PAGE_SIZE", "50"))
+
+# Issues per `key in (...)` query in bulk detail fetches.
+BULK_FETCH_BATCH_SIZE = int(os.getenv("JIRA_BULK_FETCH_BATCH_SIZE", "50"))
+
+# Streaming buffer for attachment downloads of unknown size; known sizes get
+# an adaptive buffer between the min and max below.
+DOWNLOAD_CHUNK_SIZE = int(os.getenv("JIRA_DOWNLOAD_CHUNK_SIZE", str(1024 * 1024)))
+DOWNLOAD_MIN_CHUNK_SIZE = 64 * 1024
+DOWNLOAD_MAX_CHUNK_SIZE = int(os.getenv("JIRA_DOWNLOAD_MAX_CHUNK_SIZE", str(8 * 1024 * 1024)))
+# Retries (resuming via Range where supported) for interrupted downloads.
+DOWNLOAD_RETRIES = int(os.getenv("JIRA_DOWNLOAD_RETRIES", "3"))
+
+# Attachment suffixes treated as images / text logs.
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.gif', '.bmp', '.webp')
+LOG_EXTENSIONS = ('.log', '.txt')
+# Compressed log bundles (.gz covers .tar.gz); LogProcessor streams their members.
+LOG_ARCHIVE_EXTENSIONS = ('.gz', '.tgz', '.zip')
+
+class AttachmentTooLarge(Exception):
+    """Raised when an attachment exceeds the allowed download size."""
+
+
+class IncompleteTransfer(Exception):
+    """Raised when a download ends before the declared Content-Length."""
+
+
+class RangeNotSupported(Exception):
+    """Raised when the server answers a partial-content request with the full body."""
+
+
+def adaptive_chunk_size(declared: int) -> int:
+    """
+    Read buffer for a transfer: about 1/16 of the file, clamped to
+    [64 KB, DOWNLOAD_MAX_CHUNK_SIZE]. Unknown sizes use DOWNLOAD_CHUNK_SIZE.
+    """
+    if declared <= 0:
+        return DOWNLOAD_CHUNK_SIZE
+    return max(DOWNLOAD_MIN_CHUNK_SIZE, min(DOWNLOAD_MAX_CHUNK_SIZE, declared // 16))
+
+
+class JiraIssueParser:
+    """
+    Turns raw Jira REST JSON into the pipeline's issue dicts. Shared by the
+    synchronous JiraConnector and the async client (src.async_jira), so both
+    return identical shapes.
+    """
+
+    def _parse_issue(self, raw: Dict[str, Any], plan: FieldPlan) -> Dict[str, Any]:
+        """Build the issue dict from the REST JSON (shared by single and bulk fetch)."""
+        issue_key = raw.get("key", "")
+        fields = raw.get("fields") or {}
 
-    def get_issue(self, issue_key: str) -> Dict[str, Any]:
-        issue = self.jira.issue(issue_key, expand="comments,attachments")
-        
         # Extract Attachments
         images = []
         logs = []
         all_attachments = []  # Keep track of all attachments for comment image matching
         
-        for attachment in issue.fields.attachment:
+        for attachment in fields.get("attachment") or []:
             item = {
-                "filename": attachment.filename,
-                "url": attachment.content,
-                "id": attachment.id,
-                "size": getattr(attachment, 'size', 0),
+                "filename": attachment.get("filename", ""),
+                "url": attachment.get("content", ""),
+                "id": attachment.get("id"),
+                "size": attachment.get("size", 0),
                 "source": "attachment"  # Mark source for traceability
             }
             all_attachments.append(item)
             
-            if attachment.filename.lower().endswith(('.png', '.jpg', '.jpeg', '.gif', '.bmp', '.webp')):
+            if item["filename"].lower().endswith(IMAGE_EXTENSIONS):
                 images.append(item)
-            elif attachment.filename.lower().endswith(('.log', '.txt')):
+            elif item["filename"].lower().endswith(LOG_EXTENSIONS + LOG_ARCHIVE_EXTENSIONS):
                 logs.append(item)
         
         # Extract Comments
         comments = []
-        for comment in issue.fields.comment.comments:
+        for comment in (fields.get("comment") or {}).get("comments", []):
+            author = comment.get("author") or {}
             comments.append({
-                "author": str(comment.author),
-                "body": comment.body,
-                "created": comment.created
+                "author": author.get("displayName") or author.get("name", ""),
+                "body": comment.get("body", ""),
+                "created": comment.get("created", "")
             })
         
         # Extract images referenced in comments
@@ -71,84 +121,45 @@ class JiraConnector:
                 images.append(ci)
                 existing_ids.add(ci['id'])
         
-        print(f"[{issue_key}] Found {len(images)} images ({len(comment_images)} from comments)")
-        
-        # Extract Steps to Reproduce (重现步骤) - probe common custom field IDs
-        steps_to_reproduce = self._extract_steps_to_reproduce(issue)
+        # Extract Steps to Reproduce (重现步骤) via the compiled field plan
+        steps_to_reproduce = self._extract_steps_to_reproduce(issue_key, fields, plan)
             
         return {
-            "key": issue.key,
-            "summary": issue.fields.summary,
-            "description": issue.fields.description or "",
+            "key": issue_key,
+            "summary": fields.get("summary") or "",
+            "description": fields.get("description") or "",
+            "created": fields.get("created") or "",
+            "updated": fields.get("updated") or "",
             "steps_to_reproduce": steps_to_reproduce,
+            "root_cause": self._extract_field_value(fields.get(plan.root_cause_field)) or "N/A",
             "attachments": logs + images,  # Compatibility
             "images": images,
             "logs": logs,
             "comments": comments
         }
 
-    def _extract_steps_to_reproduce(self, issue) -> str:
+    def _extract_steps_to_reproduce(self, issue_key: str, fields: Dict[str, Any], plan: FieldPlan) -> str:
         """
-        Extract "重现步骤" (Steps to Reproduce) from custom fields.
-        Probes common custom field IDs since the actual ID varies by Jira instance.
+        Extract "重现步骤" (Steps to Reproduce) using the field plan: the
+        resolved field if its name is known on this server, otherwise the
+        fallback custom field IDs the plan requested.
         """
-        # First, try to find by EXACT field name match (priority order matters)
-        try:
-            all_fields = self.jira.fields()
-            steps_field_id = None
-            
-            # Priority 1: Exact match for "重现步骤"
-            for field in all_fields:
-                field_name = field.get('name', '')
-                if field_name == '重现步骤':
-                    steps_field_id = field.get('id')
-                    print(f"[Steps to Reproduce] Found exact match: name='{field_name}', id='{steps_field_id}'")
-                    break
-            
-            # Priority 2: Other names if exact not found
-            if not steps_field_id:
-                for field in all_fields:
-                    field_name = field.get('name', '')
-                    if field_name in ['Steps to Reproduce', 'Repro Steps', 'STR', 'Reproduction Steps']:
-                        steps_field_id = field.get('id')
-                        print(f"[Steps to Reproduce] Found field: name='{field_name}', id='{steps_field_id}'")
-                        break
-            
-            if steps_field_id:
-                if hasattr(issue.fields, steps_field_id):
-                    value = getattr(issue.fields, steps_field_id)
-                    if value:
-                        extracted = self._extract_field_value(value)
-                        if extracted:
-                            print(f"[Steps to Reproduce] Successfully extracted {len(extracted)} chars from {steps_field_id}")
-                            return extracted
-                        
-        except Exception as e:
-            print(f"Warning: Could not query Jira fields metadata: {e}")
-        
-        # Fallback: probe a wider range of common custom field IDs
-        candidate_field_ids = [
-            'customfield_10014', 'customfield_10015', 'customfield_10016', 'customfield_10017',
-            'customfield_10018', 'customfield_10019', 'customfield_10020', 'customfield_10021',
-            'customfield_10100', 'customfield_10101', 'customfield_10102', 'customfield_10103',
-            'customfield_10200', 'customfield_10201', 'customfield_10202', 'customfield_10203',
-            'customfield_10300', 'customfield_10301', 'customfield_10400', 'customfield_10401',
-            'customfield_10500', 'customfield_10501', 'customfield_10600', 'customfield_10700',
-            'customfield_10800', 'customfield_10900', 'customfield_11000', 'customfield_11100',
-            'customfield_11200', 'customfield_11300', 'customfield_11400', 'customfield_11500',
-            'customfield_12000', 'customfield_12100', 'customfield_12200', 'customfield_12300',
-        ]
-        
-        for field_id in candidate_field_ids:
-            if hasattr(issue.fields, field_id):
-                value = getattr(issue.fields, field_id)
-                if value:
-                    extracted = self._extract_field_value(value)
-                    if extracted and len(extracted) > 50:  # Likely to be Steps to Reproduce if long
-                        print(f"[Steps to Reproduce] Found potential match in {field_id}: {len(extracted)} chars")
-                        return extracted
-        
-        print(f"[Steps to Reproduce] Could not find Steps to Reproduce field for {issue.key}")
+        if plan.steps_field:
+            value = fields.get(plan.steps_field)
+            extracted = self._extract_field_value(value) if value else ""
+            if extracted:
+                print(f"[Steps to Reproduce] Successfully extracted {len(extracted)} chars from {plan.steps_field}")
+            return extracted
+
+        for field_id in plan.fallback_steps_fields:
+            value = fields.get(field_id)
+            if value:
+                extracted = self._extract_field_value(value)
+                if extracted and len(extracted) > 50:  # Likely to be Steps to Reproduce if long
+                    print(f"[Steps to Reproduce] Found potential match in {field_id}: {len(extracted)} chars")
+                    return extracted
+
+        print(f"[Steps to Reproduce] Could not find Steps to Reproduce field for {issue_key}")
         return ""
 
     def _extract_field_value(self, value) -> str:
@@ -310,7 +321,7 @@ class JiraConnector:
                 # Remove query parameters if any
                 if '?' in filename:
                     filename = filename.split('?')[0]
-                if filename.lower().endswith(('.png', '.jpg', '.jpeg', '.gif', '.bmp', '.webp')):
+                if filename.lower().endswith(IMAGE_EXTENSIONS):
                     found_filenames.add(filename.lower())
         
         # Match found filenames against attachments
@@ -320,14 +331,325 @@ class JiraConnector:
         
         return comment_images
 
-    def download_attachment(self, url: str, destination_path: str):
-        response = self.jira._session.get(url, stream=True, verify=False)
-        with open(destination_path, 'wb') as f:
-            for chunk in response.iter_content(chunk_size=1024):
-                if chunk:
-                    f.write(chunk)
+    def _parse_search_stub(self, raw: Dict[str, Any], plan: FieldPlan) -> Dict[str, Any]:
+        fields = raw.get("fields") or {}
+        # Root cause field resolved by name in the field plan
+        # (customfield_10000 when the server has no such field)
+        return {
+            "key": raw.get("key"),
+            "summary": fields.get("summary") or "",
+            "description": fields.get("description") or "",
+            "root_cause": self._extract_field_value(fields.get(plan.root_cause_field)) or "N/A",
+        }
+
+
+class JiraConnector(JiraIssueParser):
+    def __init__(self, server_url: str, username: str, token: str):
+        self.server_url = server_url
+        self.username = username
+        self.token = token
+        self.jira = None
+        self._limiter = get_host_limiter(server_url, MAX_CONCURRENCY_PER_HOST)
+        self._connect()
+
+    def _connect(self):
+        try:
+            # options = {"verify": False}
+            self.jira = JIRA(
+                server=self.server_url,
+                basic_auth=(self.username, self.token),
+                options={"verify": False},
+                timeout=30,
+                # 429/503 retries are handled by the host rate limiter
+                max_retries=0
+            )
+        except Exception as e:
+            print(f"Error connecting to Jira {self.server_url}: {e}")
+            raise
+        adapter = HTTPAdapter(pool_maxsize=MAX_CONNECTIONS_PER_HOST)
+        self.jira._session.mount("https://", adapter)
+        self.jira._session.mount("http://", adapter)
+
+    def ping(self):
+        """Cheap liveness/auth check used by the connector pool."""
+        self._limiter.call(self.jira.server_info)
+
+    def close(self):
+        """Release the connector's keep-alive connections."""
+        if self.jira is not None:
+            self.jira.close()
+
+    def get_issue(self, issue_key: str) -> Dict[str, Any]:
+        plan = self.field_plan()
+        issue = self._limiter.call(
+            self.jira.issue, issue_key, fields=",".join(plan.issue_fields()), expand="comments,attachments")
+        result = self._parse_issue(issue.raw, plan)
+        comment_images = len([img for img in result["images"] if img["source"] == "comment"])
+        print(f"[{issue_key}] Found {len(result['images'])} images ({comment_images} from comments)")
+        return result
+
+    def get_issues(self, issue_keys: List[str], batch_size: int = BULK_FETCH_BATCH_SIZE) -> Dict[str, Any]:
+        """
+        Fetch several issues with batched `key in (...)` searches instead of
+        one request per issue. Returns {requested key (upper case): issue dict
+        in the get_issue shape, or the Exception for that key}. Keys that are
+        missing or not visible to this user map to a 404 error; a batch the
+        server rejects outright is retried key by key.
+        """
+        plan = self.field_plan()
+        url = self.jira._get_url("search")
+        fields = ",".join(plan.issue_fields())
+        keys = list(dict.fromkeys(k.strip().upper() for k in issue_keys if k.strip()))
+        results: Dict[str, Any] = {}
+        for i in range(0, len(keys), batch_size):
+            batch = keys[i:i + batch_size]
+            try:
+                response = self._limiter.call(self.jira._session.get, url, params={
+                    "jql": f"key in ({', '.join(batch)})",
+                    "maxResults": len(batch),
+                    "fields": fields,
+                    # Unknown/forbidden keys become warnings instead of failing the batch
+                    "validateQuery": "warn",
+                })
+                response.raise_for_status()
+                page = json.loads(response.content)
+            except JiraThrottled as e:
+                # Falling back to one call per key would only add load
+                results.update((key, e) for key in batch)
+                continue
+            except Exception as e:
+                print(f"Bulk fetch of {len(batch)} issues failed ({e}), fetching individually")
+                for key in batch:
+                    try:
+                        results[key] = self.get_issue(key)
+                    except Exception as e2:
+                        results[key] = e2
+                continue
+            for raw in page.get("issues", []):
+                results[raw.get("key", "").upper()] = self._parse_issue(raw, plan)
+            for key in batch:
+                if key not in results:
+                    results[key] = Exception(f"404 Issue {key} does not exist or is not visible")
+        return results
+
+    def _load_fields(self) -> List[Dict[str, Any]]:
+        return self._limiter.call(self.jira.fields)
+
+    def field_plan(self) -> FieldPlan:
+        """
+        Field IDs to request and extract for this server, compiled from field
+        metadata that is cached per server (see FieldMetadataCache).
+        """
+        try:
+            return get_field_metadata_cache().plan(self.server_url, self._load_fields)
+        except Exception as e:
+            print(f"Warning: Could not query Jira fields metadata: {e}")
+            return FieldPlan(None, DEFAULT_ROOT_CAUSE_FIELD)
+
+    def refresh_field_metadata(self):
+        """Drop the cached field metadata for this server (e.g. after a field was added)."""
+        get_field_metadata_cache().invalidate(self.server_url)
+
+    def get_issue_revision(self, issue_key: str) -> str:
+        """
+        Cheap revision probe: fetch only the issue's `updated` timestamp,
+        used to decide whether a cached diagnosis is still valid.
+        """
+        issue = self._limiter.call(self.jira.issue, issue_key, fields="updated")
+        return issue.fields.updated
 
-    def search_issues(self, jql: str, max_results: int = 5) -> List[Dict[str, Any]]:
+    def download_attachment(self, url: str, destination_path: str, max_bytes: int = None,
+                            chunk_size: int = None, retries: int = DOWNLOAD_RETRIES,
+                            stats: Optional[Dict[str, Any]] = None, size: int = None) -> int:
+        """
+        Stream an attachment to disk over the connector's keep-alive session.
+        Returns the number of bytes written.
+
+        `size` (the attachment metadata's size, if known) rejects files over
+        max_bytes before any request; otherwise the response's Content-Length
+        does, before the body is read (AttachmentTooLarge, also raised if the
+        stream overruns). The read buffer scales with the file size. An
+        interrupted transfer is retried up to `retries` times, resuming with
+        an HTTP Range request unless the server refused ranges (Accept-Ranges:
+        none, or a full 200 response to a Range request). Requests go through
+        the host rate limiter. Non-2xx responses raise. The partial file is
+        removed on failure. `stats` (optional) receives the declared size,
+        chunk size and number of resumes.
+        """
+        declared = size or 0
+        if max_bytes is not None and declared > max_bytes:
+            raise AttachmentTooLarge(f"{declared} bytes exceeds limit of {max_bytes} bytes")
+        if stats is not None:
+            stats.update(declared_bytes=declared, chunk_size=chunk_size, resumes=0)
+
+        accepts_ranges = True  # until the server shows otherwise
+        written = 0
+        attempt = 0
+        try:
+            with open(destination_path, 'wb') as f:
+                while True:
+                    headers = {'Range': f'bytes={written}-'} if written and accepts_ranges else {}
+                    try:
+                        response = self._limiter.call(
+                            self.jira._session.get, url, stream=True, verify=False, headers=headers)
+                        with response:
+                            response.raise_for_status()
+                            if response.headers.get('Accept-Ranges', '').lower() == 'none':
+                                accepts_ranges = False
+                            if written and response.status_code != 206:
+                                # Range ignored: the body starts from byte 0 again
+                                accepts_ranges = False
+                                f.seek(0)
+                                f.truncate()
+                                written = 0
+                            if not written:
+                                length = int(response.headers.get('Content-Length') or 0)
+                                if max_bytes is not None and length > max_bytes:
+                                    raise AttachmentTooLarge(f"{length} bytes exceeds limit of {max_bytes} bytes")
+                                declared = declared or length
+                            if chunk_size is None:
+                                chunk_size = adaptive_chunk_size(declared)
+                                if stats is not None:
+                                    stats.update(declared_bytes=declared, chunk_size=chunk_size)
+                            for chunk in response.iter_content(chunk_size=chunk_size):
+                                if chunk:
+                                    written += len(chunk)
+                                    if max_bytes is not None and written > max_bytes:
+                                        raise AttachmentTooLarge(f"more than {max_bytes} bytes streamed")
+                                    f.write(chunk)
+                        if declared and written < declared:
+                            raise IncompleteTransfer(f"connection closed after {written} of {declared} bytes")
+                        break
+                    except (requests.ConnectionError, requests.Timeout,
+                            requests.exceptions.ChunkedEncodingError, IncompleteTransfer) as e:
+                        attempt += 1
+                        if attempt > retries:
+                            raise
+                        if not accepts_ranges:
+                            f.seek(0)
+                            f.truncate()
+                            written = 0
+                        if stats is not None:
+                            stats["resumes"] += 1
+                        print(f"Download of {url} interrupted at {written} bytes ({e}); retry {attempt}/{retries}")
+                        time.sleep(min(0.5 * 2 ** (attempt - 1), 5))
+        except Exception:
+            if os.path.exists(destination_path):
+                os.remove(destination_path)
+            raise
+        return written
+
+    def download_head_tail(self, url: str, destination_path: str, size: int, head_bytes: int,
+                           tail_bytes: int) -> int:
+        """
+        Fetch only the first `head_bytes` and last `tail_bytes` of a large
+        text attachment with Range requests, joined by an omission marker
+        line. If the server cannot serve a suffix range, only the head is
+        kept. Returns the number of attachment bytes written.
+        """
+        written = 0
+        try:
+            with open(destination_path, 'wb') as f:
+                written += self._fetch_range(url, f, f"bytes=0-{head_bytes - 1}", head_bytes)
+                omitted = max(size - head_bytes - tail_bytes, 0)
+                try:
+                    tail = self._fetch_range(url, f, f"bytes=-{tail_bytes}", tail_bytes, marker=(
+                        f"\n... [{omitted} bytes omitted: first {head_bytes} and last {tail_bytes} bytes shown] ...\n"))
+                except RangeNotSupported:
+                    f.write(f"\n... [truncated after {head_bytes} of {size} bytes] ...\n".encode("utf-8"))
+                    tail = 0
+                written += tail
+        except Exception:
+            if os.path.exists(destination_path):
+                os.remove(destination_path)
+            raise
+        return written
+
+    def _fetch_range(self, url: str, f, range_header: str, limit: int, marker: str = "") -> int:
+        """Append up to `limit` bytes of a Range request to f (preceded by `marker`)."""
+        written = 0
+        response = self._limiter.call(
+            self.jira._session.get, url, stream=True, verify=False, headers={'Range': range_header})
+        with response:
+            response.raise_for_status()
+            if response.status_code != 206 and not range_header.startswith("bytes=0-"):
+                raise RangeNotSupported(range_header)
+            if marker:
+                f.write(marker.encode("utf-8"))
+            # A 200 for the head range is the whole file: read the prefix and drop the connection
+            for chunk in response.iter_content(chunk_size=adaptive_chunk_size(limit)):
+                chunk = chunk[:limit - written]
+                f.write(chunk)
+                written += len(chunk)
+                if written >= limit:
+                    break
+        return written
+
+    def _iter_search_pages(self, jql: str, fields: str, max_results: Optional[int], page_size: int,
+                           stats: Optional[Dict[str, Any]] = None) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Yield raw issue JSON lists, one per REST search page, until
+        `max_results` issues (None: all matches) have been returned. Pages are
+        fetched lazily, so a caller that stops iterating early never pays for
+        the remaining pages.
+
+        If `stats` is given it accumulates pages, payload bytes, and request /
+        parse seconds for the search, and keeps the match count Jira reported
+        on the latest page as "total".
+        """
+        url = self.jira._get_url("search")
+        fetched = 0
+        start_at = 0
+        while max_results is None or fetched < max_results:
+            limit = page_size if max_results is None else min(page_size, max_results - fetched)
+            started = time.perf_counter()
+            response = self._limiter.call(self.jira._session.get, url, params={
+                "jql": jql, "startAt": start_at, "maxResults": limit, "fields": fields,
+            })
+            response.raise_for_status()
+            body = response.content
+            fetched_at = time.perf_counter()
+            page = json.loads(body)
+            issues = page.get("issues", [])
+            JIRA_SEARCH_PAGES.inc()
+            JIRA_SEARCH_BYTES.inc(len(body))
+            if stats is not None:
+                stats["pages"] = stats.get("pages", 0) + 1
+                stats["payload_bytes"] = stats.get("payload_bytes", 0) + len(body)
+                stats["request_seconds"] = round(stats.get("request_seconds", 0) + fetched_at - started, 4)
+                stats["parse_seconds"] = round(stats.get("parse_seconds", 0) + time.perf_counter() - fetched_at, 4)
+                stats["total"] = page.get("total", 0)
+
+            yield issues if max_results is None else issues[:max_results - fetched]
+            fetched += len(issues)
+            start_at += len(issues)
+            if not issues or start_at >= page.get("total", 0):
+                break
+
+    def iter_search_issues(self, jql: str, max_results: int = 5, page_size: int = SEARCH_PAGE_SIZE,
+                           stats: Optional[Dict[str, Any]] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Yield search result stubs (key, summary, description, root_cause) page
+        by page, requesting only the search fields of the field plan.
+        """
+        plan = self.field_plan()
+        for issues in self._iter_search_pages(jql, ",".join(plan.search_fields()), max_results, page_size, stats):
+            for raw in issues:
+                yield self._parse_search_stub(raw, plan)
+
+    def iter_issues(self, jql: str, page_size: int = SEARCH_PAGE_SIZE,
+                    stats: Optional[Dict[str, Any]] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Yield every issue matching `jql` as a full get_issue-shaped dict
+        (used by the local issue mirror to sync whole projects).
+        """
+        plan = self.field_plan()
+        for issues in self._iter_search_pages(jql, ",".join(plan.issue_fields()), None, page_size, stats):
+            for raw in issues:
+                yield self._parse_issue(raw, plan)
+
+    def search_issues(self, jql: str, max_results: int = 5,
+                      stats: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
         # If it's already a complex JQL (contains ~, =, OR), use it directly
         # Otherwise, wrap it in a text search
         if not any(op in jql for op in ['~', '=', 'OR', 'AND']):
@@ -336,22 +658,10 @@ class JiraConnector:
         print(f"Executing JQL: {jql}")
         
         try:
-            issues = self.jira.search_issues(jql, maxResults=max_results)
-            results = []
-            for issue in issues:
-                # Attempt to find a root cause field, or use a default
-                # customfield_10000 is often used but varies by Jira instance
-                rc = "N/A"
-                if hasattr(issue.fields, "customfield_10000") and issue.fields.customfield_10000:
-                    rc = str(issue.fields.customfield_10000)
-                
-                results.append({
-                    "key": issue.key,
-                    "summary": issue.fields.summary,
-                    "description": issue.fields.description or "",
-                    "root_cause": rc
-                })
-            return results
+            return list(self.iter_search_issues(jql, max_results=max_results, stats=stats))
+        except JiraThrottled:
+            # An empty result here would read as "no similar issues"; let the caller fail loudly
+            raise
         except Exception as e:
             print(f"Jira search failed for JQL '{jql}': {e}")
             return []
@@ -0,0 +1,142 @@
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Field metadata (GET /field) is re-fetched after this long, so newly added
+# custom fields are eventually picked up without a restart.
+FIELD_METADATA_TTL_SECONDS = int(os.getenv("JIRA_FIELD_METADATA_TTL_SECONDS", "3600"))
+
+# Field names, in priority order, that hold "Steps to Reproduce".
+STEPS_FIELD_NAMES = ['重现步骤', 'Steps to Reproduce', 'Repro Steps', 'STR', 'Reproduction Steps']
+# Field names, in priority order, that hold the root cause of a resolved issue.
+ROOT_CAUSE_FIELD_NAMES = ['根本原因', '根因', '根因分析', 'Root Cause', 'Root Cause Analysis']
+# Used when no root-cause field can be resolved by name.
+DEFAULT_ROOT_CAUSE_FIELD = 'customfield_10000'
+
+# Probed (content > 50 chars) when no steps field can be resolved by name.
+FALLBACK_STEPS_FIELD_IDS = [
+    'customfield_10014', 'customfield_10015', 'customfield_10016', 'customfield_10017',
+    'customfield_10018', 'customfield_10019', 'customfield_10020', 'customfield_10021',
+    'customfield_10100', 'customfield_10101', 'customfield_10102', 'customfield_10103',
+    'customfield_10200', 'customfield_10201', 'customfield_10202', 'customfield_10203',
+    'customfield_10300', 'customfield_10301', 'customfield_10400', 'customfield_10401',
+    'customfield_10500', 'customfield_10501', 'customfield_10600', 'customfield_10700',
+    'customfield_10800', 'customfield_10900', 'customfield_11000', 'customfield_11100',
+    'customfield_11200', 'customfield_11300', 'customfield_11400', 'customfield_11500',
+    'customfield_12000', 'customfield_12100', 'customfield_12200', 'customfield_12300',
+]
+
+# Standard fields every issue fetch needs.
+BASE_ISSUE_FIELDS = ['summary', 'description', 'created', 'updated', 'attachment', 'comment']
+
+
+def _resolve(all_fields: List[Dict[str, Any]], names: List[str]) -> Optional[str]:
+    """Field ID of the first name (in priority order) present in the metadata."""
+    by_name: Dict[str, str] = {}
+    for field in all_fields:
+        by_name.setdefault(field.get('name', ''), field.get('id'))
+    for name in names:
+        if by_name.get(name):
+            return by_name[name]
+    return None
+
+
+class FieldPlan:
+    """
+    Compiled field resolution for one Jira server: which concrete field IDs
+    hold the values the pipeline extracts, and the exact `fields=` projection
+    an issue fetch has to request.
+    """
+
+    def __init__(self, steps_field: Optional[str], root_cause_field: str):
+        self.steps_field = steps_field
+        self.root_cause_field = root_cause_field
+        # Only probe the wide fallback set when the steps field is unknown
+        self.fallback_steps_fields = [] if steps_field else list(FALLBACK_STEPS_FIELD_IDS)
+
+    @classmethod
+    def compile(cls, all_fields: List[Dict[str, Any]]) -> "FieldPlan":
+        steps_field = _resolve(all_fields, STEPS_FIELD_NAMES)
+        root_cause_field = _resolve(all_fields, ROOT_CAUSE_FIELD_NAMES) or DEFAULT_ROOT_CAUSE_FIELD
+        print(f"[Field plan] steps_to_reproduce={steps_field or 'unresolved'}, root_cause={root_cause_field}")
+        return cls(steps_field, root_cause_field)
+
+    def issue_fields(self) -> List[str]:
+        """Field IDs requested by a full issue fetch."""
+        fields = list(BASE_ISSUE_FIELDS)
+        if self.steps_field:
+            fields.append(self.steps_field)
+        fields.append(self.root_cause_field)
+        fields.extend(f for f in self.fallback_steps_fields if f not in fields)
+        return fields
+
+    def search_fields(self) -> List[str]:
+        """Field IDs requested for search result stubs."""
+        return ['summary', 'description', self.root_cause_field]
+
+
+class FieldMetadataCache:
+    """
+    Per-server cache of Jira field metadata and the FieldPlan compiled from
+    it, shared by every connector in the process. Entries expire after
+    `ttl_seconds`; `invalidate` forces a refresh.
+    """
+
+    def __init__(self, ttl_seconds: int = FIELD_METADATA_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self._entries: Dict[str, Tuple[float, List[Dict[str, Any]], FieldPlan]] = {}
+        self._server_locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self.loads = 0
+
+    def _entry(self, server_url: str, loader: Callable[[], List[Dict[str, Any]]]):
+        key = server_url.rstrip("/")
+        with self._lock:
+            server_lock = self._server_locks.setdefault(key, threading.Lock())
+        # Per-server lock: concurrent fetches share a single GET /field, and a
+        # slow server does not hold up lookups for another one
+        with server_lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.time() - entry[0] <= self.ttl_seconds:
+                return entry
+            all_fields = loader()
+            entry = (time.time(), all_fields, FieldPlan.compile(all_fields))
+            with self._lock:
+                self._entries[key] = entry
+                self.loads += 1
+            return entry
+
+    def fields(self, server_url: str, loader: Callable[[], List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        return self._entry(server_url, loader)[1]
+
+    def plan(self, server_url: str, loader: Callable[[], List[Dict[str, Any]]]) -> FieldPlan:
+        return self._entry(server_url, loader)[2]
+
+    def cached_plan(self, server_url: str) -> Optional[FieldPlan]:
+        """The server's plan if it is cached and fresh, else None (never loads)."""
+        entry = self._entries.get(server_url.rstrip("/"))
+        if entry is None or time.time() - entry[0] > self.ttl_seconds:
+            return None
+        return entry[2]
+
+    def invalidate(self, server_url: Optional[str] = None):
+        """Forget one server's metadata, or every server's when none is given."""
+        with self._lock:
+            if server_url is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(server_url.rstrip("/"), None)
+
+
+_field_cache: Optional[FieldMetadataCache] = None
+_field_cache_lock = threading.Lock()
+
+
+def get_field_metadata_cache() -> FieldMetadataCache:
+    """Process-wide field metadata cache (created on first use)."""
+    global _field_cache
+    with _field_cache_lock:
+        if _field_cache is None:
+            _field_cache = FieldMetadataCache()
+    return _field_cache
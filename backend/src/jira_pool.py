@@ -0,0 +1,174 @@
+import hashlib
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from src.jira_connector import JiraConnector
+
+# Connectors unused for this long are closed and dropped from the pool.
+POOL_IDLE_SECONDS = int(os.getenv("JIRA_POOL_IDLE_SECONDS", "900"))
+# A connector idle for longer than this is health-checked (server info) before reuse.
+POOL_HEALTHCHECK_SECONDS = int(os.getenv("JIRA_POOL_HEALTHCHECK_SECONDS", "120"))
+
+
+def pool_key(server_url: str, username: str, token: str) -> Tuple[str, str, str]:
+    """(server, user, credential hash): the secret itself is never kept as a key."""
+    digest = hashlib.sha256((token or "").encode("utf-8")).hexdigest()
+    return (server_url.rstrip("/"), username, digest)
+
+
+class _Entry:
+    def __init__(self, connector):
+        self.connector = connector
+        self.created = time.time()
+        self.last_used = self.created
+        self.uses = 0
+        self.leases = 0  # callers holding the connector (get() without release())
+
+
+class JiraConnectorPool:
+    """
+    Process-wide pool of authenticated JiraConnectors.
+
+    Connectors (and the keep-alive HTTP session inside each) are created on
+    first use and shared by every diagnosis with the same server and
+    credentials. Concurrent first users of a key wait for a single
+    handshake. Every get() leases the connector until the matching
+    release(); only connectors nobody holds are evicted when idle, and one
+    that sat idle past the health-check interval is pinged before being
+    handed out again.
+    """
+
+    def __init__(self, factory: Callable[..., Any] = JiraConnector,
+                 idle_seconds: int = POOL_IDLE_SECONDS,
+                 healthcheck_seconds: int = POOL_HEALTHCHECK_SECONDS):
+        self.factory = factory
+        self.idle_seconds = idle_seconds
+        self.healthcheck_seconds = healthcheck_seconds
+        self._entries: Dict[Tuple, _Entry] = {}
+        self._key_locks: Dict[Tuple, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self.created_count = 0
+        self.evicted_count = 0
+
+    def _key_lock(self, key: Tuple) -> threading.Lock:
+        with self._lock:
+            lock = self._key_locks.get(key)
+            if lock is None:
+                lock = self._key_locks[key] = threading.Lock()
+            return lock
+
+    def get(self, server_url: str, username: str, token: str):
+        """
+        Lease a pooled connector, creating it (blocking handshake) if needed.
+        Pair every call with release(connector).
+        """
+        key = pool_key(server_url, username, token)
+        self.evict_idle()
+        with self._key_lock(key):
+            with self._lock:
+                entry = self._entries.get(key)
+            if entry is not None and not entry.leases and \
+                    time.time() - entry.last_used > self.healthcheck_seconds:
+                if not self._healthy(entry.connector):
+                    print(f"Pooled Jira connector for {server_url} failed health check, reconnecting")
+                    self._discard(key, entry)
+                    entry = None
+            if entry is None:
+                entry = _Entry(self.factory(server_url, username, token))
+                with self._lock:
+                    self._entries[key] = entry
+                    self.created_count += 1
+            with self._lock:
+                entry.last_used = time.time()
+                entry.uses += 1
+                entry.leases += 1
+            return entry.connector
+
+    def release(self, connector):
+        """End a lease from get(); the idle time of the connector starts now."""
+        with self._lock:
+            for entry in self._entries.values():
+                if entry.connector is connector:
+                    entry.leases = max(entry.leases - 1, 0)
+                    entry.last_used = time.time()
+                    return
+
+    @contextmanager
+    def lease(self, server_url: str, username: str, token: str):
+        """get() and release() around a block."""
+        connector = self.get(server_url, username, token)
+        try:
+            yield connector
+        finally:
+            self.release(connector)
+
+    def _healthy(self, connector) -> bool:
+        ping = getattr(connector, "ping", None)
+        if ping is None:
+            return True
+        try:
+            ping()
+            return True
+        except Exception as e:
+            print(f"Jira health check failed: {e}")
+            return False
+
+    def _discard(self, key: Tuple, entry: _Entry):
+        with self._lock:
+            if self._entries.get(key) is entry:
+                del self._entries[key]
+                self.evicted_count += 1
+        close = getattr(entry.connector, "close", None)
+        if close is not None:
+            try:
+                close()
+            except Exception:
+                pass
+
+    def evict_idle(self) -> int:
+        """Close connectors nobody holds and unused for longer than idle_seconds. Returns how many."""
+        cutoff = time.time() - self.idle_seconds
+        with self._lock:
+            stale = [(k, e) for k, e in self._entries.items() if not e.leases and e.last_used < cutoff]
+        for key, entry in stale:
+            self._discard(key, entry)
+        return len(stale)
+
+    def invalidate(self, server_url: str, username: str, token: str):
+        """Drop the connector for these credentials (e.g. after an auth failure)."""
+        key = pool_key(server_url, username, token)
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is not None:
+            self._discard(key, entry)
+
+    def close_all(self):
+        with self._lock:
+            entries = list(self._entries.items())
+        for key, entry in entries:
+            self._discard(key, entry)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "connectors": len(self._entries),
+                "leased": sum(1 for e in self._entries.values() if e.leases),
+                "created": self.created_count,
+                "evicted": self.evicted_count,
+            }
+
+
+_connector_pool: Optional[JiraConnectorPool] = None
+_connector_pool_lock = threading.Lock()
+
+
+def get_connector_pool() -> JiraConnectorPool:
+    """Process-wide connector pool (created on first use)."""
+    global _connector_pool
+    with _connector_pool_lock:
+        if _connector_pool is None:
+            _connector_pool = JiraConnectorPool()
+    return _connector_pool
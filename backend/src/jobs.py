@@ -0,0 +1,203 @@
+import asyncio
+import os
+import queue
+import threading
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+
+from src.pipeline import request_key
+
+# Diagnoses processed in parallel by the job workers.
+JOB_WORKERS = int(os.getenv("DIAG_JOB_WORKERS", "4"))
+# Jobs that may wait for a worker before submissions are rejected.
+JOB_QUEUE_DEPTH = int(os.getenv("DIAG_JOB_QUEUE_DEPTH", "100"))
+# How long finished jobs stay available for polling.
+JOB_RETENTION_SECONDS = int(os.getenv("DIAG_JOB_RETENTION_SECONDS", "3600"))
+
+
+class QueueFull(Exception):
+    """Raised when the job queue is at capacity."""
+
+
+class Job:
+    """A queued diagnosis (or other job request) plus its progress events and outcome."""
+
+    def __init__(self, req, key: Tuple):
+        self.id = uuid.uuid4().hex
+        self.request = req
+        self.dedup_key = key
+        self.status = "queued"  # queued -> running -> succeeded | failed
+        self.created = time.time()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self.submissions = 1
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[Dict[str, Any]] = None
+        self.events: List[Tuple[str, Dict[str, Any]]] = []
+        self._lock = threading.Lock()
+        self._waiters: List[Tuple[asyncio.AbstractEventLoop, asyncio.Event]] = []
+
+    @property
+    def done(self) -> bool:
+        return self.status in ("succeeded", "failed")
+
+    def add_event(self, event: str, data: Dict[str, Any]):
+        """Record a progress event (called from the worker thread)."""
+        with self._lock:
+            self.events.append((event, data))
+        self._notify()
+
+    def finish(self, status: str):
+        """Mark the job done and wake subscribers waiting for more events."""
+        self.finished = time.time()
+        self.status = status
+        self._notify()
+
+    def _notify(self):
+        with self._lock:
+            waiters = list(self._waiters)
+        for loop, flag in waiters:
+            try:
+                loop.call_soon_threadsafe(flag.set)
+            except RuntimeError:
+                pass  # subscriber's loop already closed
+
+    async def wait_for_events(self, seen: int, timeout: float = 15.0):
+        """Wait (without blocking the loop) for more than `seen` events or job completion."""
+        flag = asyncio.Event()
+        waiter = (asyncio.get_running_loop(), flag)
+        with self._lock:
+            if len(self.events) > seen or self.done:
+                return
+            self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(flag.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            with self._lock:
+                self._waiters.remove(waiter)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Public view of the job (never includes the request credentials)."""
+        data = {"job_id": self.id}
+        if hasattr(self.request, "issue_key"):
+            data["issue_key"] = self.request.issue_key
+        data.update({
+            "status": self.status,
+            "created": self.created,
+            "started": self.started,
+            "finished": self.finished,
+            "submissions": self.submissions,
+            "events": len(self.events),
+        })
+        if self.result is not None:
+            data["result"] = self.result
+        if self.error is not None:
+            data["error"] = self.error
+        return data
+
+
+class JobManager:
+    """
+    Bounded queue of diagnosis jobs processed by a pool of worker threads.
+
+    Each worker runs the async pipeline in its own event loop, so jobs keep
+    running independently of the HTTP request that submitted them. A
+    submission identical to a queued or running job (see ``request_key``)
+    attaches to that job instead of starting a new pipeline run. Other
+    long-running requests (mirror syncs) use their own manager with their
+    own runner and identity `key`.
+    """
+
+    def __init__(self, runner: Callable[..., Awaitable[Dict[str, Any]]],
+                 workers: int = JOB_WORKERS, max_queue: int = JOB_QUEUE_DEPTH,
+                 retention_seconds: int = JOB_RETENTION_SECONDS,
+                 key: Callable[[Any], Tuple] = request_key, name: str = "diag-job"):
+        self.runner = runner
+        self.key = key
+        self.name = name
+        self.workers = workers
+        self.retention_seconds = retention_seconds
+        self._queue: "queue.Queue[Optional[Job]]" = queue.Queue(maxsize=max_queue)
+        self._jobs: Dict[str, Job] = {}
+        self._inflight: Dict[Tuple, Job] = {}
+        self._lock = threading.Lock()
+        self._threads: List[threading.Thread] = []
+
+    def _ensure_workers(self):
+        if self._threads:
+            return
+        for i in range(self.workers):
+            t = threading.Thread(target=self._worker, name=f"{self.name}-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def submit(self, req) -> Tuple[Job, bool]:
+        """Queue a request. Returns (job, deduplicated)."""
+        key = self.key(req)
+        with self._lock:
+            self._prune()
+            existing = self._inflight.get(key)
+            if existing is not None:
+                existing.submissions += 1
+                return existing, True
+
+            job = Job(req, key)
+            try:
+                self._queue.put_nowait(job)
+            except queue.Full:
+                raise QueueFull(f"Job queue is full ({self._queue.maxsize} jobs waiting)")
+            self._jobs[job.id] = job
+            self._inflight[key] = job
+            self._ensure_workers()
+        return job, False
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "queued": self._queue.qsize(),
+                "inflight": len(self._inflight),
+                "retained": len(self._jobs),
+            }
+
+    def _prune(self):
+        cutoff = time.time() - self.retention_seconds
+        for job_id in [j.id for j in self._jobs.values() if j.done and j.finished < cutoff]:
+            del self._jobs[job_id]
+
+    def _worker(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            job.status = "running"
+            job.started = time.time()
+            try:
+                job.result = asyncio.run(self.runner(job.request, emit=job.add_event))
+                outcome = ("succeeded", "result", job.result)
+            except HTTPException as e:
+                job.error = {"status_code": e.status_code, "detail": e.detail}
+                outcome = ("failed", "error", job.error)
+            except Exception as e:
+                job.error = {"status_code": 500, "detail": str(e)}
+                outcome = ("failed", "error", job.error)
+            with self._lock:
+                if self._inflight.get(job.dedup_key) is job:
+                    del self._inflight[job.dedup_key]
+            # Final event first, then the status flip, so subscribers that stop
+            # on `done` never miss the result
+            job.add_event(outcome[1], outcome[2])
+            job.finish(outcome[0])
+
+    def shutdown(self):
+        for _ in self._threads:
+            self._queue.put(None)
+        self._threads = []
@@ -0,0 +1,173 @@
+import os
+import re
+from collections import Counter
+from typing import Any, Dict, List, Tuple
+
+from src.log_processor import SEPARATOR, fingerprint_section, render_sections
+from src.log_templates import TemplateMiner
+
+# Token budget shared by the log fingerprints of all files of one issue
+# (the combined_logs block of the analysis prompt); 0 disables the limit.
+LOG_BUDGET_TOKENS = int(os.getenv("DIAG_LOG_BUDGET_TOKENS", "24000"))
+# Largest share of the budget a single snippet may take; longer ones are cut.
+LOG_BUDGET_MAX_UNIT_SHARE = 0.25
+
+# Signals that rank a snippet wherever they appear in it: diagnostic trouble
+# codes, UDS negative responses (NRC or "7F <SID> <NRC>") and fatal-level messages.
+_DTC_RE = re.compile(r"\bDTC\b|\b[PCBU][0-9A-F]{4}(?:-[0-9A-F]{2})?\b")
+_NRC_RE = re.compile(r"\bNRC\b|negative response|\b7F\s+[0-9A-F]{2}\s+[0-9A-F]{2}\b", re.IGNORECASE)
+_SEVERE_RE = re.compile(r"\b(?:fatal|critical|panic)\b", re.IGNORECASE)
+SIGNAL_WEIGHTS = {"dtc": 4.0, "nrc": 3.0, "severe": 3.0, "rarity": 2.0, "proximity": 2.0}
+
+TRUNCATED_MARK = "... (snippet cut to fit the log budget)"
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough model token count: about 4 ASCII characters per token, one per other character (CJK)."""
+    ascii_chars = len(text.encode("ascii", "ignore"))
+    return -(-ascii_chars // 4) + len(text) - ascii_chars
+
+
+def _truncate(text: str, max_tokens: int) -> str:
+    """Leading lines of `text` that fit max_tokens, followed by TRUNCATED_MARK."""
+    kept = []
+    used = estimate_tokens(TRUNCATED_MARK) + 1
+    for line in text.split("\n"):
+        cost = estimate_tokens(line) + 1
+        if used + cost > max_tokens:
+            break
+        kept.append(line)
+        used += cost
+    return "\n".join(kept + [TRUNCATED_MARK])
+
+
+class LogBudget:
+    """
+    Fits the log fingerprints of all files of an issue into one token
+    budget.
+
+    Files are added as fingerprint sections (LogProcessor.fingerprint_sections).
+    When everything fits, render() returns exactly the unbudgeted text.
+    Otherwise headers, summaries and messages are always kept, and the
+    snippets (units) of all files compete for the rest by score: DTCs, NRCs
+    and fatal/critical lines, the rarity of their keyword lines' templates
+    across all files, and closeness to the first failure of their log
+    (earlier snippets score higher). Selected snippets keep their original
+    order; each section notes how many of its snippets were left out.
+    """
+
+    def __init__(self, max_tokens: int = LOG_BUDGET_TOKENS):
+        self.max_tokens = max_tokens
+        self.files: List[Tuple[str, List[Dict[str, Any]]]] = []
+        self.stats: Dict[str, Any] = {}
+
+    def add(self, filename: str, sections: List[Dict[str, Any]]):
+        self.files.append((filename, sections))
+
+    def add_message(self, filename: str, text: str):
+        self.add(filename, [fingerprint_section(text)])
+
+    def render(self) -> str:
+        if not self.files:
+            return "No logs found."
+        full = "\n\n".join(f"File: {filename}\n{render_sections(sections)}" for filename, sections in self.files)
+        tokens = estimate_tokens(full)
+        units = [
+            (file_index, section_index, unit_index, unit)
+            for file_index, (_, sections) in enumerate(self.files)
+            for section_index, section in enumerate(sections)
+            for unit_index, unit in enumerate(section["units"])
+        ]
+        self.stats = {"budget_tokens": self.max_tokens, "fingerprint_tokens": tokens,
+                      "snippets": len(units), "snippets_omitted": 0}
+        if not self.max_tokens or tokens <= self.max_tokens:
+            return full
+
+        selected = self._select(units)
+        rendered = "\n\n".join(
+            f"File: {filename}\n" + "\n\n".join(
+                self._render_section(section, selected, file_index, section_index)
+                for section_index, section in enumerate(sections)
+            )
+            for file_index, (filename, sections) in enumerate(self.files)
+        )
+        self.stats["snippets_omitted"] = len(units) - len(selected)
+        self.stats["fingerprint_tokens"] = estimate_tokens(rendered)
+        return rendered
+
+    def scores(self, units: List[Tuple[int, int, int, Dict[str, Any]]]) -> List[float]:
+        """Signal score of each (file, section, index, unit)."""
+        miner = TemplateMiner()
+        counts: Counter = Counter()
+        unit_templates = []
+        for _, _, _, unit in units:
+            templates = []
+            weight = unit["occurrences"] / max(len(unit["matched"]), 1)
+            for line in unit["matched"]:
+                template, _ = miner.add(line)
+                if template is not None:
+                    templates.append(template.template_id)
+                    counts[template.template_id] += weight
+            unit_templates.append(templates)
+
+        scores = []
+        for (_, _, unit_index, unit), templates in zip(units, unit_templates):
+            text = unit["text"]
+            score = SIGNAL_WEIGHTS["proximity"] / (1 + unit_index)
+            if templates:
+                score += SIGNAL_WEIGHTS["rarity"] * max(1 / counts[t] for t in templates)
+            if _DTC_RE.search(text):
+                score += SIGNAL_WEIGHTS["dtc"]
+            if _NRC_RE.search(text):
+                score += SIGNAL_WEIGHTS["nrc"]
+            if _SEVERE_RE.search(text):
+                score += SIGNAL_WEIGHTS["severe"]
+            scores.append(score)
+        return scores
+
+    def _select(self, units) -> Dict[Tuple[int, int, int], str]:
+        """Greedy pick by score of the unit texts (possibly cut) that fit next to the fixed parts."""
+        fixed = 0
+        for filename, sections in self.files:
+            fixed += estimate_tokens(f"File: {filename}") + 1
+            for section in sections:
+                if section["header"]:
+                    fixed += estimate_tokens(section["header"]) + 1
+                if section["units"]:
+                    fixed += estimate_tokens(section["summary"]) + 1
+                    fixed += estimate_tokens(self._omitted_note(len(section["units"]), len(section["units"]))) + 1
+                else:
+                    fixed += estimate_tokens(section["text"]) + 2
+        remaining = self.max_tokens - fixed
+        unit_cap = max(int(self.max_tokens * LOG_BUDGET_MAX_UNIT_SHARE), 1)
+
+        selected = {}
+        ranked = sorted(zip(self.scores(units), units), key=lambda item: -item[0])
+        for _, (file_index, section_index, unit_index, unit) in ranked:
+            text = unit["text"]
+            if estimate_tokens(text) > unit_cap:
+                text = _truncate(text, unit_cap)
+            cost = estimate_tokens(text) + estimate_tokens(SEPARATOR) + 2
+            if cost <= remaining:
+                selected[(file_index, section_index, unit_index)] = text
+                remaining -= cost
+        return selected
+
+    @staticmethod
+    def _omitted_note(omitted: int, total: int) -> str:
+        return f"[{omitted} of {total} snippets omitted to fit the log budget]"
+
+    def _render_section(self, section, selected, file_index: int, section_index: int) -> str:
+        units = section["units"]
+        texts = [selected[(file_index, section_index, i)] for i in range(len(units))
+                 if (file_index, section_index, i) in selected]
+        if not units or (len(texts) == len(units) and all(
+                text is unit["text"] for text, unit in zip(texts, units))):
+            body = section["text"]
+        else:
+            parts = [section["summary"]] if section["summary"] else []
+            parts += [text + "\n" + SEPARATOR for text in texts]
+            if len(texts) < len(units):
+                parts.append(self._omitted_note(len(units) - len(texts), len(units)))
+            body = "\n".join(parts)
+        return f"{section['header']}\n{body}" if section["header"] else body
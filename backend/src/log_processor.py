@@ -1,63 +1,662 @@
+import fnmatch
+import gzip
+import io
+import mmap
 import re
 import os
+import tarfile
+import zipfile
 from collections import deque
-from typing import List, Set
+from concurrent.futures import Executor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Set, Tuple
+
+from src.executor import get_process_pool, reset_process_pool
+from src.log_templates import TemplateCollector
+
+# Files at least this large are scanned in parallel byte ranges on the
+# process pool (see DIAG_LOG_PROCESSES); smaller ones are not worth the IPC.
+LOG_PARALLEL_MIN_BYTES = int(os.getenv("DIAG_LOG_PARALLEL_MIN_BYTES", str(64 * 1024 * 1024)))
+# Target size of each parallel range (ranges are extended to the next newline).
+LOG_CHUNK_BYTES = int(os.getenv("DIAG_LOG_CHUNK_BYTES", str(32 * 1024 * 1024)))
+# How files below the parallel threshold are scanned: "lines" decodes and
+# tests every line, "mmap" searches the memory-mapped bytes and decodes only
+# lines near matches. mmap is opt-in: on invalid UTF-8 its output can differ
+# from the line scan (see process_log_mmap).
+LOG_SCAN_MODE = os.getenv("DIAG_LOG_SCAN_MODE", "lines")
+# What a fingerprint lists: "snippets" (every keyword line with its context)
+# or "templates" (keyword lines reduced to masked templates with counts,
+# first/last timestamps and one context window each; see log_templates).
+LOG_FINGERPRINT_MODE = os.getenv("DIAG_LOG_FINGERPRINT_MODE", "snippets")
+# Block size when scanning decompressed streams (blocks end on a newline).
+LOG_STREAM_BLOCK_BYTES = 8 * 1024 * 1024
+
+# Compressed log bundles (.gz, .zip, .tar.gz/.tgz) are scanned member by
+# member while decompressing, never extracted to disk. Only members whose
+# file name matches one of these globs are scanned ("*" scans everything).
+ARCHIVE_MEMBER_GLOBS = [g.strip() for g in os.getenv("DIAG_ARCHIVE_MEMBER_GLOBS", "*.log,*.txt,*.log.*").split(",")
+                        if g.strip()]
+# Decompressed bytes scanned per member and per archive (zip bomb guard), and
+# the number of members scanned per archive.
+ARCHIVE_MEMBER_MAX_BYTES = int(os.getenv("DIAG_ARCHIVE_MEMBER_MAX_BYTES", str(256 * 1024 * 1024)))
+ARCHIVE_MAX_BYTES = int(os.getenv("DIAG_ARCHIVE_MAX_BYTES", str(1024 * 1024 * 1024)))
+ARCHIVE_MAX_MEMBERS = int(os.getenv("DIAG_ARCHIVE_MAX_MEMBERS", "32"))
+
+# Line printed after each snippet (and each template block).
+SEPARATOR = "-" * 40
+
+# Line terminators as read by open(..., 'r'): "\r\n", lone "\r" or "\n".
+_EOL = re.compile(rb"\r\n|\r|\n")
+# Keywords without these characters are searched as plain literals.
+_REGEX_SPECIAL = set(".^$*+?{}[]\\|()\r\n")
+
+
+class _SnippetCollector:
+    """
+    The snippet state machine of `process_log`: matched lines start or
+    extend a snippet that includes up to `context_lines` preceding idle
+    lines and the `context_lines` lines after the last match. Fed line by
+    line by the serial scan, and by the parallel merge.
+    """
+
+    def __init__(self, context_lines: int):
+        self.before_buffer = deque(maxlen=context_lines)
+        self.context_lines = context_lines
+        self.after_count = 0
+        self.current_snippet: List[str] = []
+        self.current_matched: List[str] = []
+        self.snippets: List[str] = []
+        self.matched: List[List[str]] = []  # keyword lines of each closed snippet
+
+    def feed(self, line: str, matched: bool):
+        """`line` is already stripped; `matched` is the keyword test on the raw line."""
+        if matched:
+            # If we find a keyword, start a new snippet or extend current
+            if not self.current_snippet:
+                self.current_snippet.extend(list(self.before_buffer))
+
+            self.current_snippet.append(f"-> {line}")
+            self.current_matched.append(line)
+            self.after_count = self.context_lines  # Count lines to capture after match
+
+        elif self.after_count > 0:
+            self.current_snippet.append(line)
+            self.after_count -= 1
+            if self.after_count == 0:
+                self.snippets.append("\n".join(self.current_snippet))
+                self.snippets.append(SEPARATOR)
+                self.matched.append(self.current_matched)
+                self.current_snippet = []
+                self.current_matched = []
+
+        else:
+            self.before_buffer.append(line)
+
+    def skip(self):
+        """
+        Lines were left out: they were idle, and at least `context_lines`
+        idle lines follow before the next fed match, so the before buffer
+        they would have filled is fully overwritten anyway.
+        """
+        self.before_buffer.clear()
+
+    def result(self) -> str:
+        snippets = list(self.snippets)
+        # If the file ends while still capturing 'after' lines
+        if self.current_snippet:
+            snippets.append("\n".join(self.current_snippet))
+        return "\n".join(snippets) if snippets else "No critical patterns found in log."
+
+    def summary(self) -> str:
+        return ""
+
+    def units(self) -> List[Dict[str, Any]]:
+        """Each snippet with its keyword lines, for LogBudget selection."""
+        texts = [s for s in self.snippets if s is not SEPARATOR]
+        matched = list(self.matched)
+        if self.current_snippet:
+            texts.append("\n".join(self.current_snippet))
+            matched.append(self.current_matched)
+        return [{"text": text, "matched": lines, "occurrences": len(lines)} for text, lines in zip(texts, matched)]
+
+
+def fingerprint_section(text: str = None, header: str = "", collector=None) -> Dict[str, Any]:
+    """A fingerprint section: a collector's result and units, or a plain message."""
+    if collector is None:
+        return {"header": header, "text": text, "summary": "", "units": []}
+    return {"header": header, "text": collector.result(), "summary": collector.summary(), "units": collector.units()}
+
+
+def render_sections(sections: List[Dict[str, Any]]) -> str:
+    return "\n\n".join(f"{s['header']}\n{s['text']}" if s["header"] else s["text"] for s in sections)
+
+
+class _LimitedReader(io.RawIOBase):
+    """Raw reader over at most `limit` bytes of a binary stream (closed with it)."""
+
+    def __init__(self, stream: BinaryIO, limit: int):
+        self._stream = stream
+        self._remaining = limit
+        self.consumed = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        if self._remaining <= 0:
+            return 0
+        view = memoryview(buffer)[:self._remaining]
+        n = self._stream.readinto(view)
+        self._remaining -= n
+        self.consumed += n
+        return n
+
+    def truncated(self) -> bool:
+        """Whether the limit was reached before the end of the stream."""
+        return self._remaining <= 0 and bool(self._stream.read(1))
+
+    def close(self):
+        self._stream.close()
+        super().close()
+
+
+def archive_kind(file_path: str) -> Optional[str]:
+    """"zip", "tar" (plain or gzipped), "gzip" (single stream) or None for anything else."""
+    with open(file_path, 'rb') as f:
+        head = f.read(512)
+    if head.startswith(b"PK") and zipfile.is_zipfile(file_path):
+        return "zip"
+    if head.startswith(b"\x1f\x8b"):
+        try:
+            with gzip.open(file_path, 'rb') as g:
+                head = g.read(512)
+        except (OSError, EOFError):
+            return "gzip"  # corrupt: reported when the member is scanned
+        return "tar" if head[257:262] == b"ustar" else "gzip"
+    if head[257:262] == b"ustar":
+        return "tar"
+    return None
+
+
+def iter_archive_members(file_path: str, kind: str) -> Iterator[Tuple[str, BinaryIO]]:
+    """(name, binary stream) of each regular file in an archive, read sequentially."""
+    if kind == "zip":
+        with zipfile.ZipFile(file_path) as zf:
+            for info in zf.infolist():
+                if not info.is_dir():
+                    with zf.open(info) as stream:
+                        yield info.filename, stream
+    elif kind == "tar":
+        with tarfile.open(file_path, mode="r|*") as tf:
+            for member in tf:
+                if member.isfile():
+                    yield member.name, tf.extractfile(member)
+    else:
+        name = os.path.basename(file_path)
+        with gzip.open(file_path, 'rb') as stream:
+            yield (name[:-3] if name.lower().endswith(".gz") else name), stream
+
+
+def line_aligned_ranges(file_path: str, chunk_bytes: int) -> List[Tuple[int, int]]:
+    """
+    Split a file into consecutive [start, end) byte ranges of about
+    chunk_bytes, each ending just after a b"\\n". A range therefore never
+    splits a line ("\\r\\n" included) or a UTF-8 character.
+    """
+    size = os.path.getsize(file_path)
+    ranges = []
+    start = 0
+    with open(file_path, 'rb') as f:
+        while start < size:
+            end = start + chunk_bytes
+            if end >= size:
+                end = size
+            else:
+                f.seek(end)
+                while True:
+                    block = f.read(64 * 1024)
+                    if not block:
+                        end = size
+                        break
+                    newline = block.find(b"\n")
+                    if newline >= 0:
+                        end += newline + 1
+                        break
+                    end += len(block)
+            ranges.append((start, end))
+            start = end
+    return ranges
+
+
+def _last_eol(buf, floor: int, end: int) -> int:
+    """Offset of the last b"\\r" or b"\\n" in buf[floor:end], or -1 (searched backwards in blocks)."""
+    while end > floor:
+        low = max(floor, end - 64 * 1024)
+        found = max(buf.rfind(b"\n", low, end), buf.rfind(b"\r", low, end))
+        if found >= 0:
+            return found
+        end = low
+    return -1
+
+
+def _line_at(buf, start: int) -> Tuple[int, int]:
+    """(end of text, start of next line) for the line starting at `start`."""
+    eol = _EOL.search(buf, start)
+    if eol is None:
+        return len(buf), len(buf)
+    return eol.start(), eol.end()
+
+
+def _line_before(buf, start: int, floor: int) -> int:
+    """Start of the line just before the line starting at `start` (not below `floor`)."""
+    end = start - 2 if start - 2 >= floor and buf[start - 2:start] == b"\r\n" else start - 1
+    found = _last_eol(buf, floor, end)
+    return found + 1 if found >= 0 else floor
+
+
+class _KeywordFinder:
+    """
+    Case-insensitive search for plain ASCII keywords in a bytes buffer.
+    Lowercases one block at a time and runs bytes.find per keyword, which
+    is many times faster than an IGNORECASE regex alternation; the next
+    occurrence of each keyword is remembered until the search passes it.
+    """
+
+    BLOCK_BYTES = 4 * 1024 * 1024
+
+    def __init__(self, buf, keywords: List[bytes]):
+        self._buf = buf
+        self._keywords = keywords
+        self._overlap = max(len(kw) for kw in keywords) - 1
+        self._start = self._block_end = 0
+        self._low = b""
+        self._next: List[Optional[int]] = []
+
+    def search(self, pos: int) -> Optional[Tuple[int, int]]:
+        """(start, end) of the first keyword occurrence at or after pos."""
+        while pos < len(self._buf):
+            if pos >= self._block_end:
+                self._start = pos
+                self._block_end = min(len(self._buf), pos + self.BLOCK_BYTES)
+                self._low = self._buf[pos:self._block_end + self._overlap].lower()
+                self._next = [-1] * len(self._keywords)
+            best = None
+            for j, kw in enumerate(self._keywords):
+                found = self._next[j]
+                if found is not None and found < pos:
+                    i = self._low.find(kw, pos - self._start)
+                    found = self._start + i if 0 <= i and self._start + i < self._block_end else None
+                    self._next[j] = found
+                if found is not None and (best is None or found < best[0]):
+                    best = (found, found + len(kw))
+            if best is not None:
+                return best
+            pos = self._block_end
+        return None
+
+
+class _ByteScanner:
+    """
+    The mmap scan of LogProcessor over raw bytes: keyword hits are searched
+    in the buffer, and only lines within `context_lines` of a hit are
+    located (find/rfind), decoded and fed to a _SnippetCollector.
+
+    A stream is scanned as a sequence of blocks ending on b"\\n": the
+    'after' count carries over, and `scan` returns the trailing idle lines
+    that a hit in the next block may need, to be prefixed to that block.
+    """
+
+    def __init__(self, processor: "LogProcessor", context_lines: int):
+        self.processor = processor
+        self.context_lines = context_lines
+        self.collector = processor.collector(context_lines)
+        self.after_left = 0  # 'after' lines still owed to the last match
+        self.gap = False     # lines were left out just before the next block
+
+    def _feed(self, buf, start: int, matched: bool) -> int:
+        end, next_start = _line_at(buf, start)
+        self.collector.feed(buf[start:end].decode('utf-8', errors='ignore').strip(), matched)
+        self.gap = False
+        return next_start
+
+    def scan(self, buf, final: bool = True) -> bytes:
+        pattern = self.processor.bytes_pattern
+        if self.processor.literal_keywords:
+            search = _KeywordFinder(buf, self.processor.literal_keywords).search
+        else:
+            def search(pos):
+                hit = pattern.search(buf, pos)
+                return hit.span() if hit else None
+
+        cursor = 0  # start of the first line not fed yet
+        pos = 0
+        while True:
+            hit = search(pos)
+            if hit is None:
+                break
+            hit_start, hit_end = hit
+            found = _last_eol(buf, cursor, hit_start)
+            line_start = found + 1 if found >= 0 else cursor
+            line_end, _ = _line_at(buf, line_start)
+            if hit_end > line_end and not pattern.search(buf, line_start, line_end):
+                pos = hit_start + 1  # hit spans a line break; no match within this line
+                continue
+
+            while self.after_left and cursor < line_start:
+                cursor = self._feed(buf, cursor, False)
+                self.after_left -= 1
+
+            before = []
+            start = line_start
+            while len(before) < self.context_lines and start > cursor:
+                start = _line_before(buf, start, cursor)
+                before.append(start)
+            if start != cursor or self.gap:
+                self.collector.skip()
+            for start in reversed(before):
+                self._feed(buf, start, False)
+
+            cursor = pos = self._feed(buf, line_start, True)
+            self.after_left = self.context_lines
+
+        while self.after_left and cursor < len(buf):
+            cursor = self._feed(buf, cursor, False)
+            self.after_left -= 1
+        if final:
+            return b""
+
+        start = len(buf)
+        for _ in range(self.context_lines):
+            if start <= cursor:
+                break
+            start = _line_before(buf, start, cursor)
+        if start != cursor:
+            self.gap = True
+        return bytes(buf[start:])
+
+    def scan_stream(self, stream, block_bytes: int):
+        """Scan a binary stream in line-aligned blocks of about block_bytes."""
+        carry = b""
+        while True:
+            block = stream.read(block_bytes)
+            while block and not block.endswith(b"\n"):
+                more = stream.readline(block_bytes)
+                if not more:
+                    break
+                block += more
+            if not block:
+                self.scan(carry)
+                return
+            carry = self.scan(carry + block, final=False)
+
+
+def scan_range(file_path: str, start: int, end: int, pattern: "re.Pattern",
+               context_lines: int) -> Tuple[int, List[int], Dict[int, str]]:
+    """
+    Process pool task: scan one byte range line by line, exactly as the
+    serial loop does (UTF-8, errors ignored, universal newlines).
+
+    Returns (line count, indexes of matched lines, {index: stripped text})
+    with the text of every line within `context_lines` of a match and of
+    the first and last `context_lines` lines of the range, which windows of
+    matches in neighbouring ranges may reach into.
+    """
+    matches: List[int] = []
+    texts: Dict[int, str] = {}
+    tail: deque = deque(maxlen=context_lines)
+    pending_after = -1  # last index that still needs its text kept
+    index = -1
+    raw = open(file_path, 'rb')
+    raw.seek(start)
+    with io.TextIOWrapper(io.BufferedReader(_LimitedReader(raw, end - start)),
+                          encoding='utf-8', errors='ignore') as f:
+        for index, line in enumerate(f):
+            if pattern.search(line):
+                matches.append(index)
+                texts.update((i, raw.strip()) for i, raw in tail)
+                texts[index] = line.strip()
+                pending_after = index + context_lines
+            elif index <= pending_after or index < context_lines:
+                texts[index] = line.strip()
+            tail.append((index, line))
+    texts.update((i, raw.strip()) for i, raw in tail)
+    return index + 1, matches, texts
+
 
 class LogProcessor:
-    def __init__(self, keywords: List[str] = None):
+    def __init__(self, keywords: List[str] = None, parallel_min_bytes: int = LOG_PARALLEL_MIN_BYTES,
+                 chunk_bytes: int = LOG_CHUNK_BYTES, scan_mode: str = LOG_SCAN_MODE,
+                 fingerprint_mode: str = LOG_FINGERPRINT_MODE,
+                 member_globs: List[str] = None, member_max_bytes: int = ARCHIVE_MEMBER_MAX_BYTES,
+                 archive_max_bytes: int = ARCHIVE_MAX_BYTES, archive_max_members: int = ARCHIVE_MAX_MEMBERS):
         if keywords is None:
             self.keywords = ["Error", "Fail", "Timeout", "Reset", "DTC"]
         else:
             self.keywords = keywords
-        
+        self.parallel_min_bytes = parallel_min_bytes
+        self.chunk_bytes = chunk_bytes
+        self.scan_mode = scan_mode
+        self.fingerprint_mode = fingerprint_mode
+        self.member_globs = ARCHIVE_MEMBER_GLOBS if member_globs is None else member_globs
+        self.member_max_bytes = member_max_bytes
+        self.archive_max_bytes = archive_max_bytes
+        self.archive_max_members = archive_max_members
+
         # Compile regex for optimization
         pattern_str = "|".join([rf"{kw}" for kw in self.keywords])
         self.pattern = re.compile(pattern_str, re.IGNORECASE)
+        # Same pattern over raw bytes for the mmap scan. Bytes patterns only
+        # fold ASCII case, so non-ASCII keywords keep the line scan.
+        self.bytes_pattern = None
+        self.literal_keywords = None
+        if all(kw.isascii() for kw in self.keywords):
+            self.bytes_pattern = re.compile(pattern_str.encode("ascii"), re.IGNORECASE)
+            if all(kw and not any(c in _REGEX_SPECIAL for c in kw) for kw in self.keywords):
+                self.literal_keywords = [kw.lower().encode("ascii") for kw in self.keywords]
+
+    def collector(self, context_lines: int):
+        """State machine the scans feed: snippets, or templates in "templates" fingerprint mode."""
+        if self.fingerprint_mode == "templates":
+            return TemplateCollector(context_lines)
+        return _SnippetCollector(context_lines)
 
     def process_log(self, file_path: str, context_lines: int = 20) -> str:
         """
         Processes a large log file and extracts context around keywords.
-        Uses a sliding window (deque) to maintain previous lines and 
+        Uses a sliding window (deque) to maintain previous lines and
         look-ahead to capture subsequent lines.
+
+        Files of at least `parallel_min_bytes` are scanned on the process
+        pool instead (see process_log_parallel), with identical output. In
+        the opt-in "mmap" scan mode the rest skip decoding lines far from
+        any match (see process_log_mmap). Compressed archives are scanned
+        per member (see process_archive).
+        """
+        return render_sections(self.fingerprint_sections(file_path, context_lines))
+
+    def fingerprint_sections(self, file_path: str, context_lines: int = 20) -> List[Dict[str, Any]]:
+        """
+        process_log as sections (one per archive member, or a single one),
+        each with its rendered text and the scored-selection units of a
+        LogBudget: {"header", "text", "summary", "units"}.
         """
         if not os.path.exists(file_path):
-            return "Log file not found."
+            return [fingerprint_section("Log file not found.")]
+        try:
+            kind = archive_kind(file_path)
+            if kind is not None:
+                return self.archive_sections(file_path, context_lines, kind)
+            return [fingerprint_section(collector=self._scan_file(file_path, context_lines))]
+        except Exception as e:
+            return [fingerprint_section(f"Error processing log file: {e}")]
 
-        snippets = []
-        before_buffer = deque(maxlen=context_lines)
-        after_count = 0
-        current_snippet = []
+    def _scan_file(self, file_path: str, context_lines: int):
+        if os.path.getsize(file_path) >= self.parallel_min_bytes:
+            pool = get_process_pool()
+            if pool is not None:
+                try:
+                    return self._scan_parallel(file_path, context_lines, pool)
+                except BrokenProcessPool as e:
+                    print(f"Parallel log scan failed ({e}), scanning {file_path} serially")
+                    reset_process_pool()
 
-        try:
-            with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                for line in f:
-                    if self.pattern.search(line):
-                        # If we find a keyword, start a new snippet or extend current
-                        if not current_snippet:
-                            current_snippet.extend(list(before_buffer))
-                        
-                        current_snippet.append(f"-> {line.strip()}")
-                        after_count = context_lines  # Count lines to capture after match
-                    
-                    elif after_count > 0:
-                        current_snippet.append(line.strip())
-                        after_count -= 1
-                        if after_count == 0:
-                            snippets.append("\n".join(current_snippet))
-                            snippets.append("-" * 40)
-                            current_snippet = []
-                    
-                    else:
-                        before_buffer.append(line.strip())
-
-                # If the file ends while still capturing 'after' lines
-                if current_snippet:
-                    snippets.append("\n".join(current_snippet))
-
-            return "\n".join(snippets) if snippets else "No critical patterns found in log."
+        if self.scan_mode == "mmap" and self.bytes_pattern is not None:
+            return self._scan_mmap(file_path, context_lines)
 
-        except Exception as e:
-            return f"Error processing log file: {e}"
+        collector = self.collector(context_lines)
+        with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
+            for line in f:
+                collector.feed(line.strip(), bool(self.pattern.search(line)))
+        return collector
+
+    def process_log_mmap(self, file_path: str, context_lines: int = 20) -> str:
+        """
+        Same result as the line-by-line scan without decoding every line:
+        the keyword pattern runs over the memory-mapped raw bytes, and only
+        the lines within `context_lines` of a hit are located, decoded and
+        fed to the snippet state machine. Memory use does not grow with the
+        file size (mapped pages are file-backed and evictable).
+
+        Only differs from the line scan on invalid UTF-8: bytes dropped by
+        the decoder can no longer join a keyword or a "\\r\\n" pair.
+        """
+        return self._scan_mmap(file_path, context_lines).result()
+
+    def _scan_mmap(self, file_path: str, context_lines: int):
+        if os.path.getsize(file_path) == 0:
+            return self.collector(context_lines)
+
+        scanner = _ByteScanner(self, context_lines)
+        with open(file_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            scanner.scan(buf)
+        return scanner.collector
+
+    def scan_stream(self, stream: BinaryIO, context_lines: int = 20) -> str:
+        """process_log for a binary stream (e.g. a decompressing archive member)."""
+        return self._scan_stream(stream, context_lines).result()
+
+    def _scan_stream(self, stream: BinaryIO, context_lines: int):
+        if self.scan_mode == "mmap" and self.bytes_pattern is not None:
+            scanner = _ByteScanner(self, context_lines)
+            scanner.scan_stream(stream, LOG_STREAM_BLOCK_BYTES)
+            return scanner.collector
+
+        collector = self.collector(context_lines)
+        text = io.TextIOWrapper(stream, encoding='utf-8', errors='ignore')
+        for line in text:
+            collector.feed(line.strip(), bool(self.pattern.search(line)))
+        text.detach()
+        return collector
+
+    def member_selected(self, name: str) -> bool:
+        """Whether an archive member is a log to scan, by the globs on its base name."""
+        base = name.replace("\\", "/").rsplit("/", 1)[-1].lower()
+        if not base or base.startswith("._") or name.startswith("__MACOSX/"):
+            return False
+        if base.endswith(".gz"):
+            base = base[:-3]
+        return any(fnmatch.fnmatchcase(base, glob.lower()) for glob in self.member_globs)
+
+    def process_archive(self, file_path: str, context_lines: int = 20, kind: Optional[str] = None) -> str:
+        """
+        Fingerprint each log member of a .zip, .tar(.gz)/.tgz or .gz file,
+        decompressing in a stream without writing members to disk. Members
+        not matching `member_globs` are skipped; gzipped members (rotated
+        "app.log.1.gz") are decompressed on the fly. At most
+        `member_max_bytes` decompressed bytes are scanned per member and
+        `archive_max_bytes` per archive, over at most `archive_max_members`
+        members.
+        """
+        return render_sections(self.archive_sections(file_path, context_lines, kind))
+
+    def archive_sections(self, file_path: str, context_lines: int = 20,
+                         kind: Optional[str] = None) -> List[Dict[str, Any]]:
+        """process_archive as fingerprint sections: one per member, then a note on skipped members."""
+        kind = kind or archive_kind(file_path)
+        sections = []
+        filtered = 0
+        over_limit = 0
+        budget = self.archive_max_bytes
+        for name, stream in iter_archive_members(file_path, kind):
+            if not self.member_selected(name):
+                filtered += 1
+                continue
+            if len(sections) >= self.archive_max_members or budget <= 0:
+                over_limit += 1
+                continue
+            try:
+                if name.lower().endswith(".gz"):
+                    stream = gzip.GzipFile(fileobj=stream, mode='rb')
+                limited = _LimitedReader(stream, min(self.member_max_bytes, budget))
+                with io.BufferedReader(limited, LOG_STREAM_BLOCK_BYTES) as reader:
+                    collector = self._scan_stream(reader, context_lines)
+                    truncated = limited.truncated()
+            except Exception as e:
+                sections.append(fingerprint_section(f"Error processing archive member: {e}", header=f"== {name} =="))
+                continue
+            budget -= limited.consumed
+            header = f"== {name} =="
+            if truncated:
+                header += f" (only the first {limited.consumed} decompressed bytes scanned)"
+            sections.append(fingerprint_section(header=header, collector=collector))
+
+        notes = []
+        if filtered:
+            notes.append(f"{filtered} non-log members skipped")
+        if over_limit:
+            notes.append(f"{over_limit} members not scanned (archive limits reached)")
+        if not sections:
+            message = f"No log files found in archive ({'; '.join(notes)})." if notes else "No log files found in archive."
+            return [fingerprint_section(message)]
+        if notes:
+            sections.append(fingerprint_section("; ".join(notes)))
+        return sections
+
+    def process_log_parallel(self, file_path: str, context_lines: int = 20,
+                             executor: Optional[Executor] = None) -> str:
+        """
+        Same result as the serial scan of process_log, with the file split
+        into line-aligned byte ranges that are scanned concurrently.
+
+        Workers only report match positions plus the text of lines that can
+        end up in a snippet. The snippet state machine is then replayed over
+        those lines in file order, so windows that cross range boundaries
+        (and the before buffer carried between snippets) come out exactly as
+        in a single pass.
+        """
+        return self._scan_parallel(file_path, context_lines, executor).result()
+
+    def _scan_parallel(self, file_path: str, context_lines: int, executor: Optional[Executor] = None):
+        executor = executor or get_process_pool()
+        ranges = line_aligned_ranges(file_path, self.chunk_bytes)
+        futures = [
+            executor.submit(scan_range, file_path, start, end, self.pattern, context_lines)
+            for start, end in ranges
+        ]
+
+        matches: List[int] = []
+        texts: Dict[int, str] = {}
+        offset = 0
+        for future in futures:
+            line_count, range_matches, range_texts = future.result()
+            matches.extend(offset + i for i in range_matches)
+            texts.update((offset + i, text) for i, text in range_texts.items())
+            offset += line_count
+
+        # Only lines within context_lines of a match can reach a snippet
+        needed: Set[int] = set()
+        for m in matches:
+            needed.update(range(max(0, m - context_lines), min(offset, m + context_lines + 1)))
+        matched = set(matches)
+
+        collector = self.collector(context_lines)
+        previous = -1
+        for i in sorted(needed):
+            if i != previous + 1:
+                collector.skip()
+            collector.feed(texts[i], i in matched)
+            previous = i
+        return collector
 
     @staticmethod
     def optimize_regex_demo():
@@ -65,7 +664,7 @@ class LogProcessor:
         Example of an optimized regex strategy for automotive logs.
         Includes hex codes for CAN errors or specific DTC formats.
         """
-        # Example patterns: 
+        # Example patterns:
         # DTC: [U|P|C|B]\d{4}-\d{2}
         # CAN Timeout: [A-Z_]+_TIMEOUT
         patterns = [
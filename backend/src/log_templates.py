@@ -0,0 +1,196 @@
+import os
+import re
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+# Drain similarity threshold: share of a line's tokens (template wildcards
+# excluded) that must equal a template's for the line to join it.
+TEMPLATE_SIMILARITY = float(os.getenv("DIAG_LOG_TEMPLATE_SIMILARITY", "0.5"))
+# Leading tokens used to pre-partition templates (Drain tree depth).
+TEMPLATE_PREFIX_TOKENS = 2
+# Distinct templates kept per log; lines of further new shapes are only counted.
+TEMPLATE_MAX_CLUSTERS = int(os.getenv("DIAG_LOG_TEMPLATE_MAX_CLUSTERS", "1000"))
+
+WILDCARD = "<*>"
+
+# Timestamps are masked on the whole line (they may contain spaces):
+# 2024-01-31 12:00:00.123, 12:00:00.123 and kernel/DLT uptime "[ 1234.567890]".
+_TIMESTAMP_RE = re.compile(
+    r"\d{4}[-/.]\d{1,2}[-/.]\d{1,2}[ T]\d{1,2}:\d{2}:\d{2}(?:[.,]\d+)?(?:Z|[+-]\d{2}:?\d{2})?"
+    r"|\b\d{1,2}:\d{2}:\d{2}(?:[.,]\d+)?\b"
+    r"|\[\s*\d+\.\d+\s*\]"
+)
+# Then, in one pass: DTCs (U0100, P0A1F-00) are the signal itself and kept;
+# hex is 0x literals or bare words with both a digit and a letter ("7F",
+# "1a2b", not "add" or "10"); numbers not glued to a preceding letter
+# ("bus 2" -> "bus <NUM>", "10ms" -> "<NUM>ms", "CAN2" kept).
+_VARIABLE_RE = re.compile(
+    r"(?P<dtc>\b[PCBU][0-9A-F]{4}(?:-[0-9A-F]{2})?\b)"
+    r"|(?P<hex>0x[0-9A-F]+|(?<![0-9A-Z])(?=[0-9A-F]*\d)(?=[0-9A-F]*[A-F])[0-9A-F]{2,}(?![0-9A-Z]))"
+    r"|(?P<num>(?<![A-Z])\d+(?:\.\d+)?)",
+    re.IGNORECASE,
+)
+_MASKS = {"hex": "<HEX>", "num": "<NUM>"}
+
+
+def mask_tokens(line: str) -> List[str]:
+    """Whitespace tokens of a log line with timestamps, hex values and numbers masked."""
+    masked = _TIMESTAMP_RE.sub(" <TS> ", line)
+    return _VARIABLE_RE.sub(lambda m: _MASKS.get(m.lastgroup, m.group(0)), masked).split()
+
+
+def find_timestamp(line: str) -> Optional[str]:
+    match = _TIMESTAMP_RE.search(line)
+    return match.group(0).strip("[] ") if match else None
+
+
+class LogTemplate:
+    """One event shape: masked tokens (wildcards where occurrences differ) and its statistics."""
+
+    def __init__(self, template_id: int, tokens: List[str], sample: str):
+        self.template_id = template_id
+        self.tokens = tokens
+        self.sample = sample  # the first line of this shape
+        self.count = 0
+        self.first_timestamp: Optional[str] = None
+        self.last_timestamp: Optional[str] = None
+        self.example: List[str] = []  # context window of the first occurrence
+
+    @property
+    def text(self) -> str:
+        return " ".join(self.tokens)
+
+    def similarity(self, tokens: List[str]) -> Tuple[float, int]:
+        """(share of equal non-wildcard tokens, wildcard count); tokens has the same length."""
+        equal = wildcards = 0
+        for mine, theirs in zip(self.tokens, tokens):
+            if mine == WILDCARD:
+                wildcards += 1
+            elif mine == theirs:
+                equal += 1
+        return equal / len(tokens) if tokens else 1.0, wildcards
+
+    def merge(self, tokens: List[str]):
+        self.tokens = [mine if mine == theirs else WILDCARD for mine, theirs in zip(self.tokens, tokens)]
+
+
+class TemplateMiner:
+    """
+    Online log template miner after Drain (He et al., ICWS 2017).
+
+    Lines are masked and tokenized, partitioned by token count and their
+    first TEMPLATE_PREFIX_TOKENS tokens (tokens holding variables go to a
+    wildcard branch), and joined to the most similar template in that
+    partition when the similarity reaches the threshold; positions where
+    the line differs become wildcards. Otherwise the line starts a new
+    template.
+    """
+
+    def __init__(self, similarity: float = TEMPLATE_SIMILARITY, max_clusters: int = TEMPLATE_MAX_CLUSTERS):
+        self.similarity = similarity
+        self.max_clusters = max_clusters
+        self.templates: List[LogTemplate] = []
+        self.lines = 0
+        self.overflow = 0  # lines left unclustered once max_clusters was reached
+        self._groups: Dict[Tuple, List[LogTemplate]] = {}
+
+    @staticmethod
+    def _group_key(tokens: List[str]) -> Tuple:
+        prefix = tuple(
+            WILDCARD if "<" in token or any(c.isdigit() for c in token) else token
+            for token in tokens[:TEMPLATE_PREFIX_TOKENS]
+        )
+        return (len(tokens),) + prefix
+
+    def add(self, line: str) -> Tuple[Optional[LogTemplate], bool]:
+        """Cluster one line; returns (its template or None on overflow, whether the template is new)."""
+        self.lines += 1
+        tokens = mask_tokens(line)
+        group = self._groups.setdefault(self._group_key(tokens), [])
+
+        best, best_score = None, None
+        for template in group:
+            score = template.similarity(tokens)
+            if best_score is None or score > best_score:
+                best, best_score = template, score
+
+        created = False
+        if best is not None and best_score[0] >= self.similarity:
+            best.merge(tokens)
+        elif len(self.templates) < self.max_clusters:
+            best = LogTemplate(len(self.templates) + 1, tokens, line)
+            group.append(best)
+            self.templates.append(best)
+            created = True
+        else:
+            self.overflow += 1
+            return None, False
+
+        best.count += 1
+        timestamp = find_timestamp(line)
+        if timestamp:
+            best.first_timestamp = best.first_timestamp or timestamp
+            best.last_timestamp = timestamp
+        return best, created
+
+
+class TemplateCollector:
+    """
+    Drop-in for the snippet state machine of LogProcessor that reduces
+    matched lines to templates: every keyword line is clustered by a
+    TemplateMiner, and only the first occurrence of each template keeps its
+    context window (`context_lines` before and after). Fed the same way as
+    the snippet collector, so every scan mode can produce it.
+    """
+
+    def __init__(self, context_lines: int, miner: Optional[TemplateMiner] = None):
+        self.context_lines = context_lines
+        self.miner = miner or TemplateMiner()
+        self.before_buffer = deque(maxlen=context_lines)
+        self._capturing: List[List] = []  # [template, lines still to capture]
+
+    def feed(self, line: str, matched: bool):
+        shown = f"-> {line}" if matched else line
+        for capture in self._capturing:
+            capture[0].example.append(shown)
+            capture[1] -= 1
+        self._capturing = [capture for capture in self._capturing if capture[1] > 0]
+
+        if matched:
+            template, created = self.miner.add(line)
+            if template is not None and created:
+                template.example = list(self.before_buffer) + [shown]
+                if self.context_lines:
+                    self._capturing.append([template, self.context_lines])
+        self.before_buffer.append(shown)
+
+    def skip(self):
+        """Lines were left out; they were more than context_lines past every match."""
+        self.before_buffer.clear()
+
+    def result(self) -> str:
+        if not self.miner.templates:
+            return "No critical patterns found in log."
+        return "\n".join([self.summary()] + [unit["text"] + "\n" + "-" * 40 for unit in self.units()])
+
+    def summary(self) -> str:
+        if not self.miner.templates:
+            return ""
+        summary = f"{self.miner.lines} keyword lines in {len(self.miner.templates)} templates"
+        if self.miner.overflow:
+            summary += f", {self.miner.overflow} lines over the template limit"
+        return summary + " (first occurrence shown; <*>, <NUM>, <HEX>, <TS> mark variable fields)"
+
+    def units(self) -> List[Dict]:
+        """Each template block with its first line and occurrence count, for LogBudget selection."""
+        units = []
+        for template in self.miner.templates:
+            header = f"[T{template.template_id} x{template.count}] {template.text}"
+            if template.first_timestamp:
+                header += f"\n(first {template.first_timestamp}, last {template.last_timestamp})"
+            units.append({
+                "text": header + "\n" + "\n".join(template.example),
+                "matched": [template.sample],
+                "occurrences": template.count,
+            })
+        return units
@@ -0,0 +1,131 @@
+import threading
+from typing import Dict, List, Sequence, Tuple
+
+# Latency buckets (seconds) covering fast Jira calls up to multi-minute Gemini runs.
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+
+def _format_labels(labelnames: Sequence[str], values: Tuple, extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class Counter:
+    """Monotonic counter with optional labels (Prometheus semantics)."""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple, float] = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(str(labels.get(n, "")) for n in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        key = tuple(str(labels.get(n, "")) for n in self.labelnames)
+        return self._values.get(key, 0)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {value}")
+        return lines
+
+
+class Histogram:
+    """Cumulative-bucket histogram with optional labels (Prometheus semantics)."""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [per-bucket counts..., +Inf count, sum]
+        self._series: Dict[Tuple, List[float]] = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels.get(n, "")) for n in self.labelnames)
+        with self._lock:
+            series = self._series.setdefault(key, [0] * (len(self.buckets) + 2))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += 1
+            series[-1] += value
+
+    def count(self, **labels) -> int:
+        key = tuple(str(labels.get(n, "")) for n in self.labelnames)
+        series = self._series.get(key)
+        return int(series[-2]) if series else 0
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                for bound, count in zip(self.buckets, series):
+                    labels = _format_labels(self.labelnames, key, 'le="%s"' % bound)
+                    lines.append(f"{self.name}_bucket{labels} {count}")
+                labels = _format_labels(self.labelnames, key, 'le="+Inf"')
+                lines.append(f"{self.name}_bucket{labels} {series[-2]}")
+                lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {series[-2]}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {series[-1]}")
+        return lines
+
+
+REGISTRY: List = []
+
+
+def render_prometheus() -> str:
+    """All registered metrics in the Prometheus text exposition format."""
+    lines: List[str] = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# --- Pipeline metrics ---------------------------------------------------------
+
+STAGE_DURATION = Histogram(
+    "diag_stage_duration_seconds", "Duration of each diagnostic pipeline stage.", ["stage", "outcome"])
+DIAGNOSIS_DURATION = Histogram(
+    "diag_request_duration_seconds", "End-to-end duration of a diagnosis.", ["outcome"])
+DIAGNOSES = Counter(
+    "diag_requests_total", "Diagnoses by outcome (success, cache_hit, error).", ["outcome"])
+
+GEMINI_CALLS = Counter(
+    "diag_gemini_calls_total", "Gemini generate_content calls by outcome.", ["outcome"])
+GEMINI_RETRIES = Counter(
+    "diag_gemini_retries_total", "Gemini calls retried after 429 Resource Exhausted.")
+GEMINI_DURATION = Histogram(
+    "diag_gemini_call_duration_seconds", "Gemini call latency including retry backoff.")
+
+JIRA_SEARCH_BYTES = Counter(
+    "diag_jira_search_payload_bytes_total", "JSON bytes received from Jira search pages.")
+JIRA_SEARCH_PAGES = Counter(
+    "diag_jira_search_pages_total", "Jira search pages fetched.")
+JIRA_THROTTLED = Counter(
+    "diag_jira_throttled_total", "Jira REST calls answered with 429/5xx, by host and status.", ["host", "status"])
+
+DOWNLOAD_BYTES = Counter(
+    "diag_download_bytes_total", "Attachment bytes downloaded from Jira.")
+DOWNLOADS = Counter(
+    "diag_downloads_total", "Attachment downloads by status (ok, cached, skipped, failed).", ["status"])
+DOWNLOAD_DURATION = Histogram(
+    "diag_download_duration_seconds", "Per-file attachment download time.")
+ATTACHMENT_CACHE_LOOKUPS = Counter(
+    "diag_attachment_cache_lookups_total", "Attachment cache lookups by outcome (hit, miss).", ["outcome"])
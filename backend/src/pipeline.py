@@ -0,0 +1,799 @@
+import asyncio
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+
+from src.async_jira import AsyncJiraConnector
+from src.jira_connector import JiraConnector
+from src.jira_pool import get_connector_pool
+from src.issue_mirror import get_issue_mirror
+from src.log_budget import LogBudget
+from src.log_processor import LogProcessor
+from src.ai_reasoning import AIReasoning
+from src.executor import run_blocking
+from src.downloader import AttachmentDownloader
+from src.attachment_cache import get_attachment_cache
+from src.progress import ProgressReporter
+from src.task_graph import TaskGraph
+from src.result_cache import cache_key, get_result_cache
+from src.metrics import DIAGNOSES, DIAGNOSIS_DURATION
+
+# Fetch historical issue details with the async httpx client (AsyncJiraConnector)
+# instead of the thread-pooled python-jira connector.
+ASYNC_JIRA_CLIENT = os.getenv("JIRA_ASYNC_CLIENT", "0") == "1"
+
+# Per-source time limit for each candidate search in FEDERATED mode. A source
+# that misses it contributes no candidates to that attempt instead of holding
+# up the other instance's results.
+FEDERATED_SEARCH_DEADLINE_SECONDS = float(os.getenv("DIAG_FEDERATED_SEARCH_DEADLINE_SECONDS", "20"))
+
+# Display names of the Jira instances (used in the report trace).
+SOURCE_NAMES = {"customer": "客户 Jira", "internal": "内部 Jira"}
+
+
+def robust_cleanup(path, retries=3, delay=0.5):
+    import time
+    for i in range(retries):
+        try:
+            if os.path.exists(path):
+                shutil.rmtree(path)
+            return
+        except Exception as e:
+            if i < retries - 1:
+                print(f"Cleanup failed (attempt {i+1}), retrying in {delay}s... Error: {e}")
+                time.sleep(delay)
+            else:
+                print(f"Cleanup failed after {retries} attempts: {e}")
+
+
+def search_scope(settings) -> Tuple[str, str, str]:
+    """(connector name, project, issuetype) that historical candidates are searched in."""
+    if settings.search_target == "CUSTOMER":
+        return "customer", settings.customer_project, settings.customer_issuetype
+    return "internal", settings.internal_project, settings.internal_issuetype
+
+
+def search_scopes(settings) -> List[Tuple[str, str, str]]:
+    """Every search scope of a request: both instances for FEDERATED, else search_scope."""
+    if settings.search_target == "FEDERATED":
+        return [
+            ("customer", settings.customer_project, settings.customer_issuetype),
+            ("internal", settings.internal_project, settings.internal_issuetype),
+        ]
+    return [search_scope(settings)]
+
+
+def _summary_fingerprint(summary: str) -> str:
+    return "".join(ch for ch in (summary or "").lower() if ch.isalnum())
+
+
+def merge_candidates(ranked: List[Tuple[str, List[Dict[str, Any]]]]) -> List[Dict[str, Any]]:
+    """
+    Merge per-source ranked candidate lists [(source, candidates)] by taking
+    them in turns, so each source keeps its own order. Every candidate is
+    copied with its `source`. A candidate whose key was already taken, or
+    whose normalized summary matches one taken from the other instance (an
+    issue cloned between them), is dropped and listed under the kept
+    candidate's `duplicates`.
+    """
+    merged: List[Dict[str, Any]] = []
+    by_key: Dict[str, Dict[str, Any]] = {}
+    by_summary: Dict[str, Dict[str, Any]] = {}
+    queues = [[dict(c, source=source) for c in candidates] for source, candidates in ranked]
+    for rank in range(max((len(q) for q in queues), default=0)):
+        for queue in queues:
+            if rank >= len(queue):
+                continue
+            candidate = queue[rank]
+            fingerprint = _summary_fingerprint(candidate.get("summary", ""))
+            kept = by_key.get(candidate["key"].upper())
+            if kept is None and fingerprint:
+                clone = by_summary.get(fingerprint)
+                # Same-summary issues within one instance are distinct reports
+                kept = clone if clone is not None and clone["source"] != candidate["source"] else None
+            if kept is not None:
+                kept.setdefault("duplicates", []).append({"key": candidate["key"], "source": candidate["source"]})
+                continue
+            merged.append(candidate)
+            by_key[candidate["key"].upper()] = candidate
+            if fingerprint:
+                by_summary[fingerprint] = candidate
+    return merged
+
+
+def credentials_hash(req) -> str:
+    """Hash of the Jira credentials and Gemini key of a request (never the secrets themselves)."""
+    secrets = [req.customer_username, req.customer_password, req.internal_username, req.internal_password,
+               req.gemini_api_key]
+    return hashlib.sha256(json.dumps(secrets).encode("utf-8")).hexdigest()
+
+
+def request_key(req) -> Tuple:
+    """
+    Identity of a diagnosis request: same issue and same search configuration
+    produce the same report. Used for job coalescing and result caching, so
+    it includes the credentials hash: a report built with one user's Jira
+    access and AI key is never handed to another user.
+    """
+    scopes = search_scopes(req)
+    project = ",".join(scope[1] for scope in scopes)
+    issuetype = ",".join(scope[2] for scope in scopes)
+    return (
+        req.issue_key.strip().upper(),
+        req.customer_jira_url,
+        req.internal_jira_url,
+        req.search_target,
+        project,
+        issuetype,
+        (req.custom_core_intent or "").strip(),
+        credentials_hash(req),
+    )
+
+
+class PipelineResources:
+    """
+    Jira connectors plus memoized Jira lookups for one or more diagnoses.
+
+    Each diagnosis gets its own instance by default. A batch shares a single
+    instance across all of its items, so identical JQL searches and
+    historical issue fetches are done once per batch. Connectors come from
+    the process-wide JiraConnectorPool, requested on first use and leased
+    until `aclose()`, so the pool never evicts them in the middle of a batch.
+    Searches and detail fetches are answered from the local IssueMirror when
+    the scope has been synced recently enough. With JIRA_ASYNC_CLIENT=1,
+    detail fetches go through per-server AsyncJiraConnectors, also closed
+    by `aclose()`.
+    """
+
+    def __init__(self, settings):
+        self.settings = settings
+        self.mirror = get_issue_mirror()
+        self.mirror_hits = 0
+        self._connectors: Dict[str, asyncio.Future] = {}
+        self._async_connectors: Dict[str, AsyncJiraConnector] = {}
+        self._memo: Dict[Tuple, asyncio.Future] = {}
+
+    def async_connector(self, connector: JiraConnector) -> AsyncJiraConnector:
+        """Async client for the same server and credentials as `connector`."""
+        client = self._async_connectors.get(connector.server_url)
+        if client is None:
+            client = AsyncJiraConnector(connector.server_url, connector.username, connector.token)
+            self._async_connectors[connector.server_url] = client
+        return client
+
+    async def aclose(self):
+        """Close async clients opened by this instance and release its pooled connectors (they stay open)."""
+        clients = list(self._async_connectors.values())
+        self._async_connectors.clear()
+        for client in clients:
+            await client.aclose()
+
+        def release(task: asyncio.Future):
+            if not task.cancelled() and task.exception() is None:
+                get_connector_pool().release(task.result())
+
+        tasks = list(self._connectors.values())
+        self._connectors.clear()
+        for task in tasks:
+            # A handshake still running releases its lease when it completes
+            task.add_done_callback(release)
+
+    def _shared(self, table: Dict, key, factory: Callable[[], Awaitable[Any]]) -> asyncio.Future:
+        """Start `factory` once per key; concurrent callers await the same task."""
+        task = table.get(key)
+        if task is None:
+            task = asyncio.ensure_future(factory())
+            table[key] = task
+        return task
+
+    async def connector(self, which: str) -> JiraConnector:
+        """The "customer" or "internal" connector, from the process-wide pool."""
+        s = self.settings
+        if which == "customer":
+            args = (s.customer_jira_url, s.customer_username, s.customer_password)
+        else:
+            args = (s.internal_jira_url, s.internal_username, s.internal_password)
+        task = self._shared(self._connectors, which, lambda: run_blocking("jira", get_connector_pool().get, *args))
+        try:
+            return await asyncio.shield(task)
+        except Exception:
+            # Don't pin a failed handshake for the rest of the batch
+            if self._connectors.get(which) is task:
+                del self._connectors[which]
+            raise
+
+    async def search_issues(self, connector: JiraConnector, jql: str,
+                            max_results: int) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """Search stubs plus the search's payload/parse stats (see iter_search_issues)."""
+        def search():
+            stats: Dict[str, Any] = {"source": "jira"}
+            return connector.search_issues(jql, max_results=max_results, stats=stats), stats
+
+        key = ("search", connector.server_url, jql, max_results)
+        memoized = key in self._memo
+        results, stats = await asyncio.shield(self._shared(self._memo, key, lambda: run_blocking("jira", search)))
+        # A batch item reusing another item's search sent nothing to Jira
+        return list(results), dict(stats, memoized=True) if memoized else dict(stats)
+
+    async def search_mirror(self, connector: JiraConnector, project: str, issuetype: str,
+                            intents: List[str], details: List[str],
+                            max_results: int) -> Optional[Tuple[List[Dict[str, Any]], Dict[str, Any]]]:
+        """Same as search_issues, served by the mirror; None if the scope is not mirrored/fresh."""
+        def search():
+            if not self.mirror.is_fresh(connector.server_url, project, issuetype):
+                return None
+            started = time.perf_counter()
+            results = self.mirror.search(connector.server_url, project, issuetype, intents, details, max_results)
+            return results, {"source": "mirror", "ranking": "bm25",
+                             "request_seconds": round(time.perf_counter() - started, 4)}
+
+        key = ("mirror_search", connector.server_url, project, issuetype, tuple(intents), tuple(details), max_results)
+        found = await asyncio.shield(self._shared(self._memo, key, lambda: run_blocking("io", search)))
+        if found is None:
+            return None
+        return list(found[0]), dict(found[1])
+
+    async def get_issue(self, connector: JiraConnector, issue_key: str) -> Dict[str, Any]:
+        key = ("issue", connector.server_url, issue_key.upper())
+        issue = await asyncio.shield(self._shared(
+            self._memo, key, lambda: run_blocking("jira", connector.get_issue, issue_key)))
+        # Shallow copy: the pipeline annotates issues (relevance_reason, local paths)
+        return dict(issue)
+
+    async def get_issues(self, connector: JiraConnector, issue_keys: List[str]) -> List[Any]:
+        """
+        Issues for several keys, in input order, with the Exception in place of
+        any issue that could not be fetched. Keys not fetched before in this
+        instance are taken from the mirror when possible, the rest loaded with
+        a single bulk call (JiraConnector.get_issues); all are memoized per
+        key, so they are shared with get_issue.
+        """
+        def unfetched() -> List[str]:
+            keys = []
+            for issue_key in issue_keys:
+                key = ("issue", connector.server_url, issue_key.upper())
+                if key not in self._memo and issue_key.upper() not in keys:
+                    keys.append(issue_key.upper())
+            return keys
+
+        missing = unfetched()
+        if missing:
+            mirrored = await run_blocking("io", self.mirror.get_issues, connector.server_url, missing)
+            for issue_key, issue in mirrored.items():
+                key = ("issue", connector.server_url, issue_key)
+                if key not in self._memo:
+                    done = asyncio.get_running_loop().create_future()
+                    done.set_result(issue)
+                    self._memo[key] = done
+                    self.mirror_hits += 1
+            missing = unfetched()
+        if missing:
+            if ASYNC_JIRA_CLIENT:
+                bulk = asyncio.ensure_future(self.async_connector(connector).get_issues(missing))
+            else:
+                bulk = asyncio.ensure_future(run_blocking("jira", connector.get_issues, missing))
+
+            async def pick(issue_key: str) -> Dict[str, Any]:
+                result = (await bulk)[issue_key]
+                if isinstance(result, Exception):
+                    raise result
+                return result
+
+            for issue_key in missing:
+                self._memo[("issue", connector.server_url, issue_key)] = asyncio.ensure_future(pick(issue_key))
+
+        return await asyncio.gather(
+            *(self.get_issue(connector, issue_key) for issue_key in issue_keys), return_exceptions=True)
+
+
+async def diagnose(req, emit: Optional[Callable[[str, Dict[str, Any]], None]] = None,
+                   resources: Optional[PipelineResources] = None) -> Dict[str, Any]:
+    """
+    Run the full diagnostic pipeline for a DiagnosticRequest.
+
+    ``emit(event, data)`` (optional) receives a ``stage_start``/``stage_end``
+    event around every stage, with elapsed time, counts and partial trace
+    data, so callers can stream progress before the final report is ready.
+    ``resources`` lets several diagnoses share connectors and Jira lookups
+    (see PipelineResources).
+    """
+    print(f"Received diagnostic request for issue: {req.issue_key}")
+    progress = ProgressReporter(emit)
+    owns_resources = resources is None
+    if owns_resources:
+        resources = PipelineResources(req)
+    # Initialize trace with all possible fields
+    trace = {
+        "extracted_keywords": [],
+        "stratified_keywords": {"core_intent": [], "fingerprints": [], "general_terms": []},
+        "initial_search_query": "",  # JQL actually sent to Jira by the last search attempt
+        "mirror_search_query": "",  # BM25 query answered by the local mirror instead
+        "search_source": "",  # "jira", "mirror" or both ("jira+mirror", FEDERATED)
+        "historical_candidates": [],
+        "deep_context_count": 0,
+        "log_budget": {},
+        "raw_prompt": "",
+        "raw_ai_response": "",
+        "downloads": [],
+        "cache": {"hit": False},
+        "timings": [],
+        "volume": {}
+    }
+    outcome = "error"
+
+    # Private temp dir per run: concurrent diagnoses of the same issue must not
+    # share (and clean up) each other's downloads
+    os.makedirs("data", exist_ok=True)
+    temp_dir = tempfile.mkdtemp(prefix=f"{req.issue_key}_", dir="data")
+
+    # Every blocking call below (python-jira, Gemini, downloads, log scanning)
+    # is dispatched to a bounded per-stage thread pool so this worker's event
+    # loop keeps serving other diagnoses and /health in the meantime.
+    try:
+        # 1. Initialization and Step 1: Fetch Current Issue Full Details
+        async def fetch_from_either(method_name: str):
+            """
+            Call a connector method on the customer Jira, falling back to
+            internal on 404. In FEDERATED mode both lookups start at once (the
+            customer result still wins), so the fallback costs no extra round trip.
+            """
+            async def call(which: str):
+                connector = await resources.connector(which)
+                if method_name == "get_issue":
+                    return await resources.get_issue(connector, req.issue_key)
+                return await run_blocking("jira", getattr(connector, method_name), req.issue_key)
+
+            lookups: Dict[str, asyncio.Future] = {}
+            if req.search_target == "FEDERATED":
+                lookups = {which: asyncio.ensure_future(call(which)) for which in ("customer", "internal")}
+                for task in lookups.values():
+                    # The losing lookup's outcome is not needed; don't log it as unretrieved
+                    task.add_done_callback(lambda t: t.cancelled() or t.exception())
+            try:
+                for which in ("customer", "internal"):
+                    try:
+                        return await (lookups[which] if lookups else call(which)), SOURCE_NAMES[which]
+                    except Exception as e:
+                        if "404" not in str(e):
+                            raise
+                raise HTTPException(status_code=404, detail=f"在客户及内部 Jira 服务器中均未找到 ID: {req.issue_key}")
+            finally:
+                for task in lookups.values():
+                    if not task.done():
+                        task.cancel()
+
+        # Result cache: reuse the stored report if the issue has not been
+        # updated since (cheap `updated`-only probe instead of the full pipeline)
+        result_cache = get_result_cache()
+        identity = request_key(req)
+        if not getattr(req, "force_refresh", False):
+            with progress.stage("cache_lookup") as info:
+                revision, _ = await fetch_from_either("get_issue_revision")
+                cached = await run_blocking("io", result_cache.get, cache_key(identity, revision))
+                info["hit"] = cached is not None
+            if cached is not None:
+                print(f"Result cache hit for {req.issue_key} (revision {revision})")
+                response = cached["response"]
+                response["trace"]["cache"] = {"hit": True, "revision": revision, "cached_at": cached["cached_at"]}
+                response["trace"]["timings"] = progress.timings
+                outcome = "cache_hit"
+                return response
+
+        with progress.stage("fetch_issue", issue_key=req.issue_key) as info:
+            current_issue, source_name = await fetch_from_either("get_issue")
+            info.update(
+                source=source_name,
+                summary=current_issue['summary'],
+                image_count=len(current_issue.get('images', [])),
+                log_count=len(current_issue.get('logs', []))
+            )
+
+        ai = AIReasoning(req.gemini_api_key)
+        active_connector = await resources.connector("customer" if source_name == SOURCE_NAMES["customer"] else "internal")
+
+        downloader = AttachmentDownloader(cache=get_attachment_cache())
+
+        # Keyword Extraction with User Override and Retry Logic (E1/E2/E3)
+        MIN_CANDIDATES = 3
+        MAX_KEYWORD_RETRIES = 3
+
+        # Keyword Cleaning & Sanitization logic
+        def clean_kw(k: str) -> bool:
+            if any(char in k for char in ['{', '}', '[', ']', '#', ':', '\"']): return False
+            if len(k) > 40: return False
+            if len(k.strip()) < 2: return False
+            return True
+
+        # 3. Step 3: Deep Search (Dynamic Target - Plan 5 Improved)
+        # One scope per searched instance (two in FEDERATED mode); every
+        # candidate remembers its source so details and images are fetched
+        # from the instance it came from.
+        scopes = search_scopes(req)
+        search_target_name = " + ".join(SOURCE_NAMES[which] for which, _, _ in scopes)
+        candidate_sources: Dict[str, str] = {}
+
+        search_payload = {"bytes": 0, "parse_seconds": 0.0, "jql_searches": 0, "mirror_searches": 0}
+
+        # Helper function to build JQL and search one instance. Returns the
+        # query actually run (the JQL, or the mirror's BM25 query when stats
+        # "source" is "mirror"), the results and the search stats.
+        async def search_source(which, project_key, issuetype, intents, details):
+            project_filter = f'project = "{project_key}"'
+            issuetype_filter = f'issuetype = "{issuetype}"'
+            intent_list = [f'text ~ "{k}"' for k in intents if clean_kw(k)]
+            detail_list = [f'text ~ "{k}"' for k in details if clean_kw(k)]
+
+            intent_clause = f"({' OR '.join(intent_list)})" if intent_list else ""
+            detail_clause = f"({' OR '.join(detail_list)})" if detail_list else ""
+
+            jql = f"{project_filter} AND {issuetype_filter}"
+            if intent_clause and detail_clause:
+                jql += f" AND {intent_clause} AND {detail_clause}"
+            elif intent_clause:
+                jql += f" AND {intent_clause}"
+            elif detail_clause:
+                jql += f" AND {detail_clause}"
+            jql += " ORDER BY created DESC"
+
+            connector = await resources.connector(which)
+            # Synced scope: BM25 ranking over the local mirror instead of JQL.
+            # It returns a graded list rather than all-or-nothing matches, so
+            # the retry loop normally stops after the first extraction.
+            mirror_intents = [k for k in intents if clean_kw(k)]
+            mirror_details = [k for k in details if clean_kw(k)]
+            mirrored = await resources.search_mirror(
+                connector, project_key, issuetype, mirror_intents, mirror_details, max_results=100)
+            if mirrored is not None:
+                query = (f"BM25 {project_key}/{issuetype}: intents {', '.join(mirror_intents) or '-'}; "
+                         f"details {', '.join(mirror_details) or '-'}")
+                return query, mirrored[0], mirrored[1]
+            results, stats = await resources.search_issues(connector, jql, max_results=100)
+            return jql, results, stats
+
+        def split_queries(outcomes):
+            """
+            {"jira": JQL run on Jira, "mirror": mirror queries, "sent": JQL
+            searches that reached Jira (not memoized)} from [(which, query, stats)].
+            """
+            queries = {"jira": [], "mirror": [], "sent": 0}
+            for which, query, stats in outcomes:
+                if query:
+                    kind = "mirror" if stats.get("source") == "mirror" else "jira"
+                    queries[kind].append(f"[{which}] {query}" if len(scopes) > 1 else query)
+                    queries["sent"] += kind == "jira" and not stats.get("memoized")
+            return queries
+
+        async def search_with_keywords(intents, details):
+            if len(scopes) == 1:
+                which, project_key, issuetype = scopes[0]
+                query, results, stats = await search_source(which, project_key, issuetype, intents, details)
+                return split_queries([(which, query, stats)]), merge_candidates([(which, results)]), stats
+
+            async def bounded(which, project_key, issuetype):
+                started = time.perf_counter()
+                try:
+                    jql, results, stats = await asyncio.wait_for(
+                        search_source(which, project_key, issuetype, intents, details),
+                        FEDERATED_SEARCH_DEADLINE_SECONDS)
+                    stats = dict(stats, found=len(results))
+                    error = None
+                except asyncio.TimeoutError as e:
+                    jql, results, error = "", [], e
+                    stats = {"error": f"deadline of {FEDERATED_SEARCH_DEADLINE_SECONDS}s exceeded", "timed_out": True}
+                except Exception as e:
+                    jql, results, error = "", [], e
+                    stats = {"error": str(e)}
+                stats["seconds"] = round(time.perf_counter() - started, 3)
+                return which, jql, results, stats, error
+
+            outcomes = await asyncio.gather(*(bounded(*scope) for scope in scopes))
+            failed = [outcome[4] for outcome in outcomes if outcome[4] is not None]
+            if len(failed) == len(outcomes):
+                # No instance answered: an empty candidate list would be misleading
+                raise failed[0]
+            source_stats = {which: stats for which, _, _, stats, _ in outcomes}
+            print(f"Federated search: " + ", ".join(
+                f"{which} {stats.get('found', 0)} in {stats['seconds']}s" for which, stats in source_stats.items()))
+            queries = split_queries([(which, query, stats) for which, query, _, stats, _ in outcomes])
+            merged = merge_candidates([(which, results) for which, _, results, _, _ in outcomes])
+            stats = {
+                "source": "federated",
+                "payload_bytes": sum(s.get("payload_bytes", 0) for s in source_stats.values()),
+                "parse_seconds": sum(s.get("parse_seconds", 0) for s in source_stats.values()),
+                "sources": source_stats,
+            }
+            return queries, merged, stats
+
+        # Steps 2-8 form a dependency graph (see TaskGraph) rather than a fixed
+        # sequence: log fingerprinting only needs the current issue, so it runs
+        # alongside the image -> keyword -> search -> rerank chain, and
+        # relevance scoring runs alongside the candidate detail fetches.
+        async def download_current_images() -> List[str]:
+            print("Downloading images for keyword extraction (limit 10)...")
+            with progress.stage("current_images") as info:
+                current_image_jobs = [
+                    (img, os.path.join(temp_dir, f"curr_{img['filename']}"), req.issue_key)
+                    for img in current_issue.get('images', [])[:10]
+                ]
+                current_image_paths = [
+                    r["path"] for r in await downloader.download_all(active_connector, current_image_jobs) if r["status"] == "ok"
+                ]
+                info["downloaded"] = len(current_image_paths)
+            return current_image_paths
+
+        async def retrieve_candidates(current_image_paths: List[str]) -> List[Dict[str, Any]]:
+            all_candidates = []
+            excluded_keywords = []
+
+            # Retry loop for keyword extraction (E1/E2)
+            for attempt in range(MAX_KEYWORD_RETRIES):
+                print(f"Keyword extraction attempt {attempt + 1}/{MAX_KEYWORD_RETRIES}...")
+
+                with progress.stage("keyword_extraction", attempt=attempt + 1) as info:
+                    # E3: Use user-provided core intent if available, otherwise AI extract
+                    if req.custom_core_intent and attempt == 0:
+                        # User provided custom core intent - use it directly
+                        user_intents = [k.strip() for k in req.custom_core_intent.split(',') if k.strip()]
+                        print(f"Using user-provided core intent: {user_intents}")
+
+                        # Still extract fingerprints and general_terms via AI
+                        ai_kw_data = await run_blocking("ai", ai.extract_keywords, current_issue, current_image_paths)
+                        kw_data = {
+                            "core_intent": user_intents,  # User override
+                            "fingerprints": ai_kw_data.get("fingerprints", []),
+                            "general_terms": ai_kw_data.get("general_terms", [])
+                        }
+                    else:
+                        # AI extraction (with exclusion for retries)
+                        print(f"Extracting keywords via AI (excluded: {excluded_keywords})...")
+                        kw_data = await run_blocking("ai", ai.extract_keywords, current_issue, current_image_paths, exclude=excluded_keywords)
+
+                    trace["stratified_keywords"] = kw_data
+                    trace["extracted_keywords"] = kw_data.get("core_intent", []) + kw_data.get("fingerprints", []) + kw_data.get("general_terms", [])
+                    info["stratified_keywords"] = kw_data
+
+                # Extract and prepare keywords
+                raw_intents = kw_data.get("core_intent", [])
+                raw_generals = kw_data.get("general_terms", [])
+                raw_fingerprints = kw_data.get("fingerprints", [])
+                valid_intents = [k for k in raw_intents if clean_kw(k)]
+                valid_details = [k for k in raw_generals if clean_kw(k)] + [k for k in raw_fingerprints if clean_kw(k)]
+
+                # Search with current keywords
+                with progress.stage("search", attempt=attempt + 1) as info:
+                    queries, new_candidates, search_stats = await search_with_keywords(valid_intents, valid_details)
+                    final_jql = "\n".join(queries["jira"])
+                    mirror_query = "\n".join(queries["mirror"])
+                    trace["initial_search_query"] = final_jql
+                    trace["mirror_search_query"] = mirror_query
+                    trace["search_source"] = "+".join(kind for kind in ("jira", "mirror") if queries[kind])
+                    search_payload["bytes"] += search_stats.get("payload_bytes", 0)
+                    search_payload["parse_seconds"] += search_stats.get("parse_seconds", 0)
+                    # Only searches that actually reached Jira count as JQL searches
+                    search_payload["jql_searches"] += queries["sent"]
+                    search_payload["mirror_searches"] += len(queries["mirror"])
+                    print(f"Search attempt {attempt + 1}: Found {len(new_candidates)} candidates")
+
+                    # Accumulate unique candidates (E2)
+                    existing_keys = {c['key'] for c in all_candidates}
+                    for c in new_candidates:
+                        if c['key'] not in existing_keys:
+                            all_candidates.append(c)
+                            candidate_sources[c['key']] = c['source']
+                    info.update(jql=final_jql, mirror_query=mirror_query, found=len(new_candidates), total_candidates=len(all_candidates), **search_stats)
+
+                print(f"Total accumulated candidates: {len(all_candidates)}")
+
+                # Stop if we have enough candidates
+                if len(all_candidates) >= MIN_CANDIDATES:
+                    print(f"Sufficient candidates found ({len(all_candidates)} >= {MIN_CANDIDATES})")
+                    break
+
+                # E1/E2: Record used keywords for next retry
+                excluded_keywords.extend(raw_intents)
+
+                if attempt < MAX_KEYWORD_RETRIES - 1:
+                    print(f"Not enough candidates, retrying with different keywords...")
+
+            print(f"Final candidate count after all retries: {len(all_candidates)}")
+            return all_candidates
+
+        # 4. Step 4: Semantic Reranking (AI Refinement)
+        async def rerank(initial_candidates: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+            print(f"Semantic Reranking: AI filtering {len(initial_candidates)} candidates down to Top 20...")
+            with progress.stage("rerank", input_candidates=len(initial_candidates)) as info:
+                candidate_stubs = await run_blocking("ai", ai.rerank_candidates, current_issue, initial_candidates, top_n=20)
+                info["candidates"] = [{"key": c["key"], "summary": c["summary"]} for c in candidate_stubs]
+            return candidate_stubs
+
+        # 5. Step 5: AI Relevance Explanation for the reranked Top 10
+        async def score_relevance(candidate_stubs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+            print(f"Generating relevance explanations for {len(candidate_stubs)} final candidates...")
+            with progress.stage("relevance", candidates=len(candidate_stubs)) as info:
+                relevance_data = await run_blocking("ai", ai.generate_relevance_scores, current_issue, candidate_stubs)
+                relevance_map = {item['key']: item for item in relevance_data}
+
+                trace["historical_candidates"] = []
+                for c in candidate_stubs:
+                    rel = relevance_map.get(c['key'], {"reason": "语义重排入选", "similarity": "中", "score": 60})
+                    trace["historical_candidates"].append({
+                        "key": c["key"],
+                        "source": SOURCE_NAMES.get(candidate_sources.get(c["key"], scopes[0][0])),
+                        "summary": c["summary"],
+                        "reason": rel.get('reason', '语义重排入选'),
+                        "similarity": rel.get('similarity', '高' if c['key'] in [r['key'] for r in relevance_data] else '中'),
+                        "score": rel.get('score', 70)
+                    })
+                info["historical_candidates"] = trace["historical_candidates"]
+            return relevance_data
+
+        # 6. Step 6: Fetch Full Details for Candidates
+        async def fetch_details(candidate_stubs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+            print(f"Fetching full details for {len(candidate_stubs)} candidates from {search_target_name}...")
+            full_historical_issues = []
+            with progress.stage("details", candidates=len(candidate_stubs)) as info:
+                # One bulk `key in (...)` fetch per source instance, run
+                # concurrently; results stay in rerank order and failures are
+                # isolated per candidate.
+                keys_by_source: Dict[str, List[str]] = {}
+                for stub in candidate_stubs:
+                    keys_by_source.setdefault(candidate_sources.get(stub["key"], scopes[0][0]), []).append(stub["key"])
+
+                async def fetch_source(which: str, keys: List[str]):
+                    try:
+                        issues = await resources.get_issues(await resources.connector(which), keys)
+                    except Exception as e:
+                        issues = [e] * len(keys)
+                    return [(key, which, issue) for key, issue in zip(keys, issues)]
+
+                fetched = {
+                    key: (which, issue)
+                    for batch in await asyncio.gather(*(fetch_source(w, k) for w, k in keys_by_source.items()))
+                    for key, which, issue in batch
+                }
+                for stub in candidate_stubs:
+                    which, full_issue = fetched[stub["key"]]
+                    if isinstance(full_issue, Exception):
+                        print(f"Failed to fetch details for candidate {stub['key']}: {full_issue}")
+                        continue
+                    full_issue['source'] = which
+                    full_historical_issues.append(full_issue)
+                trace["deep_context_count"] = len(full_historical_issues)
+                info["deep_context_count"] = trace["deep_context_count"]
+            return full_historical_issues
+
+        # 6.5. Download images for historical PRs (max 3 per PR)
+        async def download_historical_images(full_historical_issues: List[Dict[str, Any]]) -> List[str]:
+            print(f"Downloading images for {len(full_historical_issues)} historical PRs...")
+            with progress.stage("historical_images") as info:
+                jobs_by_source: Dict[str, List[Tuple[Dict[str, Any], str, str]]] = {}
+                for h_issue in full_historical_issues:
+                    for img in h_issue.get('images', [])[:10]:  # Limit to 10 images per historical PR
+                        jobs_by_source.setdefault(h_issue.get('source', scopes[0][0]), []).append(
+                            (img, os.path.join(temp_dir, f"hist_{h_issue['key']}_{img['filename']}"), h_issue['key']))
+
+                async def download_source(which: str, jobs):
+                    return await downloader.download_all(await resources.connector(which), jobs)
+
+                historical_results = [
+                    record
+                    for batch in await asyncio.gather(*(download_source(w, j) for w, j in jobs_by_source.items()))
+                    for record in batch
+                ]
+                all_historical_image_paths = []
+                for h_issue in full_historical_issues:
+                    h_issue['local_image_paths'] = [
+                        r["path"] for r in historical_results if r["label"] == h_issue['key'] and r["status"] == "ok"
+                    ]
+                    all_historical_image_paths.extend(h_issue['local_image_paths'])
+                info["downloaded"] = len(all_historical_image_paths)
+            print(f"Downloaded {len(all_historical_image_paths)} historical images total")
+            return all_historical_image_paths
+
+        # 7. Log Processing (depends only on the current issue)
+        async def fingerprint_logs() -> str:
+            log_processor = LogProcessor()
+            budget = LogBudget()
+
+            with progress.stage("logs", files=len(current_issue.get('logs', []))) as info:
+                log_jobs = [(log_file, os.path.join(temp_dir, log_file['filename']), req.issue_key) for log_file in current_issue.get('logs', [])]
+                for result in await downloader.download_all(active_connector, log_jobs):
+                    if result["status"] != "ok":
+                        budget.add_message(result['filename'], f"Log not downloaded ({result['status']}): {result.get('error', '')}")
+                        continue
+                    sections = await run_blocking("log", log_processor.fingerprint_sections, result["path"])
+                    budget.add(result['filename'], sections)
+                # All files share one token budget, so a noisy log cannot crowd the prompt
+                combined_logs = budget.render()
+                info.update(budget.stats)
+
+            trace["log_budget"] = budget.stats
+            return combined_logs
+
+        # 8. Final AI Reasoning
+        async def analyze(current_image_paths, relevance_data, full_historical_issues,
+                          all_historical_image_paths, combined_logs) -> Dict[str, Any]:
+            # Join the relevance and detail branches: annotate the fetched issues
+            # and complete the trace candidates with root cause / created date
+            relevance_map = {item['key']: item for item in relevance_data}
+            trace_candidates_map = {c['key']: c for c in trace["historical_candidates"]}
+            for full_issue in full_historical_issues:
+                full_issue['relevance_reason'] = relevance_map.get(full_issue['key'], {}).get('reason', '')
+                candidate = trace_candidates_map.get(full_issue['key'])
+                if candidate is not None:
+                    candidate['root_cause'] = full_issue.get('root_cause', '未知')
+                    candidate['created'] = full_issue.get('created', '')
+
+            print("Generating final diagnostic report with multimodal context...")
+            # Combine current issue images + historical PR images for multimodal analysis
+            all_image_paths = current_image_paths + all_historical_image_paths
+            print(f"Total images for AI analysis: {len(all_image_paths)} ({len(current_image_paths)} current + {len(all_historical_image_paths)} historical)")
+            with progress.stage("analysis", images=len(all_image_paths), historical_candidates=trace["historical_candidates"]):
+                return await run_blocking("ai", ai.analyze_pr, current_issue, full_historical_issues, combined_logs, all_image_paths)
+
+        graph = (
+            TaskGraph()
+            .add("current_images", download_current_images)
+            .add("logs", fingerprint_logs)
+            .add("candidates", retrieve_candidates, deps=["current_images"])
+            .add("rerank", rerank, deps=["candidates"])
+            .add("relevance", score_relevance, deps=["rerank"])
+            .add("details", fetch_details, deps=["rerank"])
+            .add("historical_images", download_historical_images, deps=["details"])
+            .add("analysis", analyze, deps=["current_images", "relevance", "details", "historical_images", "logs"])
+        )
+        reasoning_output = (await graph.run())["analysis"]
+        print("Final diagnostic report generated successfully.")
+
+        trace["raw_prompt"] = reasoning_output["raw_prompt"]
+        trace["downloads"] = downloader.records
+        trace["raw_ai_response"] = reasoning_output["raw_response"]
+        trace["cache"] = {"hit": False, "revision": current_issue.get('updated', '')}
+        trace["timings"] = progress.timings
+        trace["volume"] = {
+            "downloaded_bytes": downloader.used_bytes,
+            "downloaded_files": len([r for r in downloader.records if r["status"] == "ok" and not r["cached"]]),
+            "attachment_cache_hits": downloader.cache_hits,
+            "attachment_cache_misses": downloader.cache_misses,
+            "download_resumes": sum(r.get("resumes", 0) for r in downloader.records),
+            "partial_downloads": len([r for r in downloader.records if r.get("partial")]),
+            "gemini_calls": getattr(ai, "call_count", 0),
+            "gemini_retries": getattr(ai, "retry_count", 0),
+            "jql_searches": search_payload["jql_searches"],
+            "mirror_searches": search_payload["mirror_searches"],
+            "mirror_issue_hits": resources.mirror_hits,
+            "search_payload_bytes": search_payload["bytes"],
+            "search_parse_seconds": round(search_payload["parse_seconds"], 4),
+        }
+
+        response = {
+            "issue_key": req.issue_key,
+            "summary": current_issue['summary'],
+            "report": reasoning_output["report"],
+            "trace": trace,
+            "status": "success"
+        }
+        if current_issue.get('updated'):
+            try:
+                await run_blocking("io", result_cache.put, cache_key(identity, current_issue['updated']),
+                                   identity[0], current_issue['updated'], response)
+            except Exception as e:
+                print(f"Failed to store result cache entry for {req.issue_key}: {e}")
+        outcome = "success"
+        return response
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        DIAGNOSES.inc(outcome=outcome)
+        DIAGNOSIS_DURATION.observe(progress.elapsed(), outcome=outcome)
+        if owns_resources:
+            await resources.aclose()
+        # Final Cleanup attempt
+        await run_blocking("io", robust_cleanup, temp_dir)
@@ -0,0 +1,71 @@
+import json
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional
+
+from src.metrics import STAGE_DURATION
+
+
+def format_sse(event: str, data: Any) -> str:
+    """Encode one Server-Sent Events frame."""
+    payload = json.dumps(data, ensure_ascii=False, default=str)
+    return f"event: {event}\ndata: {payload}\n\n"
+
+
+class ProgressReporter:
+    """
+    Emits pipeline progress events to an optional sink.
+
+    ``emit(event, data)`` is called synchronously from the pipeline; every
+    event carries ``elapsed`` (seconds since the diagnosis started). When no
+    sink is given, reporting is a no-op apart from timing. Stage durations
+    are always recorded in ``self.timings`` (the per-request breakdown) and
+    in the ``diag_stage_duration_seconds`` histogram.
+    """
+
+    def __init__(self, emit: Optional[Callable[[str, Dict[str, Any]], None]] = None):
+        self._emit = emit
+        self.started = time.perf_counter()
+        self.timings: List[Dict[str, Any]] = []
+
+    def elapsed(self) -> float:
+        return round(time.perf_counter() - self.started, 3)
+
+    def send(self, event: str, **data):
+        if self._emit is None:
+            return
+        data["elapsed"] = self.elapsed()
+        try:
+            self._emit(event, data)
+        except Exception as e:
+            # A broken subscriber must never break the diagnosis itself
+            print(f"Progress sink failed for event '{event}': {e}")
+
+    @contextmanager
+    def stage(self, name: str, **data):
+        """
+        Wrap a pipeline stage: emits ``stage_start`` on entry and
+        ``stage_end`` (with ``duration`` and whatever the body put into the
+        yielded dict) on exit, or ``stage_error`` if the body raised.
+        """
+        info: Dict[str, Any] = {}
+        start = time.perf_counter()
+        offset = self.elapsed()
+        self.send("stage_start", stage=name, **data)
+        try:
+            yield info
+        except BaseException as e:
+            duration = self._record(name, start, offset, "error", data)
+            self.send("stage_error", stage=name, duration=duration, error=str(e))
+            raise
+        duration = self._record(name, start, offset, "ok", data)
+        self.send("stage_end", stage=name, duration=duration, **{**data, **info})
+
+    def _record(self, name: str, start: float, offset: float, outcome: str, data: Dict[str, Any]) -> float:
+        duration = time.perf_counter() - start
+        STAGE_DURATION.observe(duration, stage=name, outcome=outcome)
+        entry = {"stage": name, "start": offset, "duration": round(duration, 3), "outcome": outcome}
+        if "attempt" in data:
+            entry["attempt"] = data["attempt"]
+        self.timings.append(entry)
+        return round(duration, 3)
@@ -0,0 +1,291 @@
+import asyncio
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+from urllib.parse import urlparse
+
+from src.metrics import JIRA_THROTTLED
+
+# Steady request rate (token refill per second) and burst size per Jira host;
+# a rate of 0 disables the token bucket (concurrency limiting still applies).
+RATE_PER_SECOND = float(os.getenv("JIRA_RATE_PER_SECOND", "20"))
+RATE_BURST = int(os.getenv("JIRA_RATE_BURST", "40"))
+# Attempts after the first one for a throttled (429/5xx) call.
+THROTTLE_RETRIES = int(os.getenv("JIRA_THROTTLE_RETRIES", "4"))
+# Exponential backoff (with jitter) when the server sends no Retry-After.
+BACKOFF_BASE_SECONDS = float(os.getenv("JIRA_BACKOFF_BASE_SECONDS", "0.5"))
+BACKOFF_MAX_SECONDS = float(os.getenv("JIRA_BACKOFF_MAX_SECONDS", "30"))
+
+# Responses that mean "slow down": rate limited or overloaded. A plain 500
+# is left out on purpose: Jira answers it for requests it fails on (a JQL
+# function error, a broken custom field), so retrying repeats the same
+# failure and halving the window would punish the host for one bad call.
+THROTTLE_STATUSES = {429, 502, 503, 504}
+# Throttle responses within this window count as one congestion event,
+# so a burst of in-flight 429s halves the limit once, not N times.
+DECREASE_WINDOW_SECONDS = 1.0
+
+
+class JiraThrottled(Exception):
+    """Raised when a Jira host keeps throttling a call after all retries."""
+
+    def __init__(self, host: str, status: int, attempts: int):
+        super().__init__(f"Jira {host} still throttling (HTTP {status}) after {attempts} attempts")
+        self.host = host
+        self.status = status
+        self.attempts = attempts
+
+
+def retry_after_seconds(headers) -> Optional[float]:
+    """Parse a Retry-After header (delta seconds or HTTP date); None if absent/invalid."""
+    value = (headers or {}).get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_seconds(attempt: int, retry_after: Optional[float] = None) -> float:
+    """Delay before retry number attempt+1: Retry-After if given, else jittered exponential."""
+    if retry_after is not None:
+        return min(retry_after, BACKOFF_MAX_SECONDS) + random.uniform(0, BACKOFF_BASE_SECONDS)
+    return min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** attempt) * random.uniform(0.5, 1.5)
+
+
+def _status_and_headers(outcome: Any) -> Tuple[Optional[int], Any]:
+    """
+    HTTP status and headers of a response, or of the response behind an
+    exception. A returned value without a status (a python-jira Issue, a
+    field list) is a success: 200.
+    """
+    response = getattr(outcome, "response", None)
+    if response is None and not isinstance(outcome, Exception):
+        response = outcome
+    status = getattr(outcome, "status_code", None) or getattr(response, "status_code", None)
+    if status is None and not isinstance(outcome, Exception):
+        status = 200
+    return status, getattr(response, "headers", None) or {}
+
+
+class HostRateLimiter:
+    """
+    Per-host admission control for Jira REST calls.
+
+    A token bucket caps the request rate; an AIMD window caps concurrency:
+    every successful call grows the window by 1/window (about +1 per round
+    trip), a 429/5xx halves it and blocks the host until its Retry-After
+    has passed. `call` runs a function under both limits and retries
+    throttled attempts with jittered backoff; `acall` does the same for a
+    coroutine function, waiting on the event loop instead of a thread, so
+    threaded and async clients of a host share one window.
+    """
+
+    def __init__(self, host: str, max_concurrency: int, rate: float = RATE_PER_SECOND, burst: int = RATE_BURST,
+                 retries: int = THROTTLE_RETRIES, min_concurrency: int = 1):
+        self.host = host
+        self.max_concurrency = max(1, max_concurrency)
+        self.min_concurrency = max(1, min(min_concurrency, self.max_concurrency))
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.retries = retries
+        self.limit = float(self.max_concurrency)
+        self._in_flight = 0
+        self._tokens = float(self.burst)
+        self._refilled = time.monotonic()
+        self._blocked_until = 0.0
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
+        # (loop, event) of coroutines waiting in aacquire, woken on release
+        self._async_waiters = set()
+
+    def _wait_seconds(self, now: float) -> Optional[float]:
+        """Seconds until a call may start (0: now; None: when a slot frees up)."""
+        if now < self._blocked_until:
+            return self._blocked_until - now
+        if self._in_flight >= int(self.limit):
+            return None
+        if self.rate > 0:
+            self._tokens = min(self.burst, self._tokens + (now - self._refilled) * self.rate)
+            self._refilled = now
+            if self._tokens < 1:
+                return (1 - self._tokens) / self.rate
+        return 0.0
+
+    def _try_acquire(self) -> Optional[float]:
+        """Take a slot (and token) if one is free; else the _wait_seconds answer. Caller holds _cond."""
+        wait = self._wait_seconds(time.monotonic())
+        if wait == 0:
+            if self.rate > 0:
+                self._tokens -= 1
+            self._in_flight += 1
+        return wait
+
+    def acquire(self):
+        with self._cond:
+            while True:
+                wait = self._try_acquire()
+                if wait == 0:
+                    return
+                self._cond.wait(timeout=wait)
+
+    async def aacquire(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._cond:
+                wait = self._try_acquire()
+                if wait == 0:
+                    return
+                waiter = (loop, asyncio.Event())
+                self._async_waiters.add(waiter)
+            try:
+                await asyncio.wait_for(waiter[1].wait(), wait)
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                with self._cond:
+                    self._async_waiters.discard(waiter)
+
+    def release(self, status: Optional[int] = None, retry_after: Optional[float] = None):
+        """
+        End a call. A 2xx/3xx status grows the window; a throttle status
+        shrinks it and may block the host. Anything else (errors, no status
+        because the call raised) leaves it unchanged.
+        """
+        with self._cond:
+            self._in_flight -= 1
+            now = time.monotonic()
+            if status in THROTTLE_STATUSES:
+                if now - self._last_decrease >= DECREASE_WINDOW_SECONDS:
+                    self.limit = max(self.min_concurrency, self.limit / 2)
+                    self._last_decrease = now
+                if retry_after:
+                    self._blocked_until = max(self._blocked_until, now + min(retry_after, BACKOFF_MAX_SECONDS))
+            elif status is not None and 200 <= status < 400:
+                self.limit = min(self.max_concurrency, self.limit + 1 / self.limit)
+            self._cond.notify_all()
+            for loop, event in self._async_waiters:
+                try:
+                    loop.call_soon_threadsafe(event.set)
+                except RuntimeError:
+                    pass  # that loop is closed; its waiter is gone
+
+    def call(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Run fn under the limiter. A 429/5xx outcome (raised, or a returned
+        response with that status) is retried up to `retries` times, honoring
+        Retry-After; then JiraThrottled is raised. Other errors propagate.
+        """
+        attempt = 0
+        while True:
+            error = None
+            self.acquire()
+            try:
+                result = fn(*args, **kwargs)
+                status, headers = _status_and_headers(result)
+            except Exception as e:
+                status, headers = _status_and_headers(e)
+                if status not in THROTTLE_STATUSES:
+                    self.release(status)
+                    raise
+                result, error = None, e
+            retry_after = retry_after_seconds(headers) if status in THROTTLE_STATUSES else None
+            self.release(status, retry_after)
+            if status not in THROTTLE_STATUSES:
+                return result
+            if hasattr(result, "close"):
+                result.close()
+            attempt += 1
+            time.sleep(self._retry_delay(status, retry_after, attempt, error))
+
+    async def acall(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """`call` for a coroutine function (e.g. an httpx.AsyncClient method)."""
+        attempt = 0
+        while True:
+            error = None
+            await self.aacquire()
+            try:
+                result = await fn(*args, **kwargs)
+                status, headers = _status_and_headers(result)
+            except Exception as e:
+                status, headers = _status_and_headers(e)
+                if status not in THROTTLE_STATUSES:
+                    self.release(status)
+                    raise
+                result, error = None, e
+            except BaseException:
+                self.release()
+                raise
+            retry_after = retry_after_seconds(headers) if status in THROTTLE_STATUSES else None
+            self.release(status, retry_after)
+            if status not in THROTTLE_STATUSES:
+                return result
+            if hasattr(result, "aclose"):
+                await result.aclose()
+            attempt += 1
+            await asyncio.sleep(self._retry_delay(status, retry_after, attempt, error))
+
+    @contextmanager
+    def slot(self) -> Iterator[None]:
+        """
+        Hold one slot of the window around a block that is not a single
+        call (e.g. a whole attachment transfer). The block finishing counts
+        as a success; an exception counts with the status behind it.
+        """
+        self.acquire()
+        status = None
+        try:
+            yield
+            status = 200
+        except Exception as e:
+            status, _ = _status_and_headers(e)
+            raise
+        finally:
+            self.release(status)
+
+    def _retry_delay(self, status: int, retry_after: Optional[float], attempt: int,
+                     error: Optional[Exception]) -> float:
+        """Count throttled attempt number `attempt`; raise JiraThrottled past `retries`, else the backoff."""
+        JIRA_THROTTLED.inc(host=self.host, status=str(status))
+        if attempt > self.retries:
+            raise JiraThrottled(self.host, status, attempt) from error
+        delay = backoff_seconds(attempt - 1, retry_after)
+        print(f"Jira {self.host} throttled (HTTP {status}); retry {attempt}/{self.retries} in {delay:.1f}s")
+        return delay
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "limit": round(self.limit, 2),
+                "in_flight": self._in_flight,
+            }
+
+
+_limiters: Dict[Tuple[str, str], HostRateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_host_limiter(server_url: str, max_concurrency: int, scope: str = "rest",
+                     rate: float = RATE_PER_SECOND) -> HostRateLimiter:
+    """
+    Process-wide limiter for a Jira host, shared by every connector to it.
+    Scopes get independent windows: "rest" admits REST calls (each one
+    until its response headers arrive), "download" whole attachment
+    transfers, which may stream for minutes and so must not hold REST slots.
+    """
+    host = urlparse(server_url).netloc or server_url
+    with _limiters_lock:
+        limiter = _limiters.get((scope, host))
+        if limiter is None:
+            limiter = HostRateLimiter(host, max_concurrency, rate=rate)
+            _limiters[(scope, host)] = limiter
+    return limiter
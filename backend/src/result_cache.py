@@ -0,0 +1,118 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+RESULT_CACHE_PATH = os.getenv("DIAG_RESULT_CACHE_PATH", "data/cache/results.sqlite3")
+# Cached reports older than this are recomputed even if the issue is unchanged.
+RESULT_CACHE_TTL_SECONDS = int(os.getenv("DIAG_RESULT_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+# Total payload size kept on disk; least recently used entries are evicted first.
+RESULT_CACHE_MAX_BYTES = int(os.getenv("DIAG_RESULT_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+
+
+def cache_key(identity: Tuple, revision: str) -> str:
+    """Stable key for (request identity, issue `updated` timestamp)."""
+    raw = json.dumps([list(identity), revision], ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """
+    SQLite-backed store of /diagnose responses with TTL and size-bounded LRU
+    eviction. Safe to share between threads (one connection per call).
+    """
+
+    def __init__(self, path: str = RESULT_CACHE_PATH, ttl_seconds: int = RESULT_CACHE_TTL_SECONDS,
+                 max_bytes: int = RESULT_CACHE_MAX_BYTES):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS results (
+                    key TEXT PRIMARY KEY,
+                    issue_key TEXT NOT NULL,
+                    revision TEXT NOT NULL,
+                    created REAL NOT NULL,
+                    last_access REAL NOT NULL,
+                    size INTEGER NOT NULL,
+                    payload TEXT NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_results_access ON results(last_access)")
+            conn.execute("PRAGMA journal_mode=WAL")
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """Short-lived connection; commits on success and always closes."""
+        conn = sqlite3.connect(self.path, timeout=10)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return the cached response (with ``cached_at``) or None."""
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            row = conn.execute("SELECT created, payload FROM results WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            created, payload = row
+            if now - created > self.ttl_seconds:
+                conn.execute("DELETE FROM results WHERE key = ?", (key,))
+                return None
+            conn.execute("UPDATE results SET last_access = ? WHERE key = ?", (now, key))
+        return {"cached_at": created, "response": json.loads(payload)}
+
+    def put(self, key: str, issue_key: str, revision: str, response: Dict[str, Any]):
+        payload = json.dumps(response, ensure_ascii=False, default=str)
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO results (key, issue_key, revision, created, last_access, size, payload) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, issue_key, revision, now, now, len(payload), payload)
+            )
+            self._evict(conn, now)
+
+    def _evict(self, conn: sqlite3.Connection, now: float):
+        conn.execute("DELETE FROM results WHERE created < ?", (now - self.ttl_seconds,))
+        total = 0
+        stale = []
+        for key, size in conn.execute("SELECT key, size FROM results ORDER BY last_access DESC"):
+            total += size
+            if total > self.max_bytes:
+                stale.append((key,))
+        if stale:
+            conn.executemany("DELETE FROM results WHERE key = ?", stale)
+
+    def invalidate(self, issue_key: str) -> int:
+        """Drop every cached report for an issue. Returns the number removed."""
+        with self._lock, self._connect() as conn:
+            return conn.execute("DELETE FROM results WHERE issue_key = ?", (issue_key.upper(),)).rowcount
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock, self._connect() as conn:
+            entries, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results").fetchone()
+        return {"entries": entries, "bytes": total}
+
+
+_result_cache: Optional[ResultCache] = None
+_result_cache_lock = threading.Lock()
+
+
+def get_result_cache() -> ResultCache:
+    """Process-wide result cache (created on first use)."""
+    global _result_cache
+    with _result_cache_lock:
+        if _result_cache is None:
+            _result_cache = ResultCache()
+    return _result_cache
@@ -37,3 +37,117 @@ def test_config():
 def test_issue_key():
     """Provide a known valid test issue key."""
     return os.getenv("TEST_ISSUE_KEY", "XH2CONTI-22035")
+
+
+class FakeJiraConnector:
+    """In-memory stand-in for JiraConnector used by unit tests."""
+    calls = []
+
+    def __init__(self, server_url, username, token):
+        self.server_url = server_url
+
+    def get_issue(self, issue_key):
+        FakeJiraConnector.calls.append(("get_issue", issue_key))
+        if issue_key.startswith("MISSING"):
+            raise Exception("404 Issue Does Not Exist")
+        return {
+            "key": issue_key,
+            "summary": f"{issue_key} CCU upgrade failed",
+            "description": "OTA upgrade timeout",
+            "steps_to_reproduce": "",
+            "attachments": [],
+            "images": [],
+            "logs": [],
+            "comments": [],
+            "updated": "2026-01-01T00:00:00.000+0000",
+        }
+
+    def get_issues(self, issue_keys):
+        FakeJiraConnector.calls.append(("get_issues", tuple(issue_keys)))
+        results = {}
+        for issue_key in issue_keys:
+            try:
+                results[issue_key] = self.get_issue(issue_key)
+            except Exception as e:
+                results[issue_key] = e
+        return results
+
+    def iter_issues(self, jql, stats=None):
+        FakeJiraConnector.calls.append(("iter_issues", jql))
+        for i in range(1, 5):
+            issue = self.get_issue(f"HIST-{i}")
+            issue["description"] = "CCU升级失败, OTA timeout"
+            issue["root_cause"] = "flash driver"
+            yield issue
+
+    def get_issue_revision(self, issue_key):
+        FakeJiraConnector.calls.append(("get_issue_revision", issue_key))
+        if issue_key.startswith("MISSING"):
+            raise Exception("404 Issue Does Not Exist")
+        return "2026-01-01T00:00:00.000+0000"
+
+    def search_issues(self, jql, max_results=5, stats=None):
+        FakeJiraConnector.calls.append(("search_issues", jql))
+        if stats is not None:
+            stats.update(pages=1, payload_bytes=512, request_seconds=0.0, parse_seconds=0.0)
+        return [
+            {"key": f"HIST-{i}", "summary": f"historical {i}", "description": "", "root_cause": "N/A"}
+            for i in range(1, 5)
+        ]
+
+    def download_attachment(self, url, destination_path, max_bytes=None, stats=None, size=None):
+        with open(destination_path, 'wb') as f:
+            f.write(b"data")
+        return 4
+
+
+class FakeAIReasoning:
+    """Deterministic stand-in for AIReasoning (no Gemini calls)."""
+
+    def __init__(self, api_key):
+        pass
+
+    def extract_keywords(self, issue_details, image_paths=None, exclude=None):
+        return {"core_intent": ["CCU升级失败"], "fingerprints": ["0x7F"], "general_terms": ["OTA"]}
+
+    def rerank_candidates(self, current_issue, candidates, top_n=20):
+        return candidates[:top_n]
+
+    def generate_relevance_scores(self, current_issue, candidates):
+        return [{"key": c["key"], "reason": "same module", "similarity": "高", "score": 90} for c in candidates]
+
+    def analyze_pr(self, current_issue, historical_issues, log_fingerprint, image_paths=None):
+        return {"report": f"report for {current_issue['key']}", "raw_prompt": "prompt", "raw_response": "response"}
+
+
+@pytest.fixture
+def fake_backends(monkeypatch, tmp_path):
+    """Replace Jira and Gemini clients in the pipeline with in-memory fakes."""
+    from src import pipeline
+    from src.jira_pool import JiraConnectorPool
+    from src.attachment_cache import AttachmentCache
+    from src.issue_mirror import IssueMirror
+    from src.result_cache import ResultCache
+    FakeJiraConnector.calls = []
+    connector_pool = JiraConnectorPool(factory=FakeJiraConnector)
+    monkeypatch.setattr(pipeline, "get_connector_pool", lambda: connector_pool)
+    monkeypatch.setattr(pipeline, "AIReasoning", FakeAIReasoning)
+    result_cache = ResultCache(str(tmp_path / "results.sqlite3"))
+    monkeypatch.setattr(pipeline, "get_result_cache", lambda: result_cache)
+    issue_mirror = IssueMirror(str(tmp_path / "mirror.sqlite3"))
+    monkeypatch.setattr(pipeline, "get_issue_mirror", lambda: issue_mirror)
+    attachment_cache = AttachmentCache(str(tmp_path / "attachments"))
+    monkeypatch.setattr(pipeline, "get_attachment_cache", lambda: attachment_cache)
+    return FakeJiraConnector
+
+
+@pytest.fixture
+def diagnostic_payload():
+    """Minimal valid /diagnose body (credentials are ignored by the fakes)."""
+    return {
+        "gemini_api_key": "test_key",
+        "customer_username": "user",
+        "customer_password": "pass",
+        "internal_username": "user",
+        "internal_password": "pass",
+    }
@@ -0,0 +1,221 @@
+"""
+Tests for the httpx-based AsyncJiraConnector (no Jira server required).
+"""
+import asyncio
+import os
+import sys
+
+import httpx
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src import async_jira, rate_limit
+from src.async_jira import AsyncJiraConnector
+from src.jira_connector import AttachmentTooLarge, JiraIssueParser
+from src.jira_fields import FieldMetadataCache
+
+FIELDS = [{"id": "customfield_10600", "name": "根因"}]
+
+
+def _raw_issue(key):
+    return {
+        "key": key,
+        "fields": {
+            "summary": f"{key} summary", "description": "CCU reset", "created": "2024-01-01", "updated": "2024-01-02",
+            "customfield_10600": {"value": "watchdog"},
+            "attachment": [
+                {"id": "1", "filename": "trace.log", "content": "https://jira.example.com/att/1", "size": 10},
+                {"id": "2", "filename": "screen.png", "content": "https://jira.example.com/att/2", "size": 20},
+            ],
+            "comment": {"comments": [{"author": {"displayName": "Tester"}, "body": "see log", "created": "x"}]},
+        },
+    }
+
+
+class FakeJiraServer:
+    """MockTransport handler serving /field, /issue, /search and attachments."""
+
+    def __init__(self, total=0, missing=()):
+        self.total = total
+        self.missing = set(missing)
+        self.paths = []
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        path = request.url.path
+        params = request.url.params
+        self.paths.append(path)
+        if path.endswith("/field"):
+            return httpx.Response(200, json=FIELDS)
+        if "/issue/" in path:
+            return httpx.Response(200, json=_raw_issue(path.rsplit("/", 1)[1]))
+        if path.endswith("/search"):
+            jql = params["jql"]
+            if jql.startswith("key in"):
+                keys = jql[len("key in ("):-1].split(", ")
+                return httpx.Response(200, json={"issues": [_raw_issue(k) for k in keys if k not in self.missing]})
+            start, limit = int(params["startAt"]), int(params["maxResults"])
+            issues = [_raw_issue(f"PR-{i}") for i in range(start, min(start + limit, self.total))]
+            return httpx.Response(200, json={"startAt": start, "total": self.total, "issues": issues})
+        if path.startswith("/att/"):
+            return httpx.Response(200, content=b"x" * 100)
+        return httpx.Response(404)
+
+
+@pytest.fixture(autouse=True)
+def field_cache(monkeypatch):
+    cache = FieldMetadataCache()
+    monkeypatch.setattr(async_jira, "get_field_metadata_cache", lambda: cache)
+    return cache
+
+
+@pytest.fixture(autouse=True)
+def host_limiters(monkeypatch):
+    limiters = {}
+    monkeypatch.setattr(rate_limit, "_limiters", limiters)
+    return limiters
+
+
+def _client(server):
+    return AsyncJiraConnector("https://jira.example.com", "user", "token", transport=httpx.MockTransport(server))
+
+
+@pytest.mark.unit
+def test_get_issue_matches_sync_parser_shape():
+    server = FakeJiraServer()
+
+    async def run():
+        async with _client(server) as client:
+            return await client.get_issue("PR-7")
+
+    issue = asyncio.run(run())
+    plan = FieldMetadataCache().plan("x", lambda: FIELDS)
+    expected = JiraIssueParser()._parse_issue(_raw_issue("PR-7"), plan)
+    assert issue == expected
+    assert issue["root_cause"] == "watchdog"
+    assert [a["filename"] for a in issue["logs"]] == ["trace.log"]
+
+
+@pytest.mark.unit
+def test_get_issues_batches_concurrently_and_marks_missing():
+    server = FakeJiraServer(missing={"PR-3"})
+
+    async def run():
+        async with _client(server) as client:
+            return await client.get_issues(["pr-1", "PR-2", "PR-3", "PR-4"], batch_size=2)
+
+    results = asyncio.run(run())
+    assert results["PR-1"]["key"] == "PR-1"
+    assert isinstance(results["PR-3"], Exception) and "404" in str(results["PR-3"])
+    assert server.paths.count("/rest/api/2/search") == 2
+    assert server.paths.count("/rest/api/2/field") == 1
+
+
+@pytest.mark.unit
+def test_search_pages_and_stops_at_max_results():
+    server = FakeJiraServer(total=120)
+    stats = {}
+
+    async def run():
+        async with _client(server) as client:
+            return await client.search_issues("project = PR", max_results=70, stats=stats)
+
+    results = asyncio.run(run())
+    assert [r["key"] for r in results] == [f"PR-{i}" for i in range(70)]
+    assert results[0]["root_cause"] == "watchdog"
+    assert stats["pages"] == 2
+
+
+@pytest.mark.unit
+def test_download_attachment_enforces_limit(tmp_path):
+    server = FakeJiraServer()
+
+    async def run():
+        async with _client(server) as client:
+            written = await client.download_attachment("https://jira.example.com/att/1", str(tmp_path / "a.log"))
+            with pytest.raises(AttachmentTooLarge):
+                await client.download_attachment("https://jira.example.com/att/1", str(tmp_path / "b.log"),
+                                                 max_bytes=50)
+            return written
+
+    assert asyncio.run(run()) == 100
+    assert (tmp_path / "a.log").read_bytes() == b"x" * 100
+    assert not (tmp_path / "b.log").exists()
+
+
+@pytest.mark.unit
+def test_search_stats_have_the_sync_keys():
+    server = FakeJiraServer(total=3)
+    stats = {}
+
+    async def run():
+        async with _client(server) as client:
+            return await client.search_issues("project = PR", max_results=10, stats=stats)
+
+    assert len(asyncio.run(run())) == 3
+    assert set(stats) == {"pages", "payload_bytes", "request_seconds", "parse_seconds", "total"}
+    assert stats["total"] == 3
+
+
+@pytest.mark.unit
+def test_interrupted_download_resumes_with_range(tmp_path):
+    body = bytes(range(100))
+    ranges = []
+
+    def server(request):
+        ranges.append(request.headers.get("Range"))
+        if len(ranges) == 1:
+            # the connection drops after 40 of the 100 declared bytes
+            return httpx.Response(200, headers={"Content-Length": "100"}, content=body[:40])
+        start = int(request.headers["Range"][len("bytes="):-1])
+        return httpx.Response(206, content=body[start:])
+
+    stats = {}
+
+    async def run():
+        async with AsyncJiraConnector("https://jira.example.com", "user", "token",
+                                      transport=httpx.MockTransport(server)) as client:
+            written = await client.download_attachment("https://jira.example.com/att/1", str(tmp_path / "a.bin"),
+                                                       stats=stats)
+            with pytest.raises(AttachmentTooLarge):
+                await client.download_attachment("https://jira.example.com/att/1", str(tmp_path / "b.bin"),
+                                                 max_bytes=50, size=100)
+            return written
+
+    assert asyncio.run(run()) == 100
+    assert (tmp_path / "a.bin").read_bytes() == body
+    assert ranges == [None, "bytes=40-"]  # the oversized file was rejected without a request
+    assert stats["resumes"] == 1 and stats["declared_bytes"] == 100
+
+
+@pytest.mark.unit
+def test_async_clients_share_the_host_window(monkeypatch):
+    monkeypatch.setattr(rate_limit, "BACKOFF_BASE_SECONDS", 0.01)
+    state = {"in_flight": 0, "peak": 0, "throttle": 1}
+
+    async def server(request):
+        if request.url.path.endswith("/serverInfo") and state["throttle"]:
+            state["throttle"] -= 1
+            return httpx.Response(429, headers={"Retry-After": "0"})
+        state["window"] = rate_limit._limiters["rest", "jira.example.com"].limit
+        state["in_flight"] += 1
+        state["peak"] = max(state["peak"], state["in_flight"])
+        await asyncio.sleep(0.02)
+        state["in_flight"] -= 1
+        return httpx.Response(200, json=FIELDS)
+
+    def client():
+        return AsyncJiraConnector("https://jira.example.com", "user", "token", max_concurrency=2,
+                                  transport=httpx.MockTransport(server))
+
+    async def run():
+        async with client() as a, client() as b:
+            assert a._limiter is b._limiter
+            await asyncio.gather(*(c._get_json("field") for c in (a, b) * 4))
+            peak = state["peak"]
+            # a 429 seen by one client halves the window both are admitted by
+            await a._get_json("serverInfo")
+            return peak
+
+    assert asyncio.run(run()) == 2
+    assert state["throttle"] == 0 and state["window"] == 1
@@ -0,0 +1,37 @@
+"""
+Tests for the BM25 tokenizer and ranking used for local candidate retrieval.
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.bm25_index import BM25Index, query_weights, tokenize
+
+
+@pytest.mark.unit
+def test_tokenize_mixed_chinese_english_and_codes():
+    tokens = tokenize("CCU升级失败: DTC U0100-87, NRC 0x7F (a 5)")
+    assert tokens == ["ccu", "升级", "级失", "失败", "dtc", "u0100-87", "u0100", "nrc", "0x7f", "5"]
+    assert tokenize("蓝牙") == ["蓝牙"] and tokenize("蓝") == ["蓝"]
+
+
+@pytest.mark.unit
+def test_bm25_ranks_rare_terms_and_partial_matches():
+    index = BM25Index()
+    index.add("PR-1", "OTA 升级失败 after flashing, ECU reports NRC 0x7F")
+    index.add("PR-2", "OTA download slow on 4G")
+    index.add("PR-3", "Radio reset when OTA starts")
+    index.add("PR-4", "Seat heater inoperative")
+
+    hits = index.search(query_weights([(["升级失败"], 2.0), (["0x7F", "OTA"], 1.0)]))
+    keys = [doc_id for doc_id, _, _ in hits]
+    # PR-1 matches the rare intent and code; the others only the common term
+    assert keys[0] == "PR-1"
+    assert set(keys) == {"PR-1", "PR-2", "PR-3"}
+    assert hits[0][1] > hits[1][1]
+
+    assert index.search(query_weights([(["missing"], 1.0)])) == []
+    assert len(index.search(query_weights([(["OTA"], 1.0)]), top_k=2)) == 2
@@ -60,6 +60,530 @@ class TestDiagnosticRequestValidation:
         assert response.status_code == 422
 
 
+class TestConcurrentDiagnoses:
+    """Unit tests for non-blocking execution of the diagnostic pipeline."""
+
+    @pytest.mark.unit
+    def test_blocking_stages_do_not_serialize_requests(self, fake_backends, monkeypatch, diagnostic_payload):
+        """N slow diagnoses should take about as long as one, and /health must stay responsive."""
+        import asyncio
+        import threading
+        import time
+        import httpx
+        from src import pipeline
+        from src.jira_pool import JiraConnectorPool
+        from tests.conftest import FakeJiraConnector
+
+        threads = []
+
+        class SlowConnector(FakeJiraConnector):
+            def __init__(self, server_url, username, token):
+                time.sleep(0.1)
+                super().__init__(server_url, username, token)
+
+            def get_issue(self, issue_key):
+                if issue_key.startswith("SLOW"):
+                    threads.append(threading.current_thread().name)
+                    time.sleep(0.4)
+                return super().get_issue(issue_key)
+
+            def get_issue_revision(self, issue_key):
+                threads.append(threading.current_thread().name)
+                time.sleep(0.4)
+                return super().get_issue_revision(issue_key)
+
+        monkeypatch.setattr(pipeline, "get_connector_pool", lambda: JiraConnectorPool(factory=SlowConnector))
+
+        async def scenario():
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as ac:
+                start = time.perf_counter()
+                diagnoses = [
+                    asyncio.create_task(ac.post("/diagnose", json={**diagnostic_payload, "issue_key": f"SLOW-{i}"}))
+                    for i in range(4)
+                ]
+                await asyncio.sleep(0.2)
+                health = await ac.get("/health")
+                health_latency = time.perf_counter() - start
+                responses = await asyncio.gather(*diagnoses)
+                return health, health_latency, responses, time.perf_counter() - start
+
+        health, health_latency, responses, elapsed = asyncio.run(scenario())
+
+        assert health.status_code == 200
+        assert health_latency < 0.5
+        assert [r.status_code for r in responses] == [200] * 4
+        assert [r.json()["issue_key"] for r in responses] == [f"SLOW-{i}" for i in range(4)]
+        # Every blocking Jira call ran on the jira stage pool, none on the event loop thread
+        assert len(threads) == 8 and all(name.startswith("diag-jira") for name in threads)
+        # Serial execution would take 4 * (0.1 + 2 * 0.4) = 3.6s
+        assert elapsed < 2.0
+
+
+    @pytest.mark.unit
+    def test_pooled_connectors_are_released_after_diagnosis(self, fake_backends, diagnostic_payload):
+        from src import pipeline
+
+        response = client.post("/diagnose", json={"issue_key": "LEASE-1", **diagnostic_payload})
+
+        assert response.status_code == 200
+        stats = pipeline.get_connector_pool().stats()
+        assert stats["connectors"] >= 1 and stats["leased"] == 0
+
+    @pytest.mark.unit
+    def test_gemini_key_is_per_instance(self, monkeypatch):
+        """Concurrent diagnoses with different Gemini keys must not share the process-wide genai config."""
+        import google.ai.generativelanguage as glm
+        from google.generativeai import client as genai_client
+        from src.ai_reasoning import AIReasoning
+
+        sent = []
+
+        class RecordingClient:
+            def __init__(self, client_options):
+                self.api_key = client_options["api_key"]
+
+            def generate_content(self, request, **kwargs):
+                sent.append((self.api_key, request.contents[0].parts[0].text))
+                return glm.GenerateContentResponse(candidates=[{"content": {"parts": [{"text": "ok"}]}}])
+
+        def no_default_client():
+            raise AssertionError("the process-wide default client was used")
+
+        monkeypatch.setattr(glm, "GenerativeServiceClient", RecordingClient)
+        monkeypatch.setattr(genai_client, "get_default_generative_client", no_default_client)
+
+        first, second = AIReasoning("key-a"), AIReasoning("key-b")
+        assert first.safe_generate_content("from a").text == "ok"
+        assert second.safe_generate_content("from b").text == "ok"
+
+        assert sent == [("key-a", "from a"), ("key-b", "from b")]
+
+        # An SDK without the attribute must fail loudly instead of sharing one key
+        import google.generativeai as genai
+        monkeypatch.setattr(genai, "GenerativeModel", lambda name: object())
+        with pytest.raises(RuntimeError, match="_client"):
+            AIReasoning("key-c")
+
+
+class TestDiagnosticStream:
+    """Unit tests for the SSE progress stream."""
+
+    @staticmethod
+    def _parse_sse(text):
+        import json
+        events = []
+        for frame in text.strip().split("\n\n"):
+            lines = dict(line.split(": ", 1) for line in frame.splitlines())
+            events.append((lines["event"], json.loads(lines["data"])))
+        return events
+
+    @pytest.mark.unit
+    def test_stream_emits_stage_events_then_result(self, fake_backends, diagnostic_payload):
+        response = client.post("/diagnose/stream", json={"issue_key": "TEST-1", **diagnostic_payload})
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+
+        events = self._parse_sse(response.text)
+        names, payloads = zip(*events)
+        assert names[-1] == "result"
+        assert payloads[-1]["report"] == "report for TEST-1"
+
+        ended = [p["stage"] for n, p in events if n == "stage_end"]
+        for stage in ["fetch_issue", "keyword_extraction", "search", "rerank", "relevance", "details", "logs", "analysis"]:
+            assert stage in ended
+        # Candidates are available before the final analysis finishes
+        relevance_end = next(p for n, p in events if n == "stage_end" and p["stage"] == "relevance")
+        assert [c["key"] for c in relevance_end["historical_candidates"]] == ["HIST-1", "HIST-2", "HIST-3", "HIST-4"]
+        assert all("elapsed" in p for p in payloads[:-1])
+
+    @pytest.mark.unit
+    def test_stream_reports_errors_as_event(self, fake_backends, diagnostic_payload):
+        response = client.post("/diagnose/stream", json={"issue_key": "MISSING-1", **diagnostic_payload})
+        events = self._parse_sse(response.text)
+        assert events[0][0] == "stage_start"
+        assert "stage_error" in [n for n, p in events]
+        assert events[-1][0] == "error"
+
+
+class TestMetrics:
+    """Unit tests for per-stage timing and the Prometheus endpoint."""
+
+    @pytest.mark.unit
+    def test_trace_timings_and_metrics_endpoint(self, fake_backends, diagnostic_payload):
+        data = client.post("/diagnose", json={"issue_key": "METRICS-1", **diagnostic_payload}).json()
+        stages = [t["stage"] for t in data["trace"]["timings"]]
+        for stage in ["cache_lookup", "fetch_issue", "keyword_extraction", "search", "rerank",
+                      "relevance", "details", "historical_images", "logs", "analysis"]:
+            assert stage in stages
+        assert data["trace"]["volume"]["jql_searches"] == 1
+
+        response = client.get("/metrics")
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain")
+        body = response.text
+        assert "# TYPE diag_stage_duration_seconds histogram" in body
+        assert 'diag_stage_duration_seconds_count{stage="rerank",outcome="ok"}' in body
+        assert 'diag_requests_total{outcome="success"}' in body
+
+
+class TestPipelineGraph:
+    """Unit tests for concurrent execution of independent pipeline branches."""
+
+    @pytest.mark.unit
+    def test_log_branch_overlaps_candidate_retrieval(self, fake_backends, diagnostic_payload, monkeypatch):
+        import time
+        from tests.conftest import FakeAIReasoning
+
+        base_get_issue = fake_backends.get_issue
+
+        def get_issue_with_log(self, issue_key):
+            issue = base_get_issue(self, issue_key)
+            if issue_key == "GRAPH-1":
+                issue["logs"] = [{"filename": "trace.log", "url": "log-url", "size": 4}]
+            return issue
+
+        def slow_download(self, url, destination_path, max_bytes=None, stats=None, size=None):
+            time.sleep(0.5)
+            with open(destination_path, 'wb') as f:
+                f.write(b"data")
+            return 4
+
+        def slow_rerank(self, current_issue, candidates, top_n=20):
+            time.sleep(0.5)
+            return candidates[:top_n]
+
+        monkeypatch.setattr(fake_backends, "get_issue", get_issue_with_log)
+        monkeypatch.setattr(fake_backends, "download_attachment", slow_download)
+        monkeypatch.setattr(FakeAIReasoning, "rerank_candidates", slow_rerank)
+
+        start = time.perf_counter()
+        data = client.post("/diagnose", json={"issue_key": "GRAPH-1", **diagnostic_payload}).json()
+        elapsed = time.perf_counter() - start
+
+        timings = {t["stage"]: t for t in data["trace"]["timings"]}
+        logs, rerank = timings["logs"], timings["rerank"]
+        assert logs["start"] < rerank["start"] + rerank["duration"]
+        assert rerank["start"] < logs["start"] + logs["duration"]
+        assert elapsed < 0.95, f"log and rerank branches ran sequentially ({elapsed:.2f}s)"
+        # Relevance and detail branches are merged back into the trace
+        candidate = data["trace"]["historical_candidates"][0]
+        assert candidate["reason"] == "same module"
+        assert candidate["root_cause"] == "未知"
+
+
+class TestLargeLogs:
+    """Unit tests for large text logs reaching the parallel scan through the pipeline."""
+
+    @pytest.mark.unit
+    def test_large_log_is_fetched_whole_and_scanned_in_parallel(self, fake_backends, diagnostic_payload,
+                                                                monkeypatch):
+        from concurrent.futures import ThreadPoolExecutor
+        from functools import partial
+        from src import downloader, log_processor, pipeline
+        from tests.conftest import FakeAIReasoning
+
+        log = "".join(f"line {i} idle\n" for i in range(400)) + "ECU Reset Error 0x7F\n" + "idle\n" * 50
+        size = len(log.encode())
+        base_get_issue = fake_backends.get_issue
+
+        def get_issue_with_log(self, issue_key):
+            issue = base_get_issue(self, issue_key)
+            if issue_key == "BIGLOG-1":
+                issue["logs"] = [{"filename": "can.log", "url": "log-url", "size": size}]
+            return issue
+
+        def download(self, url, destination_path, max_bytes=None, stats=None, size=None):
+            with open(destination_path, "w") as f:
+                f.write(log)
+            return len(log)
+
+        def head_tail(self, *args, **kwargs):
+            raise AssertionError("a log the parallel scan can take was cut to head + tail")
+
+        scans, fingerprints = [], []
+        real_scan = log_processor.LogProcessor._scan_parallel
+
+        def scan_parallel(self, *args, **kwargs):
+            scans.append(args[0])
+            return real_scan(self, *args, **kwargs)
+
+        def analyze_pr(self, current_issue, historical_issues, log_fingerprint, image_paths=None):
+            fingerprints.append(log_fingerprint)
+            return {"report": "ok", "raw_prompt": "", "raw_response": ""}
+
+        pool = ThreadPoolExecutor(2)
+        monkeypatch.setattr(fake_backends, "get_issue", get_issue_with_log)
+        monkeypatch.setattr(fake_backends, "download_attachment", download)
+        monkeypatch.setattr(fake_backends, "download_head_tail", head_tail, raising=False)
+        monkeypatch.setattr(FakeAIReasoning, "analyze_pr", analyze_pr)
+        monkeypatch.setattr(log_processor, "get_process_pool", lambda: pool)
+        monkeypatch.setattr(log_processor.LogProcessor, "_scan_parallel", scan_parallel)
+        # The default thresholds, scaled down: a log above the (serial) head/tail
+        # threshold and the parallel threshold, below the per-file limit
+        monkeypatch.setattr(downloader, "LOG_PROCESSES", 4)
+        monkeypatch.setattr(downloader, "SERIAL_LOG_HEAD_TAIL_THRESHOLD", size // 2)
+        monkeypatch.setattr(pipeline, "AttachmentDownloader", partial(downloader.AttachmentDownloader,
+                                                                      max_file_bytes=size * 4))
+        monkeypatch.setattr(pipeline, "LogProcessor", partial(log_processor.LogProcessor,
+                                                              parallel_min_bytes=size // 2, chunk_bytes=1024))
+        try:
+            response = client.post("/diagnose", json={"issue_key": "BIGLOG-1", **diagnostic_payload})
+        finally:
+            pool.shutdown()
+
+        assert response.status_code == 200
+        assert len(scans) == 1 and scans[0].endswith("can.log")
+        assert "-> ECU Reset Error 0x7F" in fingerprints[0]
+
+
+class TestResultCache:
+    """Unit tests for revision-keyed result caching."""
+
+    @pytest.mark.unit
+    def test_unchanged_issue_is_served_from_cache(self, fake_backends, diagnostic_payload):
+        body = {"issue_key": "CACHE-1", **diagnostic_payload}
+        first = client.post("/diagnose", json=body).json()
+        assert first["trace"]["cache"]["hit"] is False
+
+        fake_backends.calls = []
+        second = client.post("/diagnose", json=body).json()
+        assert second["trace"]["cache"]["hit"] is True
+        assert second["report"] == first["report"]
+        # Only the cheap revision probe reached Jira
+        assert fake_backends.calls == [("get_issue_revision", "CACHE-1")]
+
+    @pytest.mark.unit
+    def test_force_refresh_and_config_changes_bypass_cache(self, fake_backends, diagnostic_payload):
+        body = {"issue_key": "CACHE-2", **diagnostic_payload}
+        client.post("/diagnose", json=body)
+        refreshed = client.post("/diagnose", json={**body, "force_refresh": True}).json()
+        assert refreshed["trace"]["cache"]["hit"] is False
+        other_target = client.post("/diagnose", json={**body, "search_target": "INTERNAL"}).json()
+        assert other_target["trace"]["cache"]["hit"] is False
+        other_user = client.post("/diagnose", json={**body, "internal_password": "other-secret"}).json()
+        assert other_user["trace"]["cache"]["hit"] is False
+
+    @pytest.mark.unit
+    def test_ttl_and_size_eviction(self, tmp_path):
+        import time
+        from src.result_cache import ResultCache
+        # Each payload is ~114 bytes: room for three entries
+        cache = ResultCache(str(tmp_path / "c.sqlite3"), ttl_seconds=3600, max_bytes=350)
+        for i in range(3):
+            cache.put(f"k{i}", f"KEY-{i}", "rev", {"report": "x" * 100})
+            time.sleep(0.01)
+        cache.get("k0")  # k0 becomes most recently used
+        cache.put("k3", "KEY-3", "rev", {"report": "x" * 100})
+        assert cache.get("k1") is None  # least recently used
+        assert all(cache.get(k) is not None for k in ("k0", "k2", "k3"))
+
+        expired = ResultCache(str(tmp_path / "c.sqlite3"), ttl_seconds=0)
+        time.sleep(0.01)
+        assert expired.get("k0") is None
+
+
+class TestIssueMirror:
+    """Unit tests for serving search and details from the local mirror."""
+
+    @staticmethod
+    def _wait_for_sync(status_url, timeout=5.0):
+        import time
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            data = client.get(status_url).json()
+            if data["status"] in ("succeeded", "failed"):
+                return data
+            time.sleep(0.05)
+        raise AssertionError(f"{status_url} did not finish")
+
+    @pytest.mark.unit
+    def test_synced_scope_is_served_locally(self, fake_backends, diagnostic_payload, monkeypatch):
+        import main
+        from src import pipeline
+        monkeypatch.setattr(main, "get_issue_mirror", pipeline.get_issue_mirror)
+        credentials = {k: v for k, v in diagnostic_payload.items() if k != "gemini_api_key"}
+
+        sync = client.post("/mirror/sync", json=credentials)
+        assert sync.status_code == 202
+        job = self._wait_for_sync(sync.json()["status_url"])
+        assert job["status"] == "succeeded" and "issue_key" not in job
+        assert job["result"]["mode"] == "full" and job["result"]["issues"] == 4
+        status = client.get("/mirror/status").json()
+        assert status["scopes"][0]["issues"] == 4 and status["syncing"] == []
+
+        fake_backends.calls = []
+        data = client.post("/diagnose", json={"issue_key": "MIRROR-1", **diagnostic_payload}).json()
+        assert not [c for c in fake_backends.calls if c[0] in ("search_issues", "get_issues")]
+        assert data["trace"]["volume"]["mirror_issue_hits"] == 4
+        # No JQL was sent: the trace shows the mirror query, not the unused JQL
+        assert data["trace"]["search_source"] == "mirror"
+        assert data["trace"]["initial_search_query"] == ""
+        assert data["trace"]["mirror_search_query"].startswith("BM25 XH2CONTI/BUG: intents CCU升级失败")
+        assert data["trace"]["volume"]["jql_searches"] == 0
+        assert data["trace"]["volume"]["mirror_searches"] == 1
+        assert data["trace"]["historical_candidates"][0]["root_cause"] == "flash driver"
+
+
+class TestFederatedSearch:
+    """Unit tests for searching the customer and internal Jira concurrently."""
+
+    @staticmethod
+    def _internal_search(fake_backends, delay=0.0):
+        import time
+        base_search = fake_backends.search_issues
+
+        def search(self, jql, max_results=5, stats=None):
+            if "ix.jira" not in self.server_url:
+                return base_search(self, jql, max_results, stats)
+            time.sleep(delay)
+            fake_backends.calls.append(("internal_search", jql))
+            return [
+                {"key": "CGF-1", "summary": "Historical 1", "description": "", "root_cause": "N/A"},  # clone
+                {"key": "CGF-2", "summary": "internal only", "description": "", "root_cause": "N/A"},
+            ]
+        return search
+
+    @pytest.mark.unit
+    def test_candidates_are_merged_deduplicated_and_fetched_per_source(
+            self, fake_backends, diagnostic_payload, monkeypatch):
+        monkeypatch.setattr(fake_backends, "search_issues", self._internal_search(fake_backends))
+        data = client.post("/diagnose", json={
+            "issue_key": "FED-1", "search_target": "FEDERATED", **diagnostic_payload
+        }).json()
+
+        candidates = data["trace"]["historical_candidates"]
+        assert [c["key"] for c in candidates] == ["HIST-1", "HIST-2", "CGF-2", "HIST-3", "HIST-4"]
+        assert {c["key"]: c["source"] for c in candidates}["CGF-2"] == "内部 Jira"
+        assert "[internal] " in data["trace"]["initial_search_query"]
+        # Both instances were asked for the current issue at once (no 404 fallback round trip)
+        assert fake_backends.calls.count(("get_issue", "FED-1")) == 2
+        get_issues = [c[1] for c in fake_backends.calls if c[0] == "get_issues"]
+        assert ("CGF-2",) in get_issues
+        assert ("HIST-1", "HIST-2", "HIST-3", "HIST-4") in get_issues
+
+    @pytest.mark.unit
+    def test_slow_source_is_cut_off_by_deadline(self, fake_backends, diagnostic_payload, monkeypatch):
+        import time
+        from src import pipeline
+        monkeypatch.setattr(pipeline, "FEDERATED_SEARCH_DEADLINE_SECONDS", 0.3)
+        monkeypatch.setattr(fake_backends, "search_issues", self._internal_search(fake_backends, delay=1.5))
+
+        start = time.perf_counter()
+        data = client.post("/diagnose", json={
+            "issue_key": "FED-2", "search_target": "FEDERATED", **diagnostic_payload
+        }).json()
+
+        assert time.perf_counter() - start < 1.2
+        assert {c["source"] for c in data["trace"]["historical_candidates"]} == {"客户 Jira"}
+
+    @pytest.mark.unit
+    def test_merge_candidates(self):
+        from src.pipeline import merge_candidates
+        merged = merge_candidates([
+            ("customer", [{"key": "A-1", "summary": "Reset loop"}, {"key": "A-2", "summary": "Same"},
+                          {"key": "A-3", "summary": "Same"}]),
+            ("internal", [{"key": "B-1", "summary": "reset  loop!"}, {"key": "B-2", "summary": "Other"}]),
+        ])
+        assert [(c["key"], c["source"]) for c in merged] == [
+            ("A-1", "customer"), ("A-2", "customer"), ("B-2", "internal"), ("A-3", "customer")]
+        assert merged[0]["duplicates"] == [{"key": "B-1", "source": "internal"}]
+
+
+class TestDiagnosticBatch:
+    """Unit tests for the batch endpoint."""
+
+    @pytest.mark.unit
+    def test_batch_streams_items_and_shares_jira_lookups(self, fake_backends, diagnostic_payload):
+        response = client.post("/diagnose/batch", json={
+            "issue_keys": ["BATCH-1", "BATCH-2", "batch-2", "MISSING-1", "BATCH-3"],
+            **diagnostic_payload
+        })
+        assert response.status_code == 200
+        events = TestDiagnosticStream._parse_sse(response.text)
+        names = [n for n, _ in events]
+        assert names[0] == "batch_start" and names[-1] == "batch_done"
+        assert events[0][1]["issue_keys"] == ["BATCH-1", "BATCH-2", "MISSING-1", "BATCH-3"]
+
+        results = {p["issue_key"]: p for n, p in events if n == "item_result"}
+        errors = {p["issue_key"]: p for n, p in events if n == "item_error"}
+        assert sorted(results) == ["BATCH-1", "BATCH-2", "BATCH-3"]
+        assert list(errors) == ["MISSING-1"]
+        assert events[-1][1]["succeeded"] == 3 and events[-1][1]["failed"] == 1
+
+        # Same keywords -> one shared search; historical issues fetched once per batch
+        assert len([c for c in fake_backends.calls if c[0] == "search_issues"]) == 1
+        assert fake_backends.calls.count(("get_issue", "HIST-1")) == 1
+
+
+class TestDiagnosticJobs:
+    """Unit tests for the job API and in-flight deduplication."""
+
+    @staticmethod
+    def _wait_for(job_id, timeout=5.0):
+        import time
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            data = client.get(f"/jobs/{job_id}").json()
+            if data["status"] in ("succeeded", "failed"):
+                return data
+            time.sleep(0.05)
+        raise AssertionError(f"job {job_id} did not finish")
+
+    @pytest.mark.unit
+    def test_identical_requests_coalesce_onto_one_job(self, fake_backends, diagnostic_payload, monkeypatch):
+        import time
+        from src import pipeline
+        from tests.conftest import FakeAIReasoning
+
+        class SlowAI(FakeAIReasoning):
+            def analyze_pr(self, *args, **kwargs):
+                time.sleep(0.3)
+                return super().analyze_pr(*args, **kwargs)
+
+        monkeypatch.setattr(pipeline, "AIReasoning", SlowAI)
+        body = {"issue_key": "JOB-1", **diagnostic_payload}
+
+        first = client.post("/jobs", json=body)
+        second = client.post("/jobs", json={**body, "issue_key": "job-1"})
+        other = client.post("/jobs", json={**body, "custom_core_intent": "OTA失败"})
+        other_user = client.post("/jobs", json={**body, "customer_username": "someone", "customer_password": "x"})
+        other_key = client.post("/jobs", json={**body, "gemini_api_key": "another-key"})
+        assert first.status_code == 202
+        assert second.json()["job_id"] == first.json()["job_id"]
+        assert second.json()["deduplicated"] is True
+        assert other.json()["job_id"] != first.json()["job_id"]
+        # Another user's credentials never share a job (or its report)
+        assert other_user.json()["deduplicated"] is False and other_key.json()["deduplicated"] is False
+        assert len({r.json()["job_id"] for r in (first, other_user, other_key)}) == 3
+
+        data = self._wait_for(first.json()["job_id"])
+        for response in (other, other_user, other_key):
+            self._wait_for(response.json()["job_id"])
+        assert data["status"] == "succeeded"
+        assert data["submissions"] == 2
+        assert data["result"]["report"] == "report for JOB-1"
+        assert "customer_password" not in str(data)
+        assert [c for c in fake_backends.calls if c == ("get_issue", "JOB-1")] != []
+
+        # Finished jobs are no longer in flight: a new submission starts a new run
+        third = client.post("/jobs", json=body)
+        assert third.json()["deduplicated"] is False
+        self._wait_for(third.json()["job_id"])
+
+    @pytest.mark.unit
+    def test_job_events_replay_ends_with_result(self, fake_backends, diagnostic_payload):
+        job_id = client.post("/jobs", json={"issue_key": "JOB-2", **diagnostic_payload}).json()["job_id"]
+        response = client.get(f"/jobs/{job_id}/events")
+        events = TestDiagnosticStream._parse_sse(response.text)
+        assert events[0][0] == "stage_start"
+        assert events[-1][0] == "result"
+
+    @pytest.mark.unit
+    def test_unknown_job_returns_404(self):
+        assert client.get("/jobs/does-not-exist").status_code == 404
+
+
 class TestDiagnosticIntegration:
     """Integration tests for full diagnostic flow (requires credentials)."""
     
@@ -0,0 +1,227 @@
+"""
+Tests for the concurrent attachment download engine.
+"""
+import asyncio
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.downloader import AttachmentDownloader
+from src.jira_connector import AttachmentTooLarge
+
+
+class FakeConnector:
+    """Connector stub whose 'url' is the number of bytes to write."""
+    server_url = "https://jira.example.com"
+
+    def download_attachment(self, url, destination_path, max_bytes=None, stats=None, size=None):
+        time.sleep(0.2)
+        assert size == int(url)  # metadata size is passed on, so no HEAD preflight is needed
+        size = int(url)
+        if max_bytes is not None and size > max_bytes:
+            raise AttachmentTooLarge(f"{size} > {max_bytes}")
+        with open(destination_path, 'wb') as f:
+            f.write(b"x" * size)
+        return size
+
+
+def _jobs(tmp_path, sizes):
+    return [
+        ({"filename": f"f{i}.png", "url": str(size), "size": size}, str(tmp_path / f"f{i}.png"), "TEST-1")
+        for i, size in enumerate(sizes)
+    ]
+
+
+class TestAttachmentDownloader:
+    """Unit tests for AttachmentDownloader."""
+
+    @pytest.mark.unit
+    def test_downloads_run_concurrently_in_job_order(self, tmp_path):
+        downloader = AttachmentDownloader(max_per_host=8)
+        start = time.perf_counter()
+        records = asyncio.run(downloader.download_all(FakeConnector(), _jobs(tmp_path, [10, 20, 30, 40])))
+        assert time.perf_counter() - start < 0.6
+        assert [r["filename"] for r in records] == ["f0.png", "f1.png", "f2.png", "f3.png"]
+        assert all(r["status"] == "ok" for r in records)
+        assert downloader.used_bytes == 100
+
+    @pytest.mark.unit
+    def test_transfers_hold_the_host_download_window(self, tmp_path, monkeypatch):
+        import threading
+        from src import rate_limit
+
+        monkeypatch.setattr(rate_limit, "_limiters", {})
+        lock = threading.Lock()
+        state = {"active": 0, "peak": 0}
+
+        class CountingConnector(FakeConnector):
+            def download_attachment(self, *args, **kwargs):
+                with lock:
+                    state["active"] += 1
+                    state["peak"] = max(state["peak"], state["active"])
+                try:
+                    return super().download_attachment(*args, **kwargs)
+                finally:
+                    with lock:
+                        state["active"] -= 1
+
+        downloader = AttachmentDownloader(max_per_host=2)
+        records = asyncio.run(downloader.download_all(CountingConnector(), _jobs(tmp_path, [10, 20, 30, 40])))
+
+        assert all(r["status"] == "ok" for r in records)
+        assert state["peak"] == 2
+        transfers = rate_limit._limiters["download", "jira.example.com"]
+        assert transfers.stats()["in_flight"] == 0 and transfers.rate == 0
+        assert ("rest", "jira.example.com") not in rate_limit._limiters
+
+    @pytest.mark.unit
+    def test_per_file_and_total_limits(self, tmp_path):
+        downloader = AttachmentDownloader(max_file_bytes=100, max_total_bytes=250, max_per_host=1)
+        records = asyncio.run(downloader.download_all(FakeConnector(), _jobs(tmp_path, [50, 150, 90, 90, 90])))
+        statuses = [r["status"] for r in records]
+        assert statuses[1] == "skipped"  # over per-file cap
+        assert statuses.count("ok") == 3  # the 50-byte file plus two of the 90-byte files fit
+        assert downloader.used_bytes <= 250
+        assert all("seconds" in r for r in downloader.records)
+
+    @pytest.mark.unit
+    def test_attachment_cache_copies_outside_its_lock(self, tmp_path, monkeypatch):
+        import shutil
+        import threading
+        from src import attachment_cache
+        from src.attachment_cache import AttachmentCache
+
+        cache = AttachmentCache(str(tmp_path / "cache"), max_bytes=1000)
+        for key in ("a", "b"):
+            temp = cache.temp_path()
+            with open(temp, "wb") as f:
+                f.write(key.encode() * 100)
+            cache.commit(key, temp, str(tmp_path / f"{key}.bin"))
+
+        copying, release = threading.Event(), threading.Event()
+
+        def slow_copy(src, dest):
+            # no hard links (e.g. a cross-device temp dir): a full copy
+            copying.set()
+            release.wait(5)
+            shutil.copyfile(src, dest)
+
+        monkeypatch.setattr(attachment_cache, "_place", slow_copy)
+        fetch = threading.Thread(target=cache.fetch, args=("b", str(tmp_path / "b-out.bin")))
+        fetch.start()
+        assert copying.wait(5)
+
+        # Other lookups and stores proceed while "b" is being copied, and evicting
+        # "b" meanwhile leaves its blob in place for the copy
+        started = time.perf_counter()
+        assert cache.stats()["entries"] == 2
+        assert time.perf_counter() - started < 1
+        cache.max_bytes = 100
+        temp = cache.temp_path()
+        with open(temp, "wb") as f:
+            f.write(b"c" * 100)
+        monkeypatch.setattr(attachment_cache, "_place", shutil.copyfile)
+        cache.commit("c", temp, str(tmp_path / "c.bin"))
+        assert cache.stats()["entries"] == 1
+
+        release.set()
+        fetch.join(5)
+        assert (tmp_path / "b-out.bin").read_bytes() == b"b" * 100
+        blobs = [name for _, _, names in os.walk(tmp_path / "cache" / "objects") for name in names]
+        assert len(blobs) == 1  # the evicted blob was deleted once its copy was done
+
+    @pytest.mark.unit
+    def test_attachment_cache_hits_skip_jira(self, tmp_path):
+        from src.attachment_cache import AttachmentCache
+
+        class CountingConnector(FakeConnector):
+            transfers = 0
+
+            def download_attachment(self, url, destination_path, max_bytes=None, stats=None, size=None):
+                CountingConnector.transfers += 1
+                return super().download_attachment(url, destination_path, max_bytes, size=size)
+
+        cache = AttachmentCache(str(tmp_path / "cache"), max_bytes=1000)
+
+        def jobs(run):
+            return [
+                ({"id": str(i), "filename": f"f{i}.log", "url": str(size), "size": size},
+                 str(tmp_path / f"run{run}_f{i}.log"), "PR-1")
+                for i, size in enumerate([10, 20])
+            ]
+
+        first = AttachmentDownloader(cache=cache)
+        asyncio.run(first.download_all(CountingConnector(), jobs(1)))
+        second = AttachmentDownloader(cache=cache)
+        records = asyncio.run(second.download_all(CountingConnector(), jobs(2)))
+
+        assert CountingConnector.transfers == 2
+        assert (first.cache_hits, first.cache_misses) == (0, 2)
+        assert (second.cache_hits, second.cache_misses) == (2, 0)
+        assert all(r["cached"] and r["status"] == "ok" for r in records)
+        assert second.used_bytes == 0
+        assert open(records[1]["path"], "rb").read() == b"x" * 20
+        assert os.listdir(tmp_path / "cache" / "tmp") == []
+
+    @pytest.mark.unit
+    def test_attachment_cache_evicts_least_recently_used(self, tmp_path):
+        from src.attachment_cache import AttachmentCache
+
+        cache = AttachmentCache(str(tmp_path / "cache"), max_bytes=250)
+        for name, size in [("a", 100), ("b", 100)]:
+            temp = cache.temp_path()
+            with open(temp, "wb") as f:
+                f.write(name.encode() * size)
+            cache.commit(name, temp, str(tmp_path / f"{name}.bin"))
+            time.sleep(0.01)
+        assert cache.fetch("a", str(tmp_path / "a2.bin"))  # "a" is now most recently used
+        time.sleep(0.01)
+
+        temp = cache.temp_path()
+        with open(temp, "wb") as f:
+            f.write(b"c" * 100)
+        cache.commit("c", temp, str(tmp_path / "c.bin"))
+
+        assert not cache.fetch("b", str(tmp_path / "b2.bin"))
+        assert cache.fetch("a", str(tmp_path / "a3.bin"))
+        assert cache.stats() == {"entries": 2, "bytes": 200}
+        # Files already handed out stay readable after eviction
+        assert open(tmp_path / "b.bin", "rb").read() == b"b" * 100
+
+    @pytest.mark.unit
+    def test_head_tail_threshold_follows_parallel_log_scanning(self, monkeypatch):
+        from src import downloader
+
+        monkeypatch.setattr(downloader, "LOG_PROCESSES", 4)
+        assert AttachmentDownloader(max_file_bytes=1000).log_head_tail_threshold == 1000
+        monkeypatch.setattr(downloader, "LOG_PROCESSES", 1)
+        assert AttachmentDownloader(max_file_bytes=1000).log_head_tail_threshold == \
+            downloader.SERIAL_LOG_HEAD_TAIL_THRESHOLD
+        assert AttachmentDownloader(log_head_tail_threshold=0).log_head_tail_threshold == 0
+
+    @pytest.mark.unit
+    def test_huge_logs_fetch_head_and_tail_only(self, tmp_path):
+        class RangeConnector(FakeConnector):
+            def download_head_tail(self, url, destination_path, size, head_bytes, tail_bytes):
+                with open(destination_path, 'wb') as f:
+                    f.write(b"h" * head_bytes + b"\n...\n" + b"t" * tail_bytes)
+                return head_bytes + tail_bytes
+
+        downloader = AttachmentDownloader(max_file_bytes=1000, log_head_tail_threshold=100,
+                                          log_head_bytes=10, log_tail_bytes=10)
+        jobs = [
+            ({"filename": "huge.log", "url": "5000", "size": 5000}, str(tmp_path / "huge.log"), "PR-1"),
+            ({"filename": "small.log", "url": "50", "size": 50}, str(tmp_path / "small.log"), "PR-1"),
+            ({"filename": "huge.log.gz", "url": "500", "size": 500}, str(tmp_path / "huge.log.gz"), "PR-1"),
+        ]
+        huge, small, archive = asyncio.run(downloader.download_all(RangeConnector(), jobs))
+
+        assert huge["status"] == "ok" and huge["partial"] == "head_tail" and huge["bytes"] == 20
+        assert "partial" not in small and small["bytes"] == 50
+        assert "partial" not in archive and archive["bytes"] == 500
+        assert downloader.used_bytes == 570
+        assert all(r["mb_per_s"] >= 0 and r["resumes"] == 0 for r in (huge, small))
@@ -0,0 +1,174 @@
+"""
+Tests for the local SQLite issue mirror.
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.issue_mirror import IssueMirror
+
+
+def make_issue(key, updated, summary="", description="", comments=()):
+    return {
+        "key": key, "summary": summary, "description": description, "steps_to_reproduce": "",
+        "created": updated, "updated": updated, "root_cause": "N/A",
+        "images": [], "logs": [], "attachments": [],
+        "comments": [{"author": "Li", "body": body, "created": updated} for body in comments],
+    }
+
+
+class ScriptedConnector:
+    """Serves a fixed issue list per sync and records the JQL it was asked."""
+    server_url = "https://jira.example.com/"
+
+    def __init__(self):
+        self.issues = []
+        self.queries = []
+
+    def iter_issues(self, jql, stats=None):
+        self.queries.append(jql)
+        return iter(self.issues)
+
+
+class PagedConnector(ScriptedConnector):
+    """
+    Pages through `issues` by startAt offsets in the JQL's ORDER BY, like
+    Jira, calling `between_pages(issues)` after each page but the last.
+    """
+
+    def __init__(self, issues, between_pages, page_size=2):
+        super().__init__()
+        self.issues = issues
+        self.between_pages = between_pages
+        self.page_size = page_size
+
+    def iter_issues(self, jql, stats=None):
+        self.queries.append(jql)
+        order = jql.rsplit("ORDER BY ", 1)[1].split()[0]
+        start = 0
+        while True:
+            rows = sorted(self.issues, key=lambda issue: (issue[order], issue["key"]))
+            page = rows[start:start + self.page_size]
+            if stats is not None:
+                stats["total"] = len(rows)
+            yield from page
+            start += len(page)
+            if not page or start >= len(rows):
+                break
+            self.between_pages(self.issues)
+
+
+@pytest.mark.unit
+def test_initial_then_delta_sync(tmp_path):
+    mirror = IssueMirror(str(tmp_path / "mirror.sqlite3"))
+    connector = ScriptedConnector()
+    connector.issues = [
+        make_issue("PR-1", "2026-03-01T10:00:00.000+0800", "CAN bus off", "DTC U0100 after wakeup"),
+        make_issue("PR-2", "2026-03-02T12:30:00.000+0800", "OTA upgrade failed", comments=["0x7F NRC on flash"]),
+    ]
+    first = mirror.sync(connector, "CGF", "PR", overlap_minutes=60)
+    assert first["mode"] == "full" and first["issues"] == 2
+    assert "updated >=" not in connector.queries[0]
+
+    connector.issues = [make_issue("PR-3", "2026-03-03T08:00:00.000+0800", "Bluetooth reset")]
+    second = mirror.sync(connector, "CGF", "PR", overlap_minutes=60)
+    assert second["mode"] == "delta" and second["issues"] == 3
+    assert 'updated >= "2026/03/02 11:30"' in connector.queries[1]
+
+    assert mirror.is_fresh("https://jira.example.com", "CGF", "PR")
+    assert not mirror.is_fresh("https://jira.example.com", "CGF", "BUG")
+
+    # Full re-sync drops issues that no longer exist in the scope
+    connector.issues = connector.issues + [make_issue("PR-1", "2026-03-04T08:00:00.000+0800", "CAN bus off")]
+    assert mirror.sync(connector, "CGF", "PR", full=True)["issues"] == 2
+
+
+@pytest.mark.unit
+def test_issue_edited_mid_sync_is_not_skipped(tmp_path):
+    mirror = IssueMirror(str(tmp_path / "mirror.sqlite3"))
+    issues = [make_issue(f"PR-{i}", f"2026-03-0{i}T10:00:00.000+0800") for i in range(1, 6)]
+    mirror.sync(PagedConnector(list(issues), lambda _: None), "CGF", "PR")
+
+    def edit_first(rows):
+        # after the first page PR-1 is edited, which moves it last in updated order
+        rows[0] = make_issue("PR-1", "2026-03-09T10:00:00.000+0800", "edited")
+
+    result = mirror.sync(PagedConnector(list(issues), edit_first), "CGF", "PR", full=True)
+
+    assert result["fetched"] == 5 and result["complete"]
+    assert sorted(mirror.get_issues("https://jira.example.com", [f"PR-{i}" for i in range(1, 6)])) == \
+        [f"PR-{i}" for i in range(1, 6)]
+
+
+@pytest.mark.unit
+def test_shifted_full_sync_does_not_prune(tmp_path):
+    mirror = IssueMirror(str(tmp_path / "mirror.sqlite3"))
+    issues = [make_issue(f"PR-{i}", f"2026-03-0{i}T10:00:00.000+0800") for i in range(1, 6)]
+    mirror.sync(PagedConnector(list(issues), lambda _: None), "CGF", "PR")
+
+    def delete_first(rows):
+        # PR-1 leaves the scope after the first page: PR-3 slides onto page one and is never read
+        if rows[0]["key"] == "PR-1":
+            del rows[0]
+
+    connector = PagedConnector(list(issues), delete_first)
+    result = mirror.sync(connector, "CGF", "PR", full=True)
+
+    assert result["fetched"] == 4 and not result["complete"]
+    assert "PR-3" in mirror.get_issues("https://jira.example.com", ["PR-3"])
+    assert result["issues"] == 5
+
+    # The next sync is a full one, and that one may prune
+    connector.between_pages = lambda _: None
+    again = mirror.sync(connector, "CGF", "PR")
+    assert again["mode"] == "full" and again["complete"] and again["issues"] == 4
+
+
+@pytest.mark.unit
+def test_local_search_and_issue_lookup(tmp_path):
+    mirror = IssueMirror(str(tmp_path / "mirror.sqlite3"))
+    connector = ScriptedConnector()
+    connector.issues = [
+        make_issue("PR-1", "2026-03-01T10:00:00.000+0800", "CAN bus off", "DTC U0100 after wakeup"),
+        make_issue("PR-2", "2026-03-02T12:30:00.000+0800", "OTA upgrade failed", comments=["0x7F NRC on flash"]),
+    ]
+    mirror.sync(connector, "CGF", "PR")
+
+    server = "https://jira.example.com"
+    # Graded BM25 list: both match, the issue matching more terms ranks first
+    hits = mirror.search(server, "CGF", "PR", ["ota", "can bus"], [])
+    assert [r["key"] for r in hits] == ["PR-1", "PR-2"]
+    assert hits[0]["score"] > hits[1]["score"] > 0
+    assert [r["key"] for r in mirror.search(server, "CGF", "PR", ["wakeup"], ["0x7F"])][0] == "PR-1"
+    assert mirror.search(server, "CGF", "PR", ["bluetooth"], []) == []
+
+    # The index follows syncs
+    connector.issues = [make_issue("PR-3", "2026-03-03T08:00:00.000+0800", "Bluetooth reset")]
+    mirror.sync(connector, "CGF", "PR")
+    assert [r["key"] for r in mirror.search(server, "CGF", "PR", ["bluetooth"], [])] == ["PR-3"]
+
+    issues = mirror.get_issues(server, ["pr-2", "PR-404"])
+    assert list(issues) == ["PR-2"]
+    assert issues["PR-2"]["comments"][0]["body"] == "0x7F NRC on flash"
+
+
+@pytest.mark.unit
+def test_running_sync_reports_progress(tmp_path):
+    mirror = IssueMirror(str(tmp_path / "mirror.sqlite3"))
+    seen = []
+
+    class ObservedConnector(ScriptedConnector):
+        def iter_issues(self, jql, stats=None):
+            for i in range(450):
+                if i in (0, 300):
+                    seen.append(mirror.stats()["syncing"])
+                yield make_issue(f"PR-{i}", "2026-03-01T10:00:00.000+0800")
+
+    mirror.sync(ObservedConnector(), "CGF", "PR")
+
+    assert [[(p["project"], p["mode"], p["fetched"]) for p in s] for s in seen] == \
+        [[("CGF", "full", 0)], [("CGF", "full", 200)]]
+    assert mirror.stats()["syncing"] == []
@@ -0,0 +1,297 @@
+"""
+Tests for JiraConnector REST helpers (no Jira server required).
+"""
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src import jira_connector
+from src.jira_connector import JiraConnector
+from src.jira_fields import FieldMetadataCache
+from src import rate_limit
+from src.rate_limit import HostRateLimiter, JiraThrottled
+
+FIELDS = [{"id": "customfield_10600", "name": "根因"}]
+
+
+class FakeResponse:
+    def __init__(self, payload, status_code=200):
+        self.content = json.dumps(payload).encode("utf-8")
+        self.status_code = status_code
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise Exception(f"HTTP {self.status_code}")
+
+
+class FakeSession:
+    """Serves /search pages from an in-memory list of issues."""
+
+    def __init__(self, total):
+        self.total = total
+        self.requests = []
+
+    def get(self, url, params=None, **kwargs):
+        self.requests.append(params)
+        start, limit = params["startAt"], params["maxResults"]
+        issues = [
+            {"key": f"PR-{i}", "fields": {"summary": f"issue {i}", "description": None,
+                                          "customfield_10600": {"value": "watchdog"}}}
+            for i in range(start, min(start + limit, self.total))
+        ]
+        return FakeResponse({"startAt": start, "total": self.total, "issues": issues})
+
+
+class FakeJira:
+    def __init__(self, session):
+        self._session = session
+
+    def _get_url(self, path):
+        return f"https://jira.example.com/rest/api/2/{path}"
+
+    def fields(self):
+        return FIELDS
+
+
+@pytest.fixture
+def connector(monkeypatch):
+    cache = FieldMetadataCache()
+    monkeypatch.setattr(jira_connector, "get_field_metadata_cache", lambda: cache)
+    connector = JiraConnector.__new__(JiraConnector)
+    connector.server_url = "https://jira.example.com"
+    connector._limiter = HostRateLimiter("jira.example.com", max_concurrency=8)
+    return connector
+
+
+@pytest.mark.unit
+def test_search_pages_with_field_projection(connector):
+    session = FakeSession(total=120)
+    connector.jira = FakeJira(session)
+    stats = {}
+
+    results = connector.search_issues("project = PR", max_results=100, stats=stats)
+
+    assert [r["key"] for r in results] == [f"PR-{i}" for i in range(100)]
+    assert results[0]["root_cause"] == "watchdog"
+    assert [(p["startAt"], p["maxResults"]) for p in session.requests] == [(0, 50), (50, 50)]
+    assert all(p["fields"] == "summary,description,customfield_10600" for p in session.requests)
+    assert stats["pages"] == 2
+    assert stats["payload_bytes"] > 0 and "parse_seconds" in stats
+
+
+@pytest.mark.unit
+def test_search_generator_stops_early(connector):
+    session = FakeSession(total=500)
+    connector.jira = FakeJira(session)
+
+    stubs = connector.iter_search_issues("project = PR", max_results=500, page_size=10)
+    first = [next(stubs) for _ in range(15)]
+
+    assert first[-1]["key"] == "PR-14"
+    # Only the pages actually consumed were requested
+    assert len(session.requests) == 2
+    assert session.requests[1]["startAt"] == 10
+
+
+class BulkSession:
+    """Answers `key in (...)` searches from a dict of visible issues."""
+
+    def __init__(self, visible):
+        self.visible = visible
+        self.requests = []
+
+    def get(self, url, params=None, **kwargs):
+        self.requests.append(params)
+        keys = params["jql"][len("key in ("):-1].split(", ")
+        return FakeResponse({"issues": [self.visible[k] for k in keys if k in self.visible]})
+
+
+@pytest.mark.unit
+def test_bulk_fetch_matches_get_issue_shape_and_reports_missing_keys(connector):
+    raw = {
+        "key": "PR-1",
+        "fields": {
+            "summary": "CCU upgrade failed", "description": "timeout", "created": "c", "updated": "u",
+            "attachment": [
+                {"filename": "screen.png", "content": "https://jira/att/1", "id": "1", "size": 10},
+                {"filename": "trace.log", "content": "https://jira/att/2", "id": "2", "size": 20},
+                {"filename": "bundle.tar.gz", "content": "https://jira/att/3", "id": "3", "size": 30},
+                {"filename": "build.exe", "content": "https://jira/att/4", "id": "4", "size": 40},
+            ],
+            "comment": {"comments": [
+                {"author": {"displayName": "Li"}, "body": "see !screen.png!", "created": "c1"},
+            ]},
+            "customfield_10600": "watchdog",
+        },
+    }
+    session = BulkSession({"PR-1": raw, "PR-2": dict(raw, key="PR-2")})
+    connector.jira = FakeJira(session)
+
+    results = connector.get_issues(["pr-1", "PR-2", "PR-404"], batch_size=2)
+
+    assert len(session.requests) == 2
+    assert session.requests[0]["jql"] == "key in (PR-1, PR-2)"
+    assert session.requests[0]["validateQuery"] == "warn"
+    issue = results["PR-1"]
+    assert [a["filename"] for a in issue["images"]] == ["screen.png"]
+    assert [a["filename"] for a in issue["logs"]] == ["trace.log", "bundle.tar.gz"]
+    assert issue["comments"][0]["author"] == "Li"
+    assert issue["root_cause"] == "watchdog"
+    assert isinstance(results["PR-404"], Exception) and "404" in str(results["PR-404"])
+
+
+class StreamResponse:
+    """Streaming attachment response; `fail_after` bytes, then a dropped connection."""
+
+    def __init__(self, body, status_code=200, headers=None, fail_after=None):
+        self.body = body
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.fail_after = fail_after
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise Exception(f"HTTP {self.status_code}")
+
+    def iter_content(self, chunk_size):
+        import requests
+        sent = 0
+        for i in range(0, len(self.body), 4):
+            if self.fail_after is not None and sent >= self.fail_after:
+                raise requests.ConnectionError("connection reset")
+            chunk = self.body[i:i + 4]
+            sent += len(chunk)
+            yield chunk
+
+
+class RangeSession:
+    """Serves one attachment with Range support; the first GET drops after 8 bytes."""
+
+    def __init__(self, body, ranges=True):
+        self.body = body
+        self.ranges = ranges
+        self.ranges_requested = []
+        self.dropped = False
+
+    def head(self, url, **kwargs):
+        raise AssertionError("downloads must not send a HEAD preflight")
+
+    def get(self, url, headers=None, **kwargs):
+        spec = (headers or {}).get("Range")
+        self.ranges_requested.append(spec)
+        if spec and self.ranges:
+            start, end = spec[len("bytes="):].split("-")
+            if not start:
+                body = self.body[-int(end):]
+            else:
+                body = self.body[int(start):int(end) + 1 if end else None]
+            return StreamResponse(body, status_code=206, headers={"Content-Length": str(len(body))})
+        full = {"Content-Length": str(len(self.body))}
+        if not self.dropped:
+            self.dropped = True
+            return StreamResponse(self.body, headers=full, fail_after=8)
+        return StreamResponse(self.body, headers=full)
+
+
+@pytest.mark.unit
+def test_download_resumes_with_range_after_dropped_connection(connector, tmp_path, monkeypatch):
+    monkeypatch.setattr(jira_connector.time, "sleep", lambda s: None)
+    body = bytes(range(40))
+    session = RangeSession(body)
+    connector.jira = FakeJira(session)
+    dest = tmp_path / "a.log"
+    stats = {}
+
+    written = connector.download_attachment("https://jira.example.com/a.log", str(dest), stats=stats)
+
+    assert written == 40
+    assert dest.read_bytes() == body
+    assert session.ranges_requested == [None, "bytes=8-"]
+    assert stats["resumes"] == 1
+    assert stats["declared_bytes"] == 40
+
+
+@pytest.mark.unit
+def test_download_restarts_without_range_support(connector, tmp_path, monkeypatch):
+    monkeypatch.setattr(jira_connector.time, "sleep", lambda s: None)
+    body = bytes(range(40))
+    session = RangeSession(body, ranges=False)
+    connector.jira = FakeJira(session)
+    dest = tmp_path / "a.log"
+
+    assert connector.download_attachment("https://jira.example.com/a.log", str(dest)) == 40
+    assert dest.read_bytes() == body
+    # The resume probes for ranges once; the full 200 answer restarts the file
+    assert session.ranges_requested == [None, "bytes=8-"]
+
+
+@pytest.mark.unit
+def test_download_rejects_oversized_file_without_reading_it(connector, tmp_path):
+    session = RangeSession(bytes(40))
+    connector.jira = FakeJira(session)
+
+    # Size known from the attachment metadata: no request at all
+    with pytest.raises(jira_connector.AttachmentTooLarge):
+        connector.download_attachment("https://jira.example.com/a.log", str(tmp_path / "a.log"),
+                                      max_bytes=10, size=40)
+    assert session.ranges_requested == []
+    # Unknown size: the GET's Content-Length rejects it before the body is read
+    with pytest.raises(jira_connector.AttachmentTooLarge):
+        connector.download_attachment("https://jira.example.com/a.log", str(tmp_path / "a.log"), max_bytes=10)
+    assert session.ranges_requested == [None]
+    assert not (tmp_path / "a.log").exists()
+
+
+@pytest.mark.unit
+def test_download_requests_go_through_host_limiter(connector, tmp_path):
+    calls = []
+    limiter_call = connector._limiter.call
+    connector._limiter.call = lambda fn, *args, **kwargs: calls.append(args[0]) or limiter_call(fn, *args, **kwargs)
+    body = b"".join(b"line %02d\n" % i for i in range(20))
+    connector.jira = FakeJira(RangeSession(body))
+    connector.jira._session.dropped = True
+
+    connector.download_attachment("https://jira.example.com/a.log", str(tmp_path / "a.log"), size=len(body))
+    connector.download_head_tail("https://jira.example.com/a.log", str(tmp_path / "b.log"), len(body), 16, 16)
+
+    assert calls == ["https://jira.example.com/a.log"] * 3
+
+
+@pytest.mark.unit
+def test_download_head_tail(connector, tmp_path):
+    body = b"".join(b"line %02d\n" % i for i in range(20))
+    session = RangeSession(body)
+    connector.jira = FakeJira(session)
+    dest = tmp_path / "big.log"
+
+    written = connector.download_head_tail("https://jira.example.com/big.log", str(dest), len(body), 16, 16)
+
+    content = dest.read_bytes()
+    assert written == 32
+    assert content.startswith(body[:16]) and content.endswith(body[-16:])
+    assert b"bytes omitted" in content
+    assert session.ranges_requested == ["bytes=0-15", "bytes=-16"]
+
+
+@pytest.mark.unit
+def test_search_surfaces_throttling_instead_of_empty_result(connector, monkeypatch):
+    monkeypatch.setattr(rate_limit.time, "sleep", lambda s: None)
+
+    class ThrottlingSession:
+        def get(self, url, params=None, **kwargs):
+            return FakeResponse({}, status_code=429)
+
+    connector.jira = FakeJira(ThrottlingSession())
+
+    with pytest.raises(JiraThrottled):
+        connector.search_issues("project = PR", max_results=10)
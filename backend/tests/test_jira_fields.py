@@ -0,0 +1,95 @@
+"""
+Tests for cached Jira field metadata and the compiled field plan.
+"""
+import os
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src import jira_connector
+from src.jira_connector import JiraConnector
+from src.jira_fields import FALLBACK_STEPS_FIELD_IDS, FieldMetadataCache, FieldPlan
+from src.rate_limit import HostRateLimiter
+
+FIELDS = [
+    {"id": "summary", "name": "Summary"},
+    {"id": "customfield_10300", "name": "Repro Steps"},
+    {"id": "customfield_10500", "name": "重现步骤"},
+    {"id": "customfield_10600", "name": "根因"},
+]
+
+
+@pytest.mark.unit
+def test_plan_resolves_fields_by_name_priority():
+    plan = FieldPlan.compile(FIELDS)
+    assert plan.steps_field == "customfield_10500"
+    assert plan.root_cause_field == "customfield_10600"
+    requested = plan.issue_fields()
+    assert "customfield_10500" in requested and "customfield_10600" in requested
+    assert "customfield_10300" not in requested
+
+    unresolved = FieldPlan.compile([{"id": "summary", "name": "Summary"}])
+    assert unresolved.steps_field is None
+    assert unresolved.root_cause_field == "customfield_10000"
+    assert set(FALLBACK_STEPS_FIELD_IDS) <= set(unresolved.issue_fields())
+
+
+@pytest.mark.unit
+def test_metadata_cache_ttl_and_invalidation():
+    loads = []
+
+    def loader():
+        loads.append(1)
+        return FIELDS
+
+    cache = FieldMetadataCache(ttl_seconds=3600)
+    for _ in range(5):
+        cache.plan("https://jira.example.com/", loader)
+    assert len(loads) == 1
+
+    cache.invalidate("https://jira.example.com")
+    cache.plan("https://jira.example.com", loader)
+    assert len(loads) == 2
+
+    cache.ttl_seconds = -1
+    cache.fields("https://jira.example.com", loader)
+    assert len(loads) == 3
+
+
+@pytest.mark.unit
+def test_get_issue_requests_only_planned_fields(monkeypatch):
+    class FakeJira:
+        def __init__(self):
+            self.field_calls = 0
+            self.requested = []
+
+        def fields(self):
+            self.field_calls += 1
+            return FIELDS
+
+        def issue(self, key, fields=None, expand=None):
+            self.requested.append(fields)
+            return SimpleNamespace(raw={"key": key, "fields": {
+                "summary": "CCU upgrade failed", "description": "", "created": "c", "updated": "u",
+                "attachment": [], "comment": {"comments": []},
+                "customfield_10500": "1. flash\n2. reboot", "customfield_10600": "watchdog reset",
+            }})
+
+    cache = FieldMetadataCache()
+    monkeypatch.setattr(jira_connector, "get_field_metadata_cache", lambda: cache)
+    connector = JiraConnector.__new__(JiraConnector)
+    connector.server_url = "https://jira.example.com"
+    connector._limiter = HostRateLimiter("jira.example.com", max_concurrency=8)
+    connector.jira = FakeJira()
+
+    first = connector.get_issue("PR-1")
+    connector.get_issue("PR-2")
+
+    assert connector.jira.field_calls == 1
+    assert first["steps_to_reproduce"] == "1. flash\n2. reboot"
+    assert first["root_cause"] == "watchdog reset"
+    requested = connector.jira.requested[0].split(",")
+    assert "customfield_10500" in requested and "customfield_10014" not in requested
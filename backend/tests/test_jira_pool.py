@@ -0,0 +1,100 @@
+"""
+Tests for the process-wide Jira connector pool.
+"""
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.jira_pool import JiraConnectorPool
+
+
+class CountingConnector:
+    """Connector stub that counts handshakes, pings and closes."""
+    created = 0
+
+    def __init__(self, server_url, username, token):
+        time.sleep(0.1)
+        CountingConnector.created += 1
+        self.server_url = server_url
+        self.healthy = True
+        self.pings = 0
+        self.closed = False
+
+    def ping(self):
+        self.pings += 1
+        if not self.healthy:
+            raise Exception("401 Unauthorized")
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture(autouse=True)
+def reset_counter():
+    CountingConnector.created = 0
+
+
+@pytest.mark.unit
+def test_connectors_are_reused_per_credentials():
+    pool = JiraConnectorPool(factory=CountingConnector)
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(pool.get("https://jira.example.com", "u", "p")))
+        for _ in range(5)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    # Concurrent first users share one handshake
+    assert CountingConnector.created == 1
+    assert all(c is results[0] for c in results)
+    # Different credentials get their own connector
+    assert pool.get("https://jira.example.com", "u", "other") is not results[0]
+    assert pool.stats()["connectors"] == 2
+
+
+@pytest.mark.unit
+def test_idle_eviction_and_health_check():
+    pool = JiraConnectorPool(factory=CountingConnector, idle_seconds=60, healthcheck_seconds=0)
+    first = pool.get("https://jira.example.com", "u", "p")
+    pool.release(first)
+    time.sleep(0.01)
+    assert pool.get("https://jira.example.com", "u", "p") is first
+    assert first.pings == 1
+    pool.release(first)
+
+    first.healthy = False
+    time.sleep(0.01)
+    second = pool.get("https://jira.example.com", "u", "p")
+    assert second is not first and first.closed
+
+    pool.idle_seconds = 0
+    time.sleep(0.01)
+    # Still leased by the last get()
+    assert pool.evict_idle() == 0 and not second.closed
+    pool.release(second)
+    time.sleep(0.01)
+    assert pool.evict_idle() == 1
+    assert second.closed
+    assert pool.stats() == {"connectors": 0, "leased": 0, "created": 2, "evicted": 2}
+
+
+@pytest.mark.unit
+def test_leased_connector_survives_idle_eviction():
+    pool = JiraConnectorPool(factory=CountingConnector, idle_seconds=0, healthcheck_seconds=0)
+    with pool.lease("https://jira.example.com", "u", "p") as held:
+        time.sleep(0.01)
+        # Another request's get() runs an eviction pass and a health check window
+        other = pool.get("https://jira.example.com", "u", "other")
+        assert not held.closed and held.pings == 0
+        assert pool.stats()["leased"] == 2
+    pool.release(other)
+    time.sleep(0.01)
+    assert pool.evict_idle() == 2 and held.closed
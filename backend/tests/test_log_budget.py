@@ -0,0 +1,94 @@
+"""
+Tests for the shared token budget of the log fingerprints.
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.log_budget import TRUNCATED_MARK, LogBudget, estimate_tokens
+from src.log_processor import LogProcessor
+
+SERIAL = 1 << 40
+
+
+def _sections(tmp_path, name, lines, context_lines=2):
+    path = tmp_path / name
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    processor = LogProcessor(parallel_min_bytes=SERIAL, scan_mode="lines")
+    return processor.fingerprint_sections(str(path), context_lines)
+
+
+def _noisy_log(failure_line, repeats=40):
+    lines = []
+    for i in range(repeats):
+        lines += [f"step {i} idle", f"step {i} idle", f"CAN Timeout on bus {i % 3}", "idle", "idle", "idle"]
+    lines += ["idle", "ECU Reset requested", failure_line, "idle", "idle", "idle"]
+    return lines
+
+
+@pytest.mark.unit
+def test_estimate_tokens_counts_cjk_per_character():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("abcdefgh") == 2
+    assert estimate_tokens("升级失败") == 4
+
+
+@pytest.mark.unit
+def test_fitting_fingerprints_are_unchanged(tmp_path):
+    budget = LogBudget(max_tokens=100000)
+    sections = _sections(tmp_path, "a.log", ["ok", "ECU Error 0x1F", "ok"])
+    budget.add("a.log", sections)
+    budget.add_message("b.log", "Log not downloaded (error): boom")
+
+    expected = LogProcessor(parallel_min_bytes=SERIAL, scan_mode="lines").process_log(str(tmp_path / "a.log"), 2)
+    assert budget.render() == f"File: a.log\n{expected}\n\nFile: b.log\nLog not downloaded (error): boom"
+    assert budget.stats["snippets_omitted"] == 0
+    assert LogBudget(max_tokens=10).render() == "No logs found."
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("failure", [
+    "DTC U0100-87 set: lost communication with ECM",
+    "Flash Error: negative response 7F 31 22",
+    "FATAL watchdog expired",
+])
+def test_strong_signals_win_the_budget(tmp_path, failure):
+    budget = LogBudget(max_tokens=200)
+    budget.add("a.log", _sections(tmp_path, "a.log", _noisy_log(failure)))
+
+    rendered = budget.render()
+
+    assert rendered.startswith("File: a.log\n")
+    assert failure in rendered
+    assert "snippets omitted to fit the log budget]" in rendered
+    assert budget.stats["snippets_omitted"] > 0
+    assert estimate_tokens(rendered) <= 200
+
+
+@pytest.mark.unit
+def test_budget_is_shared_across_files(tmp_path):
+    budget = LogBudget(max_tokens=300)
+    budget.add("noisy.log", _sections(tmp_path, "noisy.log", _noisy_log("Reset loop detected", repeats=200)))
+    budget.add("quiet.log", _sections(tmp_path, "quiet.log", ["boot", "ECU Reset by brownout", "boot"]))
+
+    rendered = budget.render()
+
+    assert "File: quiet.log\nboot\n-> ECU Reset by brownout\nboot" in rendered
+    assert "-> Reset loop detected" in rendered
+    assert estimate_tokens(rendered) <= 300
+
+
+@pytest.mark.unit
+def test_oversized_snippet_is_cut(tmp_path):
+    lines = ["idle"] * 5 + [f"Error burst {i}" for i in range(400)] + ["idle"] * 5
+    budget = LogBudget(max_tokens=400)
+    budget.add("a.log", _sections(tmp_path, "a.log", lines))
+
+    rendered = budget.render()
+
+    assert "-> Error burst 0" in rendered and "-> Error burst 399" not in rendered
+    assert TRUNCATED_MARK in rendered
+    assert estimate_tokens(rendered) <= 400
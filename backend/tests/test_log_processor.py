@@ -0,0 +1,192 @@
+"""
+Tests for LogProcessor keyword snippet extraction.
+"""
+import gzip
+import io
+import multiprocessing
+import os
+import random
+import sys
+import tarfile
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.log_processor import LogProcessor, _KeywordFinder, archive_kind, line_aligned_ranges
+
+SERIAL = 1 << 40  # parallel_min_bytes that keeps process_log on the serial path
+
+
+def _line_scan(path, context_lines):
+    return LogProcessor(parallel_min_bytes=SERIAL, scan_mode="lines").process_log(path, context_lines)
+
+
+def _write_random_log(path, lines=3000, seed=7):
+    """Mixed newlines, non-ASCII text and an invalid UTF-8 tail."""
+    rng = random.Random(seed)
+    parts = []
+    for i in range(lines):
+        text = "ECU Error 0x1F" if rng.random() < 0.03 else rng.choice(["idle", "CAN ok", "héllo 温度", ""])
+        parts.append(f"{i} {text}" + rng.choice(["\n", "\r\n", "\r", "\n"]))
+    with open(path, 'wb') as f:
+        f.write("".join(parts).encode("utf-8") + b"\xff\xe4\xb8 Reset at end")
+
+
+@pytest.mark.unit
+def test_ranges_end_on_newlines(tmp_path):
+    path = tmp_path / "a.log"
+    _write_random_log(path, lines=500)
+    data = path.read_bytes()
+    ranges = line_aligned_ranges(str(path), 100)
+    assert ranges[0][0] == 0 and ranges[-1][1] == len(data)
+    for (_, end), (start, _) in zip(ranges, ranges[1:]):
+        assert end == start and data[end - 1:end] == b"\n"
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("context_lines", [0, 1, 5, 20])
+def test_parallel_scan_matches_serial(tmp_path, context_lines):
+    path = str(tmp_path / "a.log")
+    _write_random_log(path)
+    serial = _line_scan(path, context_lines)
+    with ThreadPoolExecutor(4) as pool:
+        for chunk_bytes in (37, 200, 4096):
+            processor = LogProcessor(parallel_min_bytes=SERIAL, chunk_bytes=chunk_bytes)
+            assert processor.process_log_parallel(path, context_lines, pool) == serial
+
+
+@pytest.mark.unit
+def test_parallel_scan_on_spawned_processes(tmp_path):
+    path = str(tmp_path / "a.log")
+    _write_random_log(path, lines=800)
+    serial = _line_scan(path, 3)
+    with ProcessPoolExecutor(2, mp_context=multiprocessing.get_context("spawn")) as pool:
+        parallel = LogProcessor(parallel_min_bytes=SERIAL, chunk_bytes=1000).process_log_parallel(path, 3, pool)
+    assert parallel == serial
+    assert "-> \xff" not in parallel and "Reset at end" in parallel
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("keywords", [None, ["Err?or", r"CAN\s+ok", r"x\s+\d"]])
+@pytest.mark.parametrize("context_lines", [0, 2, 20])
+def test_mmap_scan_matches_line_scan(tmp_path, keywords, context_lines):
+    path = str(tmp_path / "a.log")
+    _write_random_log(path)
+    expected = LogProcessor(keywords, parallel_min_bytes=SERIAL, scan_mode="lines").process_log(path, context_lines)
+    processor = LogProcessor(keywords, parallel_min_bytes=SERIAL, scan_mode="mmap")
+    assert (processor.literal_keywords is not None) == (keywords is None)
+    assert processor.process_log_mmap(path, context_lines) == expected
+
+
+@pytest.mark.unit
+def test_mmap_keyword_finder_crosses_blocks(tmp_path, monkeypatch):
+    monkeypatch.setattr(_KeywordFinder, "BLOCK_BYTES", 16)
+    path = str(tmp_path / "a.log")
+    _write_random_log(path, lines=400)
+    processor = LogProcessor(parallel_min_bytes=SERIAL, scan_mode="mmap")
+    assert processor.process_log(path, 4) == _line_scan(path, 4)
+
+
+@pytest.mark.unit
+def test_default_scan_keeps_line_scan_output_on_invalid_utf8(tmp_path):
+    path = tmp_path / "a.log"
+    # The decoder drops the stray byte, so the line scan sees "Error"; the raw bytes never contain it
+    path.write_bytes(b"ok\nEr\xffror in flash\nok\n")
+    assert LogProcessor().scan_mode == "lines"
+    assert LogProcessor(parallel_min_bytes=SERIAL).process_log(str(path), 1) == \
+        "ok\n-> Error in flash\nok\n" + "-" * 40
+    mmap_scan = LogProcessor(parallel_min_bytes=SERIAL, scan_mode="mmap").process_log(str(path), 1)
+    assert mmap_scan == "No critical patterns found in log."
+
+
+@pytest.mark.unit
+def test_non_ascii_keywords_use_line_scan(tmp_path):
+    path = tmp_path / "a.log"
+    path.write_text("ok\n升级失败 code 7\nok\n", encoding="utf-8")
+    processor = LogProcessor(["升级失败"], parallel_min_bytes=SERIAL, scan_mode="mmap")
+    assert processor.bytes_pattern is None
+    assert processor.process_log(str(path), 1) == "ok\n-> 升级失败 code 7\nok\n" + "-" * 40
+
+
+@pytest.mark.unit
+def test_template_fingerprint_is_the_same_for_every_scan(tmp_path):
+    path = str(tmp_path / "a.log")
+    _write_random_log(path)
+    expected = LogProcessor(parallel_min_bytes=SERIAL, scan_mode="lines",
+                            fingerprint_mode="templates").process_log(path, 3)
+    processor = LogProcessor(parallel_min_bytes=SERIAL, chunk_bytes=500, scan_mode="mmap",
+                             fingerprint_mode="templates")
+
+    assert processor.process_log(path, 3) == expected
+    with ThreadPoolExecutor(2) as pool:
+        assert processor.process_log_parallel(path, 3, pool) == expected
+    assert expected.startswith("98 keyword lines in 2 templates")
+    assert len(expected) < len(_line_scan(path, 3)) / 5
+
+
+@pytest.mark.unit
+def test_no_matches_and_empty_file(tmp_path):
+    path = tmp_path / "quiet.log"
+    path.write_text("all good\nstill good\n")
+    empty = tmp_path / "empty.log"
+    empty.write_bytes(b"")
+    with ThreadPoolExecutor(2) as pool:
+        processor = LogProcessor(parallel_min_bytes=SERIAL, chunk_bytes=4)
+        assert processor.process_log_parallel(str(path), 2, pool) == "No critical patterns found in log."
+        assert processor.process_log_parallel(str(empty), 2, pool) == "No critical patterns found in log."
+    assert LogProcessor(scan_mode="mmap").process_log(str(empty), 2) == "No critical patterns found in log."
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("scan_mode", ["mmap", "lines"])
+def test_gzip_log_is_streamed_like_the_plain_file(tmp_path, scan_mode):
+    plain = str(tmp_path / "a.log")
+    _write_random_log(plain)
+    with open(plain, 'rb') as f:
+        (tmp_path / "a.log.gz").write_bytes(gzip.compress(f.read()))
+
+    result = LogProcessor(scan_mode=scan_mode).process_log(str(tmp_path / "a.log.gz"), 5)
+
+    assert archive_kind(str(tmp_path / "a.log.gz")) == "gzip"
+    assert result == "== a.log ==\n" + _line_scan(plain, 5)
+
+
+@pytest.mark.unit
+def test_zip_members_filtered_nested_gz_and_capped(tmp_path):
+    log = b"".join(b"step %d ok\n" % i for i in range(50)) + b"CAN Timeout on bus 2\nrecovered\n"
+    path = tmp_path / "bundle.zip"
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("logs/ecu.log", log)
+        zf.writestr("logs/ecu.log.1.gz", gzip.compress(log))
+        zf.writestr("logs/huge.txt", b"Error\n" * 1000)
+        zf.writestr("screen.png", b"Error")
+        zf.writestr("__MACOSX/logs/._ecu.log", b"Error")
+
+    result = LogProcessor(member_max_bytes=len(log)).process_log(str(path), 1)
+
+    sections = result.split("\n\n")
+    assert sections[0] == "== logs/ecu.log ==\nstep 49 ok\n-> CAN Timeout on bus 2\nrecovered\n" + "-" * 40
+    assert sections[1].startswith("== logs/ecu.log.1.gz ==\nstep 49 ok\n-> CAN Timeout")
+    assert sections[2].startswith(f"== logs/huge.txt == (only the first {len(log)} decompressed bytes scanned)")
+    assert sections[-1] == "2 non-log members skipped"
+
+
+@pytest.mark.unit
+def test_tgz_archive_limits(tmp_path):
+    path = tmp_path / "bundle.tgz"
+    with tarfile.open(path, "w:gz") as tf:
+        for name in ("a.log", "b.log", "c.log"):
+            data = b"DTC U0100 set\n"
+            info = tarfile.TarInfo(f"var/log/{name}")
+            info.size = len(data)
+            tf.addfile(info, io.BytesIO(data))
+
+    assert archive_kind(str(path)) == "tar"
+    result = LogProcessor(archive_max_members=2).process_log(str(path), 0)
+    assert result.count("-> DTC U0100 set") == 2
+    assert result.endswith("1 members not scanned (archive limits reached)")
+    assert LogProcessor(member_globs=["*.txt"]).process_log(str(path), 0) == \
+        "No log files found in archive (3 non-log members skipped)."
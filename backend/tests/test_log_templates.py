@@ -0,0 +1,57 @@
+"""
+Tests for the Drain-style log template miner.
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.log_templates import WILDCARD, TemplateCollector, TemplateMiner, mask_tokens
+
+
+@pytest.mark.unit
+def test_mask_tokens_keeps_dtcs_and_masks_variables():
+    assert mask_tokens("2024-01-31 12:00:00.123 CAN 0x1F2 Timeout after 120 ms on bus 2") == \
+        ["<TS>", "CAN", "<HEX>", "Timeout", "after", "<NUM>", "ms", "on", "bus", "<NUM>"]
+    assert mask_tokens("[ 1234.567890] DTC U0100-87 set, counter=7F took 10ms on CAN2") == \
+        ["<TS>", "DTC", "U0100-87", "set,", "counter=<HEX>", "took", "<NUM>ms", "on", "CAN2"]
+
+
+@pytest.mark.unit
+def test_miner_merges_variants_and_tracks_timestamps():
+    miner = TemplateMiner(similarity=0.5)
+    first, created = miner.add("10:00:01 ECU Reset reason watchdog")
+    assert created
+    same, created = miner.add("10:00:05 ECU Reset reason brownout")
+    other, created_other = miner.add("10:00:07 DTC U0100-87 set")
+
+    assert same is first and not created and created_other
+    assert first.text == f"<TS> ECU Reset reason {WILDCARD}"
+    assert (first.count, first.first_timestamp, first.last_timestamp) == (2, "10:00:01", "10:00:05")
+    assert [t.template_id for t in miner.templates] == [1, 2]
+
+
+@pytest.mark.unit
+def test_miner_counts_overflow_past_max_clusters():
+    miner = TemplateMiner(max_clusters=1)
+    miner.add("CAN Timeout")
+    template, created = miner.add("Flash write Fail at block")
+    assert template is None and not created
+    assert miner.overflow == 1 and len(miner.templates) == 1
+
+
+@pytest.mark.unit
+def test_collector_keeps_one_window_per_template():
+    collector = TemplateCollector(1)
+    for i in range(100):
+        collector.feed(f"tick {i}", False)
+        collector.feed(f"CAN 0x{i:03X} Timeout after {i} ms", True)
+    collector.feed("tail", False)
+
+    result = collector.result()
+    assert result.startswith("100 keyword lines in 1 templates")
+    assert "[T1 x100] CAN <HEX> Timeout after <NUM> ms\ntick 0\n-> CAN 0x000 Timeout after 0 ms\ntick 1\n" in result
+    assert result.count("->") == 1
+    assert TemplateCollector(3).result() == "No critical patterns found in log."
@@ -0,0 +1,168 @@
+"""
+Tests for the per-host Jira rate limiter (token bucket + AIMD window).
+"""
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src import rate_limit
+from src.metrics import JIRA_THROTTLED
+from src.rate_limit import HostRateLimiter, JiraThrottled, retry_after_seconds
+
+
+class FakeResponse:
+    def __init__(self, status_code, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class Flaky:
+    """Returns the queued responses in order, then 200s."""
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return self.responses.pop(0) if self.responses else FakeResponse(200)
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    delays = []
+    monkeypatch.setattr(rate_limit.time, "sleep", delays.append)
+    return delays
+
+
+@pytest.mark.unit
+def test_retries_throttled_calls_honoring_retry_after(sleeps):
+    limiter = HostRateLimiter("retry.example.com", max_concurrency=8, rate=0)
+    first = FakeResponse(429, {"Retry-After": "2"})
+    fn = Flaky(first, FakeResponse(503))
+
+    response = limiter.call(fn)
+
+    assert response.status_code == 200 and fn.calls == 3
+    assert first.closed
+    assert 2 <= sleeps[0] <= 2 + rate_limit.BACKOFF_BASE_SECONDS
+    assert JIRA_THROTTLED.value(host="retry.example.com", status="429") == 1
+    assert JIRA_THROTTLED.value(host="retry.example.com", status="503") == 1
+
+
+@pytest.mark.unit
+def test_raises_after_retries_are_exhausted(sleeps):
+    limiter = HostRateLimiter("jira.example.com", max_concurrency=8, rate=0, retries=2)
+
+    class Throttled(Exception):
+        status_code = 429
+        response = FakeResponse(429)
+
+    def always_throttled():
+        raise Throttled()
+
+    with pytest.raises(JiraThrottled) as excinfo:
+        limiter.call(always_throttled)
+    assert excinfo.value.attempts == 3 and excinfo.value.status == 429
+    assert len(sleeps) == 2
+
+
+@pytest.mark.unit
+def test_other_errors_propagate_without_retry(sleeps):
+    limiter = HostRateLimiter("jira.example.com", max_concurrency=8, rate=0)
+
+    def bad_request():
+        raise ValueError("400 bad JQL")
+
+    with pytest.raises(ValueError):
+        limiter.call(bad_request)
+    assert sleeps == [] and limiter.stats()["in_flight"] == 0
+
+
+@pytest.mark.unit
+def test_aimd_halves_on_throttle_and_grows_on_success(sleeps):
+    limiter = HostRateLimiter("jira.example.com", max_concurrency=8, rate=0)
+    limiter.call(Flaky(FakeResponse(429)))
+    assert 4 <= limiter.limit < 5
+
+    # +1/window per success: about one slot per window's worth of calls
+    for _ in range(40):
+        limiter.call(Flaky())
+    assert limiter.limit == 8
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("status", [None, 404, 500])
+def test_window_only_grows_on_success(status):
+    limiter = HostRateLimiter("jira.example.com", max_concurrency=8, rate=0)
+    limiter.limit = 4.0
+    for _ in range(10):
+        limiter.acquire()
+        limiter.release(status)
+    assert limiter.limit == 4.0
+
+    limiter.acquire()
+    limiter.release(302)
+    assert limiter.limit == 4.25
+
+
+@pytest.mark.unit
+def test_failed_calls_do_not_grow_the_window(sleeps):
+    limiter = HostRateLimiter("jira.example.com", max_concurrency=8, rate=0)
+    limiter.limit = 4.0
+
+    class NotFound(Exception):
+        status_code = 404
+
+    def missing():
+        raise NotFound()
+
+    for call in (missing, lambda: 1 / 0):
+        with pytest.raises(Exception):
+            limiter.call(call)
+    assert limiter.limit == 4.0 and limiter.stats()["in_flight"] == 0
+
+
+@pytest.mark.unit
+def test_plain_return_values_count_as_success(sleeps):
+    limiter = HostRateLimiter("jira.example.com", max_concurrency=8, rate=0)
+    limiter.call(Flaky(FakeResponse(429)))
+    halved = limiter.limit
+
+    # python-jira resources and lists carry no status_code
+    assert limiter.call(lambda: {"key": "PR-1"}) == {"key": "PR-1"}
+    assert limiter.call(lambda: None) is None
+    assert limiter.limit > halved
+
+
+@pytest.mark.unit
+def test_plain_500_is_not_retried(sleeps):
+    limiter = HostRateLimiter("jira.example.com", max_concurrency=8, rate=0)
+    fn = Flaky(FakeResponse(500))
+    assert limiter.call(fn).status_code == 500
+    assert fn.calls == 1 and sleeps == [] and limiter.limit == 8
+
+
+@pytest.mark.unit
+def test_token_bucket_paces_requests():
+    limiter = HostRateLimiter("jira.example.com", max_concurrency=8, rate=20, burst=2)
+    start = time.perf_counter()
+    for _ in range(6):
+        limiter.call(Flaky())
+    # 2 from the burst, the other 4 at 20/s
+    assert time.perf_counter() - start >= 0.18
+
+
+@pytest.mark.unit
+def test_retry_after_parsing():
+    assert retry_after_seconds({"Retry-After": "7"}) == 7
+    assert retry_after_seconds({}) is None
+    assert retry_after_seconds({"Retry-After": "Wed, 21 Oct 2015 07:28:00 GMT"}) == 0
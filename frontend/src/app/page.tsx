@@ -6,6 +6,35 @@ import WorkflowVisualizer, { StepStatus } from '@/components/WorkflowVisualizer'
 import SettingsModal from '@/components/SettingsModal';
 import ReportViewer from '@/components/ReportViewer';
 
+// Backend pipeline stage -> workflow step shown in the visualizer
+const STAGE_TO_STEP: Record<string, string> = {
+  fetch_issue: 'fetch',
+  current_images: 'fetch',
+  keyword_extraction: 'search',
+  search: 'search',
+  rerank: 'search',
+  relevance: 'search',
+  details: 'search',
+  historical_images: 'search',
+  logs: 'process',
+  analysis: 'reason',
+};
+const STEP_ORDER = ['fetch', 'search', 'process', 'reason'];
+// Steps that only start once a step is done (search and process run side by side)
+const STEP_DEPENDENTS: Record<string, string[]> = {
+  fetch: ['search', 'process', 'reason'],
+  search: ['reason'],
+  process: ['reason'],
+  reason: [],
+};
+
+// Partial results streamed from /diagnose/stream before the report is ready
+interface LiveProgress {
+  keywords?: { core_intent: string[]; fingerprints: string[]; general_terms: string[] };
+  candidates?: { key: string; summary: string; score?: number }[];
+  stageTimings: { stage: string; duration: number }[];
+}
+
 // Type for query history record
 interface QueryRecord {
   issueKey: string;
@@ -29,6 +58,7 @@ export default function Home() {
   const [currentStep, setCurrentStep] = useState<string | null>(null);
   const [statuses, setStatuses] = useState<Record<string, StepStatus>>({});
   const [diagnosticResult, setDiagnosticResult] = useState<any>(null);
+  const [liveProgress, setLiveProgress] = useState<LiveProgress | null>(null);
 
   // Config State with Persistence
   const [config, setConfig] = useState({
@@ -138,6 +168,7 @@ export default function Home() {
     setIsLoading(true);
     setError(null);
     setDiagnosticResult(null);
+    setLiveProgress({ stageTimings: [] });
     setShowReQueryConfirm(false);
     setPendingQuery(null);
 
@@ -147,15 +178,68 @@ export default function Home() {
     steps.forEach(s => newStatuses[s] = 'idle');
     setStatuses(newStatuses);
 
+    // Per-step progress, tracked locally because state updates are async.
+    // Branches of the task graph overlap (logs starts right after the fetch,
+    // alongside the search), so each step has its own status: running while
+    // any of its stages runs, completed once it is idle and a step that
+    // depends on it has started. A completed step never goes back.
+    let activeStep = 'fetch';
+    const runningStages: Record<string, number> = {};
+    const stepStatus: Record<string, StepStatus> = { ...newStatuses };
+
+    const publishSteps = () => {
+      STEP_ORDER.forEach(s => {
+        if (stepStatus[s] === 'running' && !runningStages[s]
+            && STEP_DEPENDENTS[s].some(d => stepStatus[d] !== 'idle')) {
+          stepStatus[s] = 'completed';
+        }
+      });
+      if (stepStatus[activeStep] !== 'running') {
+        activeStep = STEP_ORDER.find(s => stepStatus[s] === 'running') || activeStep;
+      }
+      setCurrentStep(activeStep);
+      setStatuses({ ...stepStatus });
+    };
+
+    // Mark `step` running and current (unless it has already completed)
+    const advanceTo = (step: string) => {
+      if (stepStatus[step] !== 'completed') {
+        stepStatus[step] = 'running';
+        activeStep = step;
+      }
+      publishSteps();
+    };
+
+    const handleStageEvent = (event: string, payload: any) => {
+      const step = STAGE_TO_STEP[payload.stage];
+      if (step && event === 'stage_start') {
+        runningStages[step] = (runningStages[step] || 0) + 1;
+        advanceTo(step);
+      }
+      if (step && (event === 'stage_end' || event === 'stage_error')) {
+        runningStages[step] = Math.max((runningStages[step] || 0) - 1, 0);
+        publishSteps();
+      }
+      if (event === 'stage_end') {
+        setLiveProgress(prev => {
+          const next: LiveProgress = { ...(prev || { stageTimings: [] }) };
+          next.stageTimings = [...next.stageTimings, { stage: payload.stage, duration: payload.duration }];
+          if (payload.stratified_keywords) next.keywords = payload.stratified_keywords;
+          if (payload.candidates) next.candidates = payload.candidates;
+          if (payload.historical_candidates) next.candidates = payload.historical_candidates;
+          return next;
+        });
+      }
+    };
+
     try {
       // Step 1: Start UI Flow
-      setCurrentStep('fetch');
-      setStatuses(prev => ({ ...prev, fetch: 'running' }));
+      advanceTo('fetch');
 
       const controller = new AbortController();
       // Removed strict timeout to allow for comprehensive analysis
 
-      const response = await fetch('http://localhost:8000/diagnose', {
+      const response = await fetch('http://localhost:8000/diagnose/stream', {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
         signal: controller.signal,
@@ -176,7 +260,36 @@ export default function Home() {
         throw new Error(errorMessage || '诊断过程发生错误');
       }
 
-      const data = await response.json();
+      // Read the SSE stream: stage events update the workflow as they happen,
+      // the final `result` event carries the full /diagnose response body.
+      const reader = response.body!.getReader();
+      const decoder = new TextDecoder();
+      let buffer = '';
+      let data: any = null;
+      while (data === null) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        let sep;
+        while ((sep = buffer.indexOf('\n\n')) !== -1) {
+          const frame = buffer.slice(0, sep);
+          buffer = buffer.slice(sep + 2);
+          const event = frame.match(/^event: (.*)$/m)?.[1];
+          const raw = frame.match(/^data: (.*)$/m)?.[1];
+          if (!event || raw === undefined) continue;
+          const payload = JSON.parse(raw);
+          if (event === 'result') {
+            data = payload;
+          } else if (event === 'error') {
+            throw new Error(payload.detail || '诊断过程发生错误');
+          } else {
+            handleStageEvent(event, payload);
+          }
+        }
+      }
+      if (data === null) {
+        throw new Error('诊断连接意外中断');
+      }
 
       // Update visualized steps to completed upon success
       setStatuses({
@@ -186,6 +299,7 @@ export default function Home() {
         reason: 'completed'
       });
       setCurrentStep(null);
+      setLiveProgress(null);
       setDiagnosticResult(data);
 
       // Record to query history
@@ -204,7 +318,7 @@ export default function Home() {
 
     } catch (err: any) {
       setError(err.message);
-      setStatuses(prev => ({ ...prev, [currentStep || 'fetch']: 'error' }));
+      setStatuses(prev => ({ ...prev, [activeStep]: 'error' }));
     } finally {
       setIsLoading(false);
     }
@@ -359,6 +473,33 @@ export default function Home() {
         {(isLoading || diagnosticResult) && (
           <WorkflowVisualizer currentStep={currentStep} statuses={statuses} />
         )}
+
+        {/* Live partial results while the final report is being generated */}
+        {isLoading && liveProgress && (liveProgress.keywords || liveProgress.candidates) && (
+          <div className="max-w-3xl mx-auto text-left bg-white dark:bg-zinc-900 rounded-2xl border border-zinc-200 dark:border-zinc-800 p-5 space-y-4 animate-in fade-in">
+            {liveProgress.keywords && (
+              <div className="flex flex-wrap gap-2">
+                {[...liveProgress.keywords.core_intent, ...liveProgress.keywords.fingerprints, ...liveProgress.keywords.general_terms].map((kw, i) => (
+                  <span key={i} className="px-2 py-1 text-xs rounded-md bg-indigo-50 dark:bg-indigo-900/30 text-indigo-600 dark:text-indigo-300 font-mono">{kw}</span>
+                ))}
+              </div>
+            )}
+            {liveProgress.candidates && (
+              <ul className="text-sm space-y-1">
+                {liveProgress.candidates.map(c => (
+                  <li key={c.key} className="truncate">
+                    <span className="font-mono font-bold text-indigo-600">{c.key}</span>
+                    <span className="text-zinc-500"> {c.summary}</span>
+                    {c.score !== undefined && <span className="text-zinc-400"> ({c.score}%)</span>}
+                  </li>
+                ))}
+              </ul>
+            )}
+            <p className="text-xs text-zinc-400 font-mono">
+              {liveProgress.stageTimings.map(t => `${t.stage} ${t.duration.toFixed(1)}s`).join(' · ')}
+            </p>
+          </div>
+        )}
       </div>
 
       {/* Report Section */}
@@ -16,6 +16,8 @@ interface ReportViewerProps {
             general_terms: string[];
         };
         initial_search_query: string;
+        mirror_search_query?: string;
+        search_source?: string;
         historical_candidates: { key: string; summary: string }[];
         deep_context_count: number;
         raw_prompt: string;
@@ -414,9 +416,16 @@ export default function ReportViewer({ report, summary, issueKey, trace }: Repor
 
                             <section>
                                 <h4 className="text-sm font-bold text-indigo-500 uppercase tracking-wider mb-2">2. 全局 JQL 检索语句 (Global Search Query)</h4>
-                                <code className="block p-3 bg-zinc-100 dark:bg-zinc-800 rounded-lg text-sm break-all font-mono">
-                                    {trace?.initial_search_query}
-                                </code>
+                                {trace?.initial_search_query && (
+                                    <code className="block p-3 bg-zinc-100 dark:bg-zinc-800 rounded-lg text-sm break-all font-mono">
+                                        {trace.initial_search_query}
+                                    </code>
+                                )}
+                                {trace?.mirror_search_query && (
+                                    <code className="block mt-2 p-3 bg-zinc-100 dark:bg-zinc-800 rounded-lg text-sm break-all font-mono">
+                                        <span className="text-indigo-500">[本地镜像 BM25]</span> {trace.mirror_search_query}
+                                    </code>
+                                )}
                             </section>
 
                             <section>
@@ -210,6 +210,16 @@ export default function SettingsModal({ isOpen, onClose, onSave, initialConfig }
                 <div className="font-bold text-sm mb-0.5">内部 Jira</div>
                 <div className="text-[10px] opacity-70">在公司内部库检索已解单据</div>
               </button>
+              <button
+                onClick={() => setConfig({ ...config, search_target: 'FEDERATED' })}
+                className={`flex-1 p-3 rounded-xl border-2 transition-all text-left ${config.search_target === 'FEDERATED'
+                  ? 'border-indigo-500 bg-indigo-50 dark:bg-indigo-900/20 text-indigo-700 dark:text-indigo-300'
+                  : 'border-zinc-200 dark:border-zinc-800 hover:border-zinc-300 dark:hover:border-zinc-700'
+                  }`}
+              >
+                <div className="font-bold text-sm mb-0.5">联合检索</div>
+                <div className="text-[10px] opacity-70">同时检索客户与内部两个库</div>
+              </button>
             </div>
           </div>
 